@@ -0,0 +1,68 @@
+"""Audio decoding for key detection: librosa.load vs the ffmpeg pipe.
+
+Decodes the key-detection window (60 s, mono, 22050 Hz) of a video with
+each method, each in a fresh process, and prints wall time and the peak
+RSS growth caused by decoding.
+
+    uv run python benchmarks/bench_audio_decode.py data/videos/<video_id>.webm
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import shutil
+import statistics
+import time
+import warnings
+from pathlib import Path
+
+
+def _decode(method: str, path: str) -> tuple[float, float]:
+    """Decode once in this process; return (seconds, peak RSS growth in MB)."""
+    import librosa
+
+    from yoke.key_analyzer import _DURATION, _SAMPLE_RATE, _load_audio
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == "librosa":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            librosa.load(path, sr=_SAMPLE_RATE, mono=True, duration=_DURATION)
+    else:
+        _load_audio(Path(path))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (peak - before) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="Video or audio file to decode")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    methods = ["librosa"]
+    if shutil.which("ffmpeg"):
+        methods.append("ffmpeg")
+    else:
+        print("ffmpeg not found on PATH; only timing librosa.load")
+
+    ctx = multiprocessing.get_context("spawn")
+    for method in methods:
+        times, peaks = [], []
+        for _ in range(args.runs):
+            with ctx.Pool(1) as pool:
+                elapsed, peak = pool.apply(_decode, (method, args.path))
+            times.append(elapsed)
+            peaks.append(peak)
+        print(
+            f"  {method:<8} wall {statistics.median(times):6.2f} s"
+            f"   peak +{max(peaks):7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
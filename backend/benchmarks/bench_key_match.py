@@ -0,0 +1,63 @@
+"""Key-profile matching: per-shift np.corrcoef loop vs one matrix product.
+
+Times only the matching step of key detection, for random chroma vectors.
+
+    uv run python benchmarks/bench_key_match.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from yoke.key_analyzer import _KEY_NAMES, _MAJOR_PROFILE, _MINOR_PROFILE, _match_key
+
+
+def _loop_match_key(chroma_mean: np.ndarray) -> str:
+    """The previous implementation: 12 shifts x 2 np.corrcoef calls."""
+    best_corr = -2.0
+    best_key = ""
+    for shift in range(12):
+        rolled = np.roll(chroma_mean, -shift)
+        major_corr = float(np.corrcoef(rolled, _MAJOR_PROFILE)[0, 1])
+        if major_corr > best_corr:
+            best_corr = major_corr
+            best_key = _KEY_NAMES[shift]
+        minor_corr = float(np.corrcoef(rolled, _MINOR_PROFILE)[0, 1])
+        if minor_corr > best_corr:
+            best_corr = minor_corr
+            best_key = f"{_KEY_NAMES[shift]}m"
+    return best_key
+
+
+def _time(fn, chromas: list[np.ndarray]) -> list[float]:
+    timings = []
+    for chroma in chromas:
+        start = time.perf_counter()
+        fn(chroma)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chromas = [rng.random(12) for _ in range(args.iterations)]
+    mismatches = sum(_loop_match_key(c) != _match_key(c) for c in chromas)
+
+    for label, fn in (("loop", _loop_match_key), ("vectorized", _match_key)):
+        timings = sorted(_time(fn, chromas))
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95)]
+        print(f"  {label:<10} p50 {p50:8.1f} us   p95 {p95:8.1f} us")
+    print(f"  mismatched keys: {mismatches}/{len(chromas)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Handler latency with and without the in-process state cache.
+
+Runs the playback, seek and pitch handlers against a plain RedisStore and a
+CachedRedisStore and prints per-handler latency percentiles.
+
+    uv run python benchmarks/bench_state_cache.py                 # fakeredis
+    uv run python benchmarks/bench_state_cache.py --redis-url redis://localhost:6379
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import AsyncMock
+
+import fakeredis.aioredis
+import redis.asyncio as aioredis
+
+from yoke.downloader import VideoDownloader
+from yoke.models import Song
+from yoke.redis_store import RedisStore
+from yoke.router import MessageRouter
+from yoke.session import SessionManager
+from yoke.state_cache import CachedRedisStore
+from yoke.ws import ConnectionManager
+
+MESSAGES = {
+    "playback": {"type": "playback", "action": "play"},
+    "seek": {"type": "seek", "position_seconds": 42.0},
+    "pitch": {"type": "pitch", "semitones": 2},
+}
+
+
+async def _run(store: RedisStore, video_dir: Path, iterations: int) -> dict:
+    session = SessionManager(store)
+    connections = ConnectionManager()
+    router = MessageRouter(
+        session=session,
+        connections=connections,
+        downloader=VideoDownloader(video_dir=video_dir),
+    )
+    ws = AsyncMock()
+    await router.handle(ws, {"type": "join", "name": "Bench"})
+    for i in range(30):
+        song = Song(
+            video_id=f"v{i}", title=f"Song {i}", thumbnail_url="", duration_seconds=200
+        )
+        await session.queue_song(ws.singer_id, song)
+    await session.advance_queue()
+    await connections.flush()
+
+    results: dict[str, list[float]] = {}
+    for name, message in MESSAGES.items():
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await router.handle(ws, message)
+            timings.append((time.perf_counter() - start) * 1e6)
+            # Deliver the frames, as a connected client would, untimed
+            await router.updates.flush()
+            await connections.flush()
+        results[name] = timings
+    if isinstance(store, CachedRedisStore):
+        await store.close()
+    return results
+
+
+def _report(label: str, results: dict[str, list[float]]) -> None:
+    print(f"\n{label}")
+    for name, timings in results.items():
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95)]
+        print(f"  {name:<10} p50 {p50:8.1f} us   p95 {p95:8.1f} us")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", help="Use a real Redis instead of fakeredis")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp:
+        for label, cls in (
+            ("RedisStore", RedisStore),
+            ("CachedRedisStore", CachedRedisStore),
+        ):
+            if args.redis_url:
+                redis = aioredis.from_url(args.redis_url)
+                await redis.flushdb()
+            else:
+                redis = fakeredis.aioredis.FakeRedis()
+            results = await _run(cls(redis), Path(tmp), args.iterations)
+            _report(label, results)
+            await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
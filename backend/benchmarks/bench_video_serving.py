@@ -0,0 +1,126 @@
+"""Seek latency and bytes transferred by the /videos endpoint.
+
+Drives the ASGI app in-process against a generated video file and prints,
+per request pattern, latency to the first body byte and to the end of the
+response, plus the bytes sent:
+
+  refetch     the whole file, as a reload without HTTP caching does
+  seek        a bounded Range at a random offset, as a far seek does
+  revalidate  a conditional request with the file's ETag (304)
+
+    uv run python benchmarks/bench_video_serving.py
+    uv run python benchmarks/bench_video_serving.py --size-mb 256 --window-kb 4096
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from yoke.downloader import VideoDownloader
+from yoke.main import app
+
+VIDEO_ID = "benchvideo1"
+
+
+async def _request(
+    headers: dict[str, str],
+) -> tuple[int, float, float, int, dict[str, str]]:
+    """GET the video; return status, latencies, body bytes and headers."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/videos/{VIDEO_ID}",
+        "raw_path": f"/videos/{VIDEO_ID}".encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "server": ("127.0.0.1", 8000),
+        "client": ("127.0.0.1", 50000),
+        "extensions": {},
+    }
+    status = 0
+    response_headers: dict[str, str] = {}
+    nbytes = 0
+    first_byte: float | None = None
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status, nbytes, first_byte
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(
+                (k.decode(), v.decode()) for k, v in message["headers"]
+            )
+        elif message["type"] == "http.response.body":
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            nbytes += len(message.get("body", b""))
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    end = time.perf_counter()
+    return status, (first_byte or end) - start, end - start, nbytes, response_headers
+
+
+def _report(name: str, results: list[tuple]) -> None:
+    ttfb = sorted(r[1] * 1e3 for r in results)
+    total = sorted(r[2] * 1e3 for r in results)
+    sent = statistics.mean(r[3] for r in results)
+    statuses = sorted({r[0] for r in results})
+    print(
+        f"  {name:<11} status {statuses}  "
+        f"first byte p50 {statistics.median(ttfb):7.2f} ms  "
+        f"p95 {ttfb[int(len(ttfb) * 0.95)]:7.2f} ms  "
+        f"total p50 {statistics.median(total):8.2f} ms  "
+        f"p95 {total[int(len(total) * 0.95)]:8.2f} ms  "
+        f"{sent / 1024:10.0f} KiB/request"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--window-kb", type=int, default=2048)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp:
+        video_dir = Path(tmp)
+        size = args.size_mb * 1024 * 1024
+        (video_dir / f"{VIDEO_ID}.mp4").write_bytes(random.randbytes(size))
+        downloader = VideoDownloader(video_dir=video_dir)
+        downloader.scan()
+        app.state.downloader = downloader
+
+        # Warms the page cache and yields the ETag to revalidate against
+        etag = (await _request({}))[4]["etag"]
+        window = args.window_kb * 1024
+
+        def seek() -> dict[str, str]:
+            offset = random.randrange(size - window)
+            return {"range": f"bytes={offset}-{offset + window - 1}"}
+
+        patterns = {
+            "refetch": dict,
+            "seek": seek,
+            "revalidate": lambda: {"if-none-match": etag},
+        }
+        print(f"{args.size_mb} MiB video, {args.window_kb} KiB seek window")
+        for name, headers in patterns.items():
+            results = [await _request(headers()) for _ in range(args.iterations)]
+            _report(name, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from fastapi import WebSocket
+
+    from yoke.ws import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateCoalescer:
+    """Rate-limits high-frequency broadcasts, keeping only the latest per key.
+
+    Messages are held until the next flush, which runs every *interval*
+    seconds while anything is pending.  A newer message with the same key
+    replaces an older one, so a burst of progress ticks becomes one frame.
+    """
+
+    def __init__(self, connections: ConnectionManager, interval: float = 0.25) -> None:
+        self.connections = connections
+        self.interval = interval
+        self._pending: dict[str, tuple[dict[str, Any], WebSocket | None]] = {}
+        self._task: asyncio.Task[None] | None = None
+        self._received = 0
+        self._sent = 0
+
+    def put(
+        self, key: str, message: dict[str, Any], exclude: WebSocket | None = None
+    ) -> None:
+        """Queue *message* for the next flush, replacing any pending one for *key*.
+
+        Must be called on the event loop thread.
+        """
+        self._received += 1
+        self._pending[key] = (message, exclude)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, key: str) -> None:
+        """Drop a pending message, e.g. once it no longer applies."""
+        self._pending.pop(key, None)
+
+    async def flush(self) -> None:
+        """Broadcast everything pending now."""
+        pending, self._pending = self._pending, {}
+        for message, exclude in pending.values():
+            self._sent += 1
+            await self.connections.broadcast(message, exclude=exclude)
+
+    async def close(self) -> None:
+        """Flush pending messages and stop the timer task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush coalesced updates")
+
+    def stats(self) -> dict[str, float]:
+        """Return how many updates were received and how many were sent."""
+        return {"received": self._received, "sent": self._sent}
@@ -4,12 +4,35 @@ import os
 from pathlib import Path
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     video_dir: Path
     max_concurrent_downloads: int
     host: str
     port: int
     redis_url: str
+    state_cache: bool
+    ws_send_timeout: float
+    ws_queue_size: int
+    update_interval: float
+    position_persist_interval: float
+    search_cache_ttl: int
+    search_cache_size: int
+    video_cache_max_bytes: int
+    video_cache_policy: str
+    prefetch_lookahead: int
+    key_workers: int
+    key_offset: float
+    audio_first: bool
+    progressive: bool
+    page_cache_warmup: bool
+    page_cache_lookahead: int
 
     def __init__(self) -> None:
         self.video_dir = Path(os.environ.get("KARAOKE_VIDEO_DIR", "./data/videos"))
@@ -19,6 +42,28 @@ class Config:
         self.host = os.environ.get("KARAOKE_HOST", "0.0.0.0")
         self.port = int(os.environ.get("KARAOKE_PORT", "8000"))
         self.redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379")
+        self.state_cache = _env_bool("KARAOKE_STATE_CACHE", True)
+        self.ws_send_timeout = float(os.environ.get("KARAOKE_WS_SEND_TIMEOUT", "5"))
+        self.ws_queue_size = int(os.environ.get("KARAOKE_WS_QUEUE_SIZE", "256"))
+        self.update_interval = float(os.environ.get("KARAOKE_UPDATE_INTERVAL", "0.25"))
+        self.position_persist_interval = float(
+            os.environ.get("KARAOKE_POSITION_PERSIST_INTERVAL", "5")
+        )
+        self.search_cache_ttl = int(os.environ.get("KARAOKE_SEARCH_CACHE_TTL", "3600"))
+        self.search_cache_size = int(os.environ.get("KARAOKE_SEARCH_CACHE_SIZE", "256"))
+        self.video_cache_max_bytes = int(
+            float(os.environ.get("KARAOKE_VIDEO_CACHE_MAX_GB", "0")) * 1024**3
+        )
+        self.video_cache_policy = os.environ.get("KARAOKE_VIDEO_CACHE_POLICY", "lru")
+        self.prefetch_lookahead = int(os.environ.get("KARAOKE_PREFETCH_LOOKAHEAD", "3"))
+        self.key_workers = int(os.environ.get("KARAOKE_KEY_WORKERS", "1"))
+        self.key_offset = float(os.environ.get("KARAOKE_KEY_OFFSET", "0"))
+        self.audio_first = _env_bool("KARAOKE_AUDIO_FIRST", True)
+        self.progressive = _env_bool("KARAOKE_PROGRESSIVE", False)
+        self.page_cache_warmup = _env_bool("KARAOKE_PAGE_CACHE_WARMUP", True)
+        self.page_cache_lookahead = int(
+            os.environ.get("KARAOKE_PAGE_CACHE_LOOKAHEAD", "2")
+        )
 
 
 config = Config()
@@ -0,0 +1,128 @@
+"""Priority-ordered download slots with bandwidth-adaptive concurrency."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+
+# Weight of the newest sample in the per-level throughput averages
+_EWMA_ALPHA = 0.3
+# Another parallel download must raise total throughput by this much to stay
+_MIN_GAIN = 1.1
+# Retry a higher limit this often, in case bandwidth has changed
+_REPROBE_EVERY = 10
+
+
+class DownloadScheduler:
+    """Hands out up to *limit* download slots, most urgent first.
+
+    Waiters are ordered by priority (lower is more urgent, e.g. the queue
+    position), then by arrival.  Priorities can change while waiting.
+
+    The limit adapts between 1 and *max_concurrent*: each finished download
+    reports its bytes, giving an average aggregate throughput per
+    concurrency level.  If running one more download in parallel doesn't
+    raise aggregate throughput by at least 10%, the link is saturated and
+    the limit drops so the most urgent download gets the bandwidth.  A
+    higher limit is retried every few downloads.
+    """
+
+    def __init__(self, max_concurrent: int = 2) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.limit = self.max_concurrent
+        self._seq = itertools.count()
+        self._waiting: dict[str, tuple[float, int, asyncio.Future[None]]] = {}
+        # key -> (start time, concurrency level when started)
+        self._active: dict[str, tuple[float, int]] = {}
+        self._throughput: dict[int, float] = {}
+        self._completed = 0
+
+    async def acquire(self, key: str, priority: float = 0) -> None:
+        """Wait for a slot for *key*."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[key] = (priority, next(self._seq), future)
+        self._grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            entry = self._waiting.get(key)
+            if entry is not None and entry[2] is future:
+                del self._waiting[key]
+            elif future.done() and not future.cancelled():
+                # Granted just before the cancellation landed
+                self.release(key)
+            raise
+
+    def release(self, key: str, nbytes: int = 0) -> None:
+        """Free *key*'s slot, recording *nbytes* transferred while it ran."""
+        entry = self._active.pop(key, None)
+        if entry is not None:
+            started, level = entry
+            elapsed = time.monotonic() - started
+            if nbytes and elapsed > 0:
+                self._record(level, nbytes / elapsed)
+        self._grant()
+
+    def set_priority(self, key: str, priority: float) -> None:
+        """Change the priority of a waiting *key*."""
+        entry = self._waiting.get(key)
+        if entry is not None:
+            self._waiting[key] = (priority, entry[1], entry[2])
+
+    def promote(self, key: str, priority: float) -> None:
+        """Lower a waiting *key*'s priority value to *priority* if more urgent."""
+        entry = self._waiting.get(key)
+        if entry is not None and priority < entry[0]:
+            self.set_priority(key, priority)
+
+    def is_active(self, key: str) -> bool:
+        return key in self._active
+
+    def _grant(self) -> None:
+        while self._waiting and len(self._active) < self.limit:
+            key = min(self._waiting, key=lambda k: self._waiting[k][:2])
+            _, _, future = self._waiting.pop(key)
+            if future.done():
+                continue
+            self._active[key] = (time.monotonic(), len(self._active) + 1)
+            future.set_result(None)
+
+    def _record(self, level: int, rate: float) -> None:
+        """Fold one download's rate into the aggregate for its level."""
+        self._completed += 1
+        aggregate = rate * level
+        previous = self._throughput.get(level)
+        self._throughput[level] = (
+            aggregate
+            if previous is None
+            else _EWMA_ALPHA * aggregate + (1 - _EWMA_ALPHA) * previous
+        )
+
+        below = self._throughput.get(self.limit - 1)
+        at = self._throughput.get(self.limit)
+        above = self._throughput.get(self.limit + 1)
+        if (
+            level == self.limit
+            and at is not None
+            and below is not None
+            and at < below * _MIN_GAIN
+        ):
+            self.limit -= 1
+        elif self.limit < self.max_concurrent and at is not None:
+            if (
+                above is None
+                or above >= at * _MIN_GAIN
+                or self._completed % _REPROBE_EVERY == 0
+            ):
+                self.limit += 1
+
+    def stats(self) -> dict[str, float]:
+        """Return slot usage, the current limit and measured throughput."""
+        return {
+            "active": len(self._active),
+            "waiting": len(self._waiting),
+            "limit": self.limit,
+            "completed": self._completed,
+            "throughput_bps": self._throughput.get(self.limit, 0.0),
+        }
@@ -1,53 +1,380 @@
 from __future__ import annotations
 
 import asyncio
+import os
 from collections.abc import Callable
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO
 
 import yt_dlp
 
+from yoke.download_scheduler import DownloadScheduler
+
+# Suffixes yt-dlp uses for files that are still being written
+_PARTIAL_SUFFIXES = frozenset({"part", "ytdl", "temp"})
+# Separate streams merged after download give the best quality
+_MERGED_FORMAT = "bestvideo[ext=webm]+bestaudio[ext=webm]/best[ext=webm]/best"
+# Single-file formats that are playable while still being written
+_PROGRESSIVE_FORMAT = "best[ext=mp4]/best[ext=webm]/best"
+# Bytes of a progressive download buffered before playback may start
+_STREAM_START_BYTES = 2 * 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class CachedVideo:
+    """A fully downloaded video file."""
+
+    path: Path
+    size: int
+    mtime: float
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the file is replaced."""
+        return f"{self.size}:{self.mtime}"
+
+
+@dataclass(frozen=True, slots=True)
+class PartialVideo:
+    """A progressive download in flight, as of its last progress report."""
+
+    path: Path
+    final_path: Path
+    downloaded: int
+    total: int | None
+
+
+def _parse_video_name(name: str) -> tuple[str, str] | None:
+    """Split ``{video_id}.{ext}`` into its parts, rejecting partial files.
+
+    yt-dlp names in-progress and per-format files like ``id.webm.part`` or
+    ``id.f137.mp4``; only a single extension marks a finished video.
+    """
+    video_id, dot, ext = name.partition(".")
+    if not dot or not video_id or "." in ext or ext in _PARTIAL_SUFFIXES:
+        return None
+    return video_id, ext
+
 
 class VideoDownloader:
-    def __init__(self, video_dir: Path, max_concurrent: int = 2) -> None:
+    """Downloads videos with yt-dlp into *video_dir* and tracks what's cached.
+
+    Cached files are kept in an in-memory index built from one directory
+    scan, so lookups don't touch the filesystem beyond a single stat of the
+    directory, which triggers a rescan when files were added or removed
+    behind the downloader's back.
+
+    yt-dlp downloads into a ``.partial`` subdirectory and finished files are
+    renamed into place, so a crash never leaves a truncated video that looks
+    cached.  Partial files are kept so a later attempt can resume them.
+
+    In *progressive* mode a single-file format is downloaded instead of
+    separate video and audio streams, so the file can be served while it
+    is still being written (see open_partial()).
+    """
+
+    def __init__(
+        self, video_dir: Path, max_concurrent: int = 2, progressive: bool = False
+    ) -> None:
         self._video_dir = video_dir
-        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # yt-dlp writes here; leftover .part files let a rerun resume
+        self._partial_dir = video_dir / ".partial"
+        # Audio-only streams fetched ahead of the video for key detection
+        self._audio_dir = video_dir / ".audio"
+        self.scheduler = DownloadScheduler(max_concurrent)
+        self.progressive = progressive
+        self._index: dict[str, CachedVideo] = {}
+        self._dir_mtime: int | None = None
+        # In-flight downloads and the progress callbacks waiting on them
+        self._inflight: dict[str, asyncio.Task[Path]] = {}
+        self._listeners: dict[str, list[Callable[[float], None]]] = {}
+        self._coalesced = 0
+        # Downloads to abort at the next yt-dlp progress callback
+        self._cancelled: set[str] = set()
+        # Progressive downloads that are writing their file
+        self._partial: dict[str, PartialVideo] = {}
 
     def ensure_dir(self) -> None:
         self._video_dir.mkdir(parents=True, exist_ok=True)
+        self._partial_dir.mkdir(exist_ok=True)
+
+    def scan(self) -> None:
+        """Rebuild the index from the contents of the video directory."""
+        index: dict[str, CachedVideo] = {}
+        try:
+            dir_mtime = self._video_dir.stat().st_mtime_ns
+            entries = list(os.scandir(self._video_dir))
+        except FileNotFoundError:
+            dir_mtime = None
+            entries = []
+        for entry in entries:
+            parsed = _parse_video_name(entry.name)
+            if parsed is None or not entry.is_file():
+                continue
+            st = entry.stat()
+            index[parsed[0]] = CachedVideo(
+                path=Path(entry.path), size=st.st_size, mtime=st.st_mtime
+            )
+        self._index = index
+        self._dir_mtime = dir_mtime
+
+    def _refresh(self) -> None:
+        try:
+            dir_mtime = self._video_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = None
+        if dir_mtime != self._dir_mtime:
+            self.scan()
+
+    def lookup(self, video_id: str) -> CachedVideo | None:
+        """Return the cached file for *video_id*, if there is one."""
+        self._refresh()
+        return self._index.get(video_id)
+
+    def cached_videos(self) -> dict[str, CachedVideo]:
+        """Return a snapshot of every cached video, keyed by video id."""
+        self._refresh()
+        return dict(self._index)
+
+    def remove(self, video_id: str) -> int:
+        """Delete a cached video and return the number of bytes freed."""
+        cached = self._index.pop(video_id, None)
+        if cached is None:
+            return 0
+        cached.path.unlink(missing_ok=True)
+        self._dir_mtime = self._video_dir.stat().st_mtime_ns
+        return cached.size
 
     def video_path(self, video_id: str) -> Path:
-        matches = list(self._video_dir.glob(f"{video_id}.*"))
-        if matches:
-            return matches[0]
+        cached = self.lookup(video_id)
+        if cached is not None:
+            return cached.path
         return self._video_dir / f"{video_id}.webm"
 
     def is_cached(self, video_id: str) -> bool:
-        return any(self._video_dir.glob(f"{video_id}.*"))
+        return self.lookup(video_id) is not None
+
+    def _commit_download(self, video_id: str) -> None:
+        """Move a finished download into the video directory and index it.
+
+        The rename is atomic, so the video directory only ever holds
+        complete files.
+        """
+        finished = [
+            path
+            for path in self._partial_dir.glob(f"{video_id}.*")
+            if _parse_video_name(path.name) is not None
+        ]
+        if not finished:
+            raise RuntimeError(f"yt-dlp produced no file for {video_id}")
+        target = self._video_dir / finished[0].name
+        os.replace(finished[0], target)
+        self.discard_partial(video_id)
+        st = target.stat()
+        self._index[video_id] = CachedVideo(
+            path=target, size=st.st_size, mtime=st.st_mtime
+        )
+        self._dir_mtime = self._video_dir.stat().st_mtime_ns
+        self._partial.pop(video_id, None)
+
+    def partial_downloads(self) -> set[str]:
+        """Return the ids of videos with files left in the partial directory."""
+        if not self._partial_dir.is_dir():
+            return set()
+        return {
+            entry.name.partition(".")[0]
+            for entry in os.scandir(self._partial_dir)
+            if entry.is_file()
+        }
+
+    def partial_video(self, video_id: str) -> PartialVideo | None:
+        """Return the in-flight progressive download of *video_id*, if any."""
+        return self._partial.get(video_id)
+
+    def is_streamable(self, video_id: str) -> bool:
+        """Whether enough of a progressive download is on disk to start playing."""
+        partial = self._partial.get(video_id)
+        if partial is None:
+            return False
+        needed = _STREAM_START_BYTES
+        if partial.total is not None:
+            needed = min(needed, partial.total)
+        return partial.downloaded >= needed
+
+    def open_partial(self, video_id: str) -> tuple[BinaryIO, PartialVideo] | None:
+        """Open the file of an in-flight progressive download for reading.
+
+        yt-dlp renames the file when it finishes and the downloader then
+        moves it into the video directory; an open file survives both
+        renames, so readers can keep following it to the end.  Returns None
+        if there's no such download, e.g. because it has just finished.
+        """
+        partial = self._partial.get(video_id)
+        if partial is None:
+            return None
+        for path in (partial.path, partial.final_path):
+            try:
+                return path.open("rb"), partial
+            except FileNotFoundError:
+                continue
+        return None
+
+    def discard_partial(self, video_id: str) -> None:
+        """Delete any partially downloaded files for *video_id*."""
+        for path in self._partial_dir.glob(f"{video_id}.*"):
+            path.unlink(missing_ok=True)
+
+    async def download_audio(self, video_id: str, priority: float = 0) -> Path:
+        """Fetch just the audio stream of *video_id* and return its path.
+
+        Much smaller than the video, so key detection can start within
+        seconds.  Waits for a scheduler slot in *priority* order like
+        download(), but doesn't count towards the throughput measurements.
+        Delete the file with discard_audio() once it has been analyzed.
+        """
+        key = f"audio:{video_id}"
+        await self.scheduler.acquire(key, priority)
+        try:
+            self._audio_dir.mkdir(parents=True, exist_ok=True)
+            opts: dict = {
+                "format": "bestaudio[ext=webm]/bestaudio",
+                "outtmpl": str(self._audio_dir / f"{video_id}.%(ext)s"),
+                "quiet": True,
+                "no_warnings": True,
+            }
+
+            def _do_download() -> None:
+                url = f"https://www.youtube.com/watch?v={video_id}"
+                with yt_dlp.YoutubeDL(opts) as ydl:
+                    ydl.download([url])
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _do_download)
+        finally:
+            self.scheduler.release(key)
+        for path in self._audio_dir.glob(f"{video_id}.*"):
+            if _parse_video_name(path.name) is not None:
+                return path
+        raise RuntimeError(f"yt-dlp produced no audio file for {video_id}")
+
+    def discard_audio(self, video_id: str) -> None:
+        """Delete audio-only files for *video_id*."""
+        for path in self._audio_dir.glob(f"{video_id}.*"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, float]:
+        """Return cached video totals and download de-duplication counts."""
+        return {
+            "videos": len(self._index),
+            "bytes": sum(v.size for v in self._index.values()),
+            "downloading": len(self._inflight),
+            "streaming": len(self._partial),
+            "coalesced": self._coalesced,
+        }
 
     async def download(
         self,
         video_id: str,
         on_progress: Callable[[float], None] | None = None,
+        priority: float = 0,
+    ) -> Path:
+        """Download *video_id* unless cached and return its path.
+
+        Downloads wait for a scheduler slot in *priority* order (lower
+        first).  Concurrent calls for the same video share one yt-dlp run
+        at the most urgent of their priorities; each caller's *on_progress*
+        receives that run's progress.  Cancelling a caller does not cancel
+        the shared download; use cancel() for that.
+        """
+        cached = self.lookup(video_id)
+        if cached is not None:
+            return cached.path
+
+        listeners = self._listeners.setdefault(video_id, [])
+        if on_progress is not None:
+            listeners.append(on_progress)
+        task = self._inflight.get(video_id)
+        if task is None:
+            task = asyncio.create_task(self._download(video_id, listeners, priority))
+            self._inflight[video_id] = task
+            task.add_done_callback(lambda _: self._finish(video_id))
+        else:
+            self._coalesced += 1
+            self.scheduler.promote(video_id, priority)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if on_progress is not None and on_progress in listeners:
+                listeners.remove(on_progress)
+
+    def reprioritize(self, priorities: dict[str, float]) -> None:
+        """Re-rank in-flight downloads; cancel those missing from *priorities*."""
+        for video_id in list(self._inflight):
+            if video_id in priorities:
+                self.scheduler.set_priority(video_id, priorities[video_id])
+            else:
+                self.cancel(video_id)
+
+    def cancel(self, video_id: str) -> bool:
+        """Abort the download of *video_id*; return False if none is running.
+
+        Waiting downloads are dropped at once; a running yt-dlp process is
+        stopped at its next progress report.  Callers awaiting the download
+        see asyncio.CancelledError.
+        """
+        task = self._inflight.get(video_id)
+        if task is None:
+            return False
+        if self.scheduler.is_active(video_id):
+            self._cancelled.add(video_id)
+        else:
+            task.cancel()
+        return True
+
+    def _finish(self, video_id: str) -> None:
+        self._inflight.pop(video_id, None)
+        self._listeners.pop(video_id, None)
+        self._cancelled.discard(video_id)
+        self._partial.pop(video_id, None)
+
+    async def _download(
+        self,
+        video_id: str,
+        listeners: list[Callable[[float], None]],
+        priority: float,
     ) -> Path:
-        async with self._semaphore:
+        await self.scheduler.acquire(video_id, priority)
+        nbytes = 0
+        try:
             if self.is_cached(video_id):
                 return self.video_path(video_id)
 
             self.ensure_dir()
 
             def _progress_hook(d: dict) -> None:
-                if on_progress is None:
-                    return
+                if video_id in self._cancelled:
+                    raise yt_dlp.utils.DownloadCancelled()
                 if d.get("status") != "downloading":
                     return
                 downloaded = d.get("downloaded_bytes", 0)
+                if self.progressive and d.get("filename"):
+                    final_path = Path(d["filename"])
+                    self._partial[video_id] = PartialVideo(
+                        path=Path(d.get("tmpfilename") or final_path),
+                        final_path=final_path,
+                        downloaded=downloaded,
+                        total=d.get("total_bytes"),
+                    )
                 total = d.get("total_bytes") or d.get("total_bytes_estimate")
                 if total:
-                    on_progress(downloaded / total)
+                    # Runs on the yt-dlp thread; iterate over a snapshot
+                    for listener in tuple(listeners):
+                        listener(downloaded / total)
 
             opts: dict = {
-                "format": "bestvideo[ext=webm]+bestaudio[ext=webm]/best[ext=webm]/best",
-                "outtmpl": str(self._video_dir / f"{video_id}.%(ext)s"),
+                "format": _PROGRESSIVE_FORMAT if self.progressive else _MERGED_FORMAT,
+                "outtmpl": str(self._partial_dir / f"{video_id}.%(ext)s"),
                 "quiet": True,
                 "no_warnings": True,
                 "progress_hooks": [_progress_hook],
@@ -59,6 +386,14 @@ class VideoDownloader:
                     ydl.download([url])
 
             loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, _do_download)
+            try:
+                await loop.run_in_executor(None, _do_download)
+            except yt_dlp.utils.DownloadCancelled:
+                self.discard_partial(video_id)
+                raise asyncio.CancelledError from None
 
+            self._commit_download(video_id)
+            nbytes = self._index[video_id].size
             return self.video_path(video_id)
+        finally:
+            self.scheduler.release(video_id, nbytes)
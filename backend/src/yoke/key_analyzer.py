@@ -2,7 +2,14 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 import numpy as np
@@ -27,32 +34,105 @@ _MINOR_PROFILE = np.array(
 _KEY_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
 
-def _detect_key_sync(path: Path) -> str | None:
-    """Detect the musical key of an audio file (blocking)."""
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            y, sr = librosa.load(str(path), sr=22050, mono=True, duration=60)
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        chroma_mean = chroma.mean(axis=1)
+def _zscore(x: np.ndarray) -> np.ndarray:
+    return (x - x.mean(axis=-1, keepdims=True)) / x.std(axis=-1, keepdims=True)
+
+
+# All 24 key profiles, rotated to each tonic and z-normalized, interleaved
+# major/minor per tonic (C, Cm, C#, C#m, ...) so ties resolve as before.
+# Pearson correlation with a z-normalized chroma vector is then a single
+# matrix-vector product divided by 12.
+KEY_LABELS = [label for name in _KEY_NAMES for label in (name, f"{name}m")]
+_KEY_PROFILES = _zscore(
+    np.array(
+        [
+            np.roll(profile, shift)
+            for shift in range(12)
+            for profile in (_MAJOR_PROFILE, _MINOR_PROFILE)
+        ]
+    )
+)
+
+
+def key_scores(chroma_mean: np.ndarray) -> np.ndarray:
+    """Correlate a 12-bin chroma vector with all 24 keys (KEY_LABELS order)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _KEY_PROFILES @ _zscore(chroma_mean) / 12
+
 
-        best_corr = -2.0
-        best_key = ""
+def _match_key(chroma_mean: np.ndarray) -> str:
+    """Return the best-correlated key, or "" if no key correlates (silence)."""
+    scores = key_scores(chroma_mean)
+    if not np.isfinite(scores).all():
+        return ""
+    return KEY_LABELS[int(np.argmax(scores))]
 
-        for shift in range(12):
-            rolled = np.roll(chroma_mean, -shift)
 
-            major_corr = float(np.corrcoef(rolled, _MAJOR_PROFILE)[0, 1])
-            if major_corr > best_corr:
-                best_corr = major_corr
-                best_key = _KEY_NAMES[shift]
+# Decoding parameters for key detection
+_SAMPLE_RATE = 22050
+_DURATION = 60.0
 
-            minor_corr = float(np.corrcoef(rolled, _MINOR_PROFILE)[0, 1])
-            if minor_corr > best_corr:
-                best_corr = minor_corr
-                best_key = f"{_KEY_NAMES[shift]}m"
 
-        return best_key
+def _load_audio(
+    path: Path,
+    sr: int = _SAMPLE_RATE,
+    offset: float = 0.0,
+    duration: float = _DURATION,
+) -> np.ndarray:
+    """Decode a window of mono float32 audio at *sr* Hz.
+
+    ffmpeg decodes only the audio stream, downmixes and resamples it, and
+    streams raw samples straight into a preallocated NumPy buffer.  Without
+    ffmpeg on PATH this falls back to librosa.load.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            y, _ = librosa.load(
+                str(path), sr=sr, mono=True, offset=offset, duration=duration
+            )
+        return y
+
+    cmd = [ffmpeg, "-nostdin", "-v", "error"]
+    cmd += ["-ss", str(offset), "-t", str(duration), "-i", str(path)]
+    # First audio stream only, mono, resampled, as raw little-endian floats
+    cmd += ["-map", "0:a:0", "-ac", "1", "-ar", str(sr), "-f", "f32le", "-"]
+    # One spare second in case ffmpeg's cut lands slightly past the window
+    buf = np.empty(int(sr * (duration + 1)), dtype=np.float32)
+    view = memoryview(buf).cast("B")
+    filled = 0
+    # stderr goes to a file: a corrupt input can log more errors than a pipe
+    # holds, and ffmpeg would block on it while we wait for stdout
+    with (
+        tempfile.TemporaryFile() as errors,
+        subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors) as proc,
+    ):
+        assert proc.stdout is not None
+        while filled < len(view):
+            n = proc.stdout.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+        if filled == len(view):
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        errors.seek(0)
+        stderr = errors.read()
+    if returncode != 0 and filled < len(view):
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    return buf[: min(filled // buf.itemsize, int(sr * duration))]
+
+
+def _detect_key_sync(
+    path: Path, offset: float = 0.0, duration: float = _DURATION
+) -> str | None:
+    """Detect the musical key of an audio file (blocking)."""
+    try:
+        y = _load_audio(path, offset=offset, duration=duration)
+        chroma = librosa.feature.chroma_cqt(y=y, sr=_SAMPLE_RATE)
+        return _match_key(chroma.mean(axis=1))
     except Exception:
         logger.exception("Key detection failed for %s", path)
         return None
@@ -62,3 +142,168 @@ async def detect_key(path: Path) -> str | None:
     """Detect the musical key of an audio file (async wrapper)."""
     loop = asyncio.get_running_loop()
     return await loop.run_in_executor(None, _detect_key_sync, path)
+
+
+def _timed_detect_key(path: Path, offset: float) -> tuple[str | None, float]:
+    """Run _detect_key_sync, also returning how long it took in seconds."""
+    start = time.perf_counter()
+    result = _detect_key_sync(path, offset=offset)
+    return result, time.perf_counter() - start
+
+
+def _warm_worker() -> None:
+    """Process pool initializer: run librosa once so later jobs start hot."""
+    try:
+        y = np.zeros(22050, dtype=np.float32)
+        librosa.feature.chroma_cqt(y=y, sr=22050)
+    except Exception:
+        logger.exception("Key analysis worker warm-up failed")
+
+
+def _terminate(pool: ProcessPoolExecutor) -> None:
+    """Shut *pool* down and kill its workers, busy ones included."""
+    terminate_workers = getattr(pool, "terminate_workers", None)
+    if terminate_workers is not None:
+        # Python 3.14+
+        terminate_workers()
+        return
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+class KeyAnalyzer:
+    """Runs key detection in a dedicated process pool.
+
+    Decoding and chroma extraction are CPU-bound and hold the GIL, so
+    running them in threads stalls the event loop.  Worker processes are
+    started with librosa already imported and warmed up.  At most
+    *max_pending* jobs queue for a free worker; further calls are rejected
+    and return None at once.  Cancelling a caller withdraws its job if it
+    hasn't started.
+
+    Jobs running longer than *timeout* seconds, or whose worker dies,
+    return None.  The pool is then replaced: its workers are terminated,
+    failing any other job still running on them, and new jobs get fresh
+    workers.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_pending: int = 16,
+        timeout: float = 120.0,
+        offset: float = 0.0,
+    ) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # Start of the analyzed audio window, in seconds
+        self.offset = offset
+        self._running = asyncio.Semaphore(workers)
+        # Calls running or waiting for a worker
+        self._pending = 0
+        self._rejected = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._jobs = 0
+        self._failures = 0
+        self._cancelled = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        self._last_run_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+        # Spawn every worker now rather than on the first songs
+        for _ in range(self.workers):
+            self._pool.submit(time.sleep, 0)
+
+    def close(self) -> None:
+        """Stop the workers, dropping queued jobs."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def detect(self, path: Path) -> str | None:
+        """Detect the musical key of an audio file in a worker process.
+
+        Returns None if detection fails, times out or the queue is full.
+        """
+        if self._pending >= self.workers + self.max_pending:
+            self._rejected += 1
+            logger.warning("Key detection queue is full; skipping %s", path)
+            return None
+        self._pending += 1
+        try:
+            return await self._detect(path)
+        finally:
+            self._pending -= 1
+
+    async def _detect(self, path: Path) -> str | None:
+        submitted = time.perf_counter()
+        async with self._running:
+            self.start()
+            pool = self._pool
+            assert pool is not None
+            try:
+                # Only submitted once a worker is free, so cancelling a waiting
+                # caller withdraws the job and the timeout covers run time only
+                future = pool.submit(_timed_detect_key, path, self.offset)
+                result, run_seconds = await asyncio.wait_for(
+                    asyncio.wrap_future(future), self.timeout
+                )
+            except TimeoutError:
+                self._timeouts += 1
+                logger.warning(
+                    "Key detection timed out for %s; replacing the workers", path
+                )
+                self._recycle(pool)
+                return None
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash in a native library)
+                self._failures += 1
+                logger.warning(
+                    "Key detection worker died on %s; replacing the workers", path
+                )
+                self._recycle(pool)
+                return None
+            except asyncio.CancelledError:
+                self._cancelled += 1
+                raise
+        self._jobs += 1
+        self._run_seconds += run_seconds
+        self._wait_seconds += time.perf_counter() - submitted - run_seconds
+        self._last_run_seconds = run_seconds
+        if result is None:
+            self._failures += 1
+        return result
+
+    def _recycle(self, pool: ProcessPoolExecutor) -> None:
+        """Terminate *pool*; the next job starts a new one."""
+        if self._pool is pool:
+            # Not already replaced after another job on it failed
+            self._pool = None
+        _terminate(pool)
+
+    def stats(self) -> dict[str, float]:
+        """Return job counts and timings in milliseconds."""
+        return {
+            "workers": self.workers,
+            "jobs": self._jobs,
+            "failures": self._failures,
+            "cancelled": self._cancelled,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+            "avg_run_ms": self._run_seconds / self._jobs * 1000 if self._jobs else 0,
+            "avg_wait_ms": self._wait_seconds / self._jobs * 1000 if self._jobs else 0,
+            "last_run_ms": self._last_run_seconds * 1000,
+        }
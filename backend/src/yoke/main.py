@@ -8,14 +8,25 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 import redis.asyncio as aioredis
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response
 
 from yoke.config import config
 from yoke.downloader import VideoDownloader
+from yoke.key_analyzer import KeyAnalyzer
+from yoke.page_cache import PageCacheWarmer
 from yoke.redis_store import RedisStore
 from yoke.router import MessageRouter
+from yoke.search_cache import SearchCache
 from yoke.session import SessionManager
+from yoke.state_cache import CachedRedisStore
+from yoke.streaming import (
+    FirstByteMiddleware,
+    FirstByteStats,
+    serve_file,
+    stream_partial,
+)
+from yoke.video_cache import VideoCache
 from yoke.ws import ConnectionManager
 
 logger = logging.getLogger(__name__)
@@ -47,31 +58,78 @@ def _get_local_ip() -> str:
         return "localhost"
 
 
-connections = ConnectionManager()
+connections = ConnectionManager(
+    send_timeout=config.ws_send_timeout, queue_size=config.ws_queue_size
+)
 router: MessageRouter | None = None
+video_requests = FirstByteStats()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
     global router
     redis = aioredis.from_url(config.redis_url)
-    store = RedisStore(redis)
+    store = CachedRedisStore(redis) if config.state_cache else RedisStore(redis)
+    migrated = await store.migrate_legacy_queue()
+    if migrated:
+        logger.info("Migrated %d queue items to the indexed queue layout", migrated)
+    if isinstance(store, CachedRedisStore):
+        await store.load()
     session = SessionManager(store)
     downloader = VideoDownloader(
         video_dir=config.video_dir,
         max_concurrent=config.max_concurrent_downloads,
+        progressive=config.progressive,
     )
     downloader.ensure_dir()
+    downloader.scan()
+    video_cache = VideoCache(
+        downloader,
+        store,
+        max_bytes=config.video_cache_max_bytes,
+        policy=config.video_cache_policy,
+    )
+    await video_cache.load()
+    await video_cache.enforce()
+    key_analyzer = KeyAnalyzer(workers=config.key_workers, offset=config.key_offset)
+    key_analyzer.start()
+    page_cache = (
+        PageCacheWarmer(lookahead=config.page_cache_lookahead)
+        if config.page_cache_warmup
+        else None
+    )
     router = MessageRouter(
-        session=session, connections=connections, downloader=downloader
+        session=session,
+        connections=connections,
+        downloader=downloader,
+        update_interval=config.update_interval,
+        position_persist_interval=config.position_persist_interval,
+        search_cache=SearchCache(
+            store,
+            ttl=config.search_cache_ttl,
+            max_entries=config.search_cache_size,
+        ),
+        video_cache=video_cache,
+        prefetch_lookahead=config.prefetch_lookahead,
+        key_analyzer=key_analyzer,
+        audio_first=config.audio_first,
+        page_cache=page_cache,
     )
+    await router.reconcile_downloads()
     app.state.store = store
     app.state.downloader = downloader
     yield
+    await router.close()
+    key_analyzer.close()
+    if page_cache is not None:
+        page_cache.close()
+    if isinstance(store, CachedRedisStore):
+        await store.close()
     await redis.aclose()
 
 
 app = FastAPI(title="Yoke", version="0.1.0", lifespan=lifespan)
+app.add_middleware(FirstByteMiddleware, stats=video_requests, path_prefix="/videos/")
 
 
 @app.get("/health")
@@ -84,39 +142,63 @@ async def server_info() -> dict[str, str]:
     return {"ip": _get_local_ip(), "port": str(config.port)}
 
 
-@app.get("/videos/{video_id}", response_model=None)
-async def serve_video(video_id: str) -> FileResponse | JSONResponse:
+@app.get("/api/stats")
+async def stats() -> dict[str, dict[str, float]]:
+    stats: dict[str, dict[str, float]] = {
+        "connections": connections.stats(),
+        "video_requests": video_requests.stats(),
+    }
+    if router:
+        stats["live_updates"] = router.updates.stats()
+        stats["downloads"] = router.downloader.scheduler.stats()
+        if router.key_analyzer is not None:
+            stats["key_analysis"] = router.key_analyzer.stats()
+        if router.video_cache is not None:
+            stats["videos"] = router.video_cache.stats()
+        else:
+            stats["videos"] = router.downloader.stats()
+        if router.search_cache is not None:
+            stats["search_cache"] = router.search_cache.stats()
+        if router.page_cache is not None:
+            stats["page_cache"] = router.page_cache.stats()
+    return stats
+
+
+@app.api_route("/videos/{video_id}", methods=["GET", "HEAD"], response_model=None)
+async def serve_video(video_id: str, request: Request) -> Response:
     downloader: VideoDownloader | None = getattr(app.state, "downloader", None)
     if downloader is None:
         return JSONResponse(status_code=503, content={"detail": "Service not ready"})
 
-    if not downloader.is_cached(video_id):
-        return JSONResponse(status_code=404, content={"detail": "Video not found"})
-
-    path = downloader.video_path(video_id)
-    return FileResponse(path, media_type="video/webm")
+    cached = downloader.lookup(video_id)
+    if cached is None:
+        # A progressive download can be watched while it's being written
+        opened = downloader.open_partial(video_id)
+        if opened is not None:
+            file, partial = opened
+            return stream_partial(
+                downloader, video_id, file, partial, request.headers.get("range")
+            )
+        cached = downloader.lookup(video_id)
+    if cached is not None:
+        try:
+            return await serve_file(cached.path, request.headers)
+        except FileNotFoundError:
+            pass
+    return JSONResponse(status_code=404, content={"detail": "Video not found"})
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket) -> None:
     await websocket.accept()
-    connections.connect(websocket, singer_id=None)
+    connections.connect(
+        websocket, singer_id=None, role=websocket.query_params.get("role", "control")
+    )
 
     try:
         # Send full state to every new connection (needed for display page)
         if router:
-            state = await router.session.store.get_full_state()
-            await connections.send_to(
-                websocket,
-                {
-                    "type": "state",
-                    "singers": [s.model_dump() for s in state.singers],
-                    "queue": [item.model_dump() for item in state.queue],
-                    "current": state.current.model_dump() if state.current else None,
-                    "playback": state.playback.model_dump(),
-                    "settings": state.settings.model_dump(),
-                },
-            )
+            await connections.send_to(websocket, await router.build_state_message())
 
         while True:
             data = await websocket.receive_json()
@@ -132,7 +214,7 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
         if singer_id and router:
             # Only mark as disconnected if no other connection exists for this singer
             # (prevents race where old connection cleanup runs after a rejoin)
-            if connections.get_by_singer_id(singer_id) is None:
+            if not connections.is_singer_connected(singer_id):
                 await router.session.disconnect(singer_id)
 
 
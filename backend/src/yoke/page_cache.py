@@ -0,0 +1,111 @@
+"""OS page cache hints for the videos about to be played."""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+# Without posix_fadvise (macOS), read this much of each file instead
+_TOUCH_BYTES = 16 * 1024 * 1024
+_TOUCH_CHUNK = 1024 * 1024
+
+
+def _advise(path: Path, advice: int) -> int:
+    """Apply posix_fadvise *advice* to all of *path*; return its size."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+        return os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+
+def _touch(path: Path) -> int:
+    """Read the start of *path* so its first seconds come from memory."""
+    nbytes = 0
+    with path.open("rb", buffering=0) as f:
+        while nbytes < _TOUCH_BYTES:
+            chunk = f.read(_TOUCH_CHUNK)
+            if not chunk:
+                break
+            nbytes += len(chunk)
+    return nbytes
+
+
+class PageCacheWarmer:
+    """Keeps the current and upcoming videos in the OS page cache.
+
+    update() is given the files that should be warm: newly listed ones get
+    ``POSIX_FADV_WILLNEED`` so the kernel reads them ahead in the
+    background, and ones that dropped off get ``POSIX_FADV_DONTNEED`` so
+    finished videos don't crowd them out.  Where posix_fadvise is missing,
+    the first 16 MiB of a file is read instead and nothing is dropped.
+
+    Hints run one at a time on a dedicated thread, since they can block on
+    a slow disk.
+    """
+
+    def __init__(self, lookahead: int = 2) -> None:
+        # Number of queued videos warmed in addition to the current one
+        self.lookahead = lookahead
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="page-cache"
+        )
+        self._warm: dict[str, Path] = {}
+        self._warmed = 0
+        self._dropped = 0
+        self._bytes_warmed = 0
+        self._failed = 0
+
+    def update(self, paths: dict[str, Path]) -> None:
+        """Make *paths* (video id -> file) the warm set."""
+        for video_id, path in paths.items():
+            if self._warm.get(video_id) != path:
+                self._executor.submit(self._run, self._warm_file, path)
+        for video_id, path in self._warm.items():
+            if video_id not in paths:
+                self._executor.submit(self._run, self._drop_file, path)
+        self._warm = dict(paths)
+
+    def close(self) -> None:
+        """Stop the hint thread, abandoning hints not yet applied."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, hint: Callable[[Path], None], path: Path) -> None:
+        try:
+            hint(path)
+        except FileNotFoundError:
+            # Evicted or re-downloaded since it was listed
+            pass
+        except OSError:
+            self._failed += 1
+            logger.warning("Page cache hint failed for %s", path, exc_info=True)
+
+    def _warm_file(self, path: Path) -> None:
+        if _HAS_FADVISE:
+            nbytes = _advise(path, os.POSIX_FADV_WILLNEED)
+        else:
+            nbytes = _touch(path)
+        self._warmed += 1
+        self._bytes_warmed += nbytes
+
+    def _drop_file(self, path: Path) -> None:
+        if _HAS_FADVISE:
+            _advise(path, os.POSIX_FADV_DONTNEED)
+            self._dropped += 1
+
+    def stats(self) -> dict[str, float]:
+        """Return how many files were warmed and dropped."""
+        return {
+            "warm": len(self._warm),
+            "warmed": self._warmed,
+            "dropped": self._dropped,
+            "bytes_warmed": self._bytes_warmed,
+            "failed": self._failed,
+        }
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+from dataclasses import asdict
 from typing import TYPE_CHECKING
 
 from yoke.models import (
@@ -10,12 +12,33 @@ from yoke.models import (
     Singer,
     Song,
 )
+from yoke.youtube import YoutubeResult
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
+    from redis.asyncio.client import Pipeline
 
 PREFIX = "yoke"
 
+_LEGACY_QUEUE = f"{PREFIX}:queue"
+_QUEUE_ORDER = f"{PREFIX}:queue:order"
+_QUEUE_ITEMS = f"{PREFIX}:queue:items"
+_QUEUE_HEAD = f"{PREFIX}:queue:head"
+_QUEUE_TAIL = f"{PREFIX}:queue:tail"
+_VIDEO_PLAYS = f"{PREFIX}:videos:plays"
+_VIDEO_LAST_PLAYED = f"{PREFIX}:videos:last_played"
+_DOWNLOADS = f"{PREFIX}:downloads"
+_KEY_ANALYSES = f"{PREFIX}:keys"
+
+
+def _decode_queue(ids: list[bytes], bodies: dict[bytes, bytes]) -> list[QueueItem]:
+    """Build an ordered queue from sorted-set ids and the item-body hash."""
+    return [
+        QueueItem.model_validate_json(bodies[item_id])
+        for item_id in ids
+        if item_id in bodies
+    ]
+
 
 class RedisStore:
     def __init__(self, redis: Redis) -> None:  # type: ignore[type-arg]
@@ -50,38 +73,228 @@ class RedisStore:
             return None
         return Song.model_validate_json(data)
 
+    async def save_songs(self, songs: list[Song]) -> None:
+        """Save many songs in a single round trip."""
+        if not songs:
+            return
+        await self._r.mset(
+            {
+                f"{PREFIX}:songs:{song.video_id}": song.model_dump_json()
+                for song in songs
+            }
+        )
+
+    async def get_songs(self, video_ids: list[str]) -> dict[str, Song]:
+        """Return the known songs among *video_ids*, keyed by video id."""
+        if not video_ids:
+            return {}
+        values = await self._r.mget([f"{PREFIX}:songs:{vid}" for vid in video_ids])
+        return {
+            vid: Song.model_validate_json(data)
+            for vid, data in zip(video_ids, values, strict=True)
+            if data is not None
+        }
+
+    # --- Key analysis results ---
+    #
+    # Stored separately from the song registry, which search overwrites,
+    # and tagged with a fingerprint of the analyzed file.
+
+    async def save_key_analysis(
+        self, video_id: str, fingerprint: str, key: str | None
+    ) -> None:
+        await self._r.hset(
+            _KEY_ANALYSES,
+            video_id,
+            json.dumps({"fingerprint": fingerprint, "key": key}),
+        )
+
+    async def get_key_analyses(
+        self, video_ids: list[str]
+    ) -> dict[str, tuple[str, str | None]]:
+        """Return (fingerprint, key) for each analyzed video among *video_ids*."""
+        if not video_ids:
+            return {}
+        values = await self._r.hmget(_KEY_ANALYSES, video_ids)
+        result: dict[str, tuple[str, str | None]] = {}
+        for video_id, data in zip(video_ids, values, strict=True):
+            if data is not None:
+                entry = json.loads(data)
+                result[video_id] = (entry["fingerprint"], entry["key"])
+        return result
+
+    # --- Video usage (for cache eviction) ---
+
+    async def record_play(self, video_id: str, played_at: float) -> None:
+        pipe = self._r.pipeline(transaction=False)
+        pipe.hincrby(_VIDEO_PLAYS, video_id, 1)
+        pipe.hset(_VIDEO_LAST_PLAYED, video_id, played_at)
+        await pipe.execute()
+
+    async def get_video_usage(self) -> tuple[dict[str, int], dict[str, float]]:
+        """Return (play counts, last-played timestamps) keyed by video id."""
+        pipe = self._r.pipeline(transaction=False)
+        pipe.hgetall(_VIDEO_PLAYS)
+        pipe.hgetall(_VIDEO_LAST_PLAYED)
+        plays, last_played = await pipe.execute()
+        return (
+            {k.decode(): int(v) for k, v in plays.items()},
+            {k.decode(): float(v) for k, v in last_played.items()},
+        )
+
+    # --- In-flight downloads (for recovery after a restart) ---
+
+    async def add_inflight_download(self, video_id: str, started_at: float) -> None:
+        await self._r.hset(_DOWNLOADS, video_id, started_at)
+
+    async def remove_inflight_download(self, video_id: str) -> None:
+        await self._r.hdel(_DOWNLOADS, video_id)
+
+    async def get_inflight_downloads(self) -> list[str]:
+        return [k.decode() for k in await self._r.hkeys(_DOWNLOADS)]
+
+    # --- Search results cache ---
+
+    async def get_search_results(
+        self, query: str, max_results: int
+    ) -> tuple[list[YoutubeResult], float] | None:
+        """Return cached results and the seconds until they expire."""
+        key = f"{PREFIX}:search:{max_results}:{query}"
+        pipe = self._r.pipeline(transaction=True)
+        pipe.get(key)
+        pipe.pttl(key)
+        data, ttl_ms = await pipe.execute()
+        if data is None:
+            return None
+        return [YoutubeResult(**r) for r in json.loads(data)], max(ttl_ms, 0) / 1000
+
+    async def save_search_results(
+        self, query: str, max_results: int, results: list[YoutubeResult], ttl: int
+    ) -> None:
+        await self._r.set(
+            f"{PREFIX}:search:{max_results}:{query}",
+            json.dumps([asdict(r) for r in results]),
+            ex=ttl,
+        )
+
     # --- Queue ---
+    #
+    # The queue is stored as a sorted set of item ids (ordered by score) plus
+    # a hash of item id -> QueueItem JSON, so single-item operations never
+    # rewrite the whole queue.  Appends take scores from an increasing tail
+    # counter and prepends from a decreasing head counter.
 
     async def get_queue(self) -> list[QueueItem]:
-        data = await self._r.lrange(f"{PREFIX}:queue", 0, -1)
-        return [QueueItem.model_validate_json(item) for item in data]
+        pipe = self._r.pipeline(transaction=True)
+        pipe.zrange(_QUEUE_ORDER, 0, -1)
+        pipe.hgetall(_QUEUE_ITEMS)
+        ids, bodies = await pipe.execute()
+        return _decode_queue(ids, bodies)
 
     async def append_to_queue(self, item: QueueItem) -> None:
-        await self._r.rpush(f"{PREFIX}:queue", item.model_dump_json())
+        score = await self._r.incr(_QUEUE_TAIL)
+        await self._add_to_queue(item, score)
+
+    async def prepend_to_queue(self, item: QueueItem) -> None:
+        score = await self._r.decr(_QUEUE_HEAD)
+        await self._add_to_queue(item, score)
+
+    async def _add_to_queue(self, item: QueueItem, score: int) -> None:
+        pipe = self._r.pipeline(transaction=True)
+        pipe.hset(_QUEUE_ITEMS, item.id, item.model_dump_json())
+        pipe.zadd(_QUEUE_ORDER, {item.id: score})
+        await pipe.execute()
 
     async def remove_from_queue(self, item_id: str) -> None:
-        queue = await self.get_queue()
-        await self._r.delete(f"{PREFIX}:queue")
-        for item in queue:
-            if item.id != item_id:
-                await self._r.rpush(f"{PREFIX}:queue", item.model_dump_json())
+        pipe = self._r.pipeline(transaction=True)
+        pipe.zrem(_QUEUE_ORDER, item_id)
+        pipe.hdel(_QUEUE_ITEMS, item_id)
+        await pipe.execute()
+
+    async def pop_queue_front(self) -> QueueItem | None:
+        """Atomically remove and return the first item in the queue."""
+
+        async def _pop(pipe: Pipeline) -> bytes | None:  # type: ignore[type-arg]
+            ids = await pipe.zrange(_QUEUE_ORDER, 0, 0)
+            if not ids:
+                return None
+            item_id = ids[0]
+            data = await pipe.hget(_QUEUE_ITEMS, item_id)
+            pipe.multi()
+            pipe.zrem(_QUEUE_ORDER, item_id)
+            pipe.hdel(_QUEUE_ITEMS, item_id)
+            return data
+
+        data = await self._r.transaction(
+            _pop, _QUEUE_ORDER, _QUEUE_ITEMS, value_from_callable=True
+        )
+        if data is None:
+            return None
+        return QueueItem.model_validate_json(data)
 
     async def reorder_queue(self, item_ids: list[str]) -> None:
-        queue = await self.get_queue()
-        by_id = {item.id: item for item in queue}
-        await self._r.delete(f"{PREFIX}:queue")
-        for item_id in item_ids:
-            if item_id in by_id:
-                await self._r.rpush(f"{PREFIX}:queue", by_id[item_id].model_dump_json())
+        """Reorder the queue to match *item_ids*.
+
+        Unknown ids are ignored; queued items missing from *item_ids* are
+        dropped, matching the semantics of a full queue rewrite.
+        """
+
+        async def _reorder(pipe: Pipeline) -> None:  # type: ignore[type-arg]
+            current = {
+                i.decode() if isinstance(i, bytes) else i
+                for i in await pipe.zrange(_QUEUE_ORDER, 0, -1)
+            }
+            order: dict[str, int] = {}
+            for item_id in item_ids:
+                if item_id in current and item_id not in order:
+                    order[item_id] = len(order) + 1
+            dropped = current - order.keys()
+
+            pipe.multi()
+            pipe.delete(_QUEUE_ORDER)
+            if order:
+                pipe.zadd(_QUEUE_ORDER, order)
+            if dropped:
+                pipe.hdel(_QUEUE_ITEMS, *dropped)
+            pipe.set(_QUEUE_TAIL, len(order))
+            pipe.delete(_QUEUE_HEAD)
+
+        await self._r.transaction(_reorder, _QUEUE_ORDER)
 
     async def update_queue_item(self, item_id: str, **fields: object) -> None:
-        queue = await self.get_queue()
-        await self._r.delete(f"{PREFIX}:queue")
-        for item in queue:
-            if item.id == item_id:
-                for k, v in fields.items():
-                    setattr(item, k, v)
-            await self._r.rpush(f"{PREFIX}:queue", item.model_dump_json())
+        async def _update(pipe: Pipeline) -> None:  # type: ignore[type-arg]
+            data = await pipe.hget(_QUEUE_ITEMS, item_id)
+            if data is None:
+                pipe.multi()
+                return
+            item = QueueItem.model_validate_json(data)
+            for k, v in fields.items():
+                setattr(item, k, v)
+            pipe.multi()
+            pipe.hset(_QUEUE_ITEMS, item_id, item.model_dump_json())
+
+        await self._r.transaction(_update, _QUEUE_ITEMS)
+
+    async def migrate_legacy_queue(self) -> int:
+        """Move items from the pre-index ``yoke:queue`` list into the new layout.
+
+        Returns the number of items migrated.  Safe to call on every startup;
+        it is a no-op once the legacy list is gone.
+        """
+        if await self._r.type(_LEGACY_QUEUE) not in (b"list", "list"):
+            return 0
+
+        data = await self._r.lrange(_LEGACY_QUEUE, 0, -1)
+        items = [QueueItem.model_validate_json(raw) for raw in data]
+        pipe = self._r.pipeline(transaction=True)
+        for item in items:
+            pipe.hset(_QUEUE_ITEMS, item.id, item.model_dump_json())
+        if items:
+            pipe.zadd(_QUEUE_ORDER, {item.id: i + 1 for i, item in enumerate(items)})
+        pipe.set(_QUEUE_TAIL, len(items))
+        pipe.delete(_LEGACY_QUEUE)
+        await pipe.execute()
+        return len(items)
 
     # --- History ---
 
@@ -98,11 +311,6 @@ class RedisStore:
             return None
         return QueueItem.model_validate_json(data)
 
-    # --- Queue (prepend) ---
-
-    async def prepend_to_queue(self, item: QueueItem) -> None:
-        await self._r.lpush(f"{PREFIX}:queue", item.model_dump_json())
-
     # --- Current item ---
 
     async def save_current(self, item: QueueItem) -> None:
@@ -142,15 +350,38 @@ class RedisStore:
     # --- Full state ---
 
     async def get_full_state(self) -> SessionState:
-        singers = await self.get_all_singers()
-        queue = await self.get_queue()
-        current = await self.get_current()
-        playback = await self.get_playback()
-        settings = await self.get_settings()
+        """Return a point-in-time snapshot of the session in one round trip.
+
+        All reads are queued in a single MULTI/EXEC block so the queue,
+        current item and playback state always come from the same moment.
+        """
+        pipe = self._r.pipeline(transaction=True)
+        pipe.hgetall(f"{PREFIX}:singers")
+        pipe.zrange(_QUEUE_ORDER, 0, -1)
+        pipe.hgetall(_QUEUE_ITEMS)
+        pipe.get(f"{PREFIX}:current")
+        pipe.get(f"{PREFIX}:playback")
+        pipe.get(f"{PREFIX}:settings")
+        (
+            singers,
+            queue_ids,
+            queue_bodies,
+            current,
+            playback,
+            settings,
+        ) = await pipe.execute()
         return SessionState(
-            singers=singers,
-            queue=queue,
-            current=current,
-            playback=playback,
-            settings=settings,
+            singers=[Singer.model_validate_json(v) for v in singers.values()],
+            queue=_decode_queue(queue_ids, queue_bodies),
+            current=QueueItem.model_validate_json(current) if current else None,
+            playback=(
+                PlaybackState.model_validate_json(playback)
+                if playback
+                else PlaybackState()
+            ),
+            settings=(
+                SessionSettings.model_validate_json(settings)
+                if settings
+                else SessionSettings()
+            ),
         )
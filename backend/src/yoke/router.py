@@ -1,22 +1,86 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import logging
+import time
+from collections.abc import Coroutine
+from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
+from yoke.coalescer import UpdateCoalescer
 from yoke.key_analyzer import detect_key
-from yoke.models import Song
+from yoke.models import PlaybackState, QueueItem, Song
 from yoke.youtube import search_youtube
 
 if TYPE_CHECKING:
     from fastapi import WebSocket
 
     from yoke.downloader import VideoDownloader
+    from yoke.key_analyzer import KeyAnalyzer
+    from yoke.page_cache import PageCacheWarmer
+    from yoke.search_cache import SearchCache
     from yoke.session import SessionManager
+    from yoke.video_cache import VideoCache
     from yoke.ws import ConnectionManager
 
 logger = logging.getLogger(__name__)
 
+# Failed downloads are retried until they have failed this many times
+_MAX_DOWNLOAD_ATTEMPTS = 3
+# Seconds before the first retry of a failed download, doubling each time
+_DOWNLOAD_RETRY_DELAY = 2.0
+# Key detections that fail (timeout, decode error) are retried this often
+_MAX_KEY_ATTEMPTS = 3
+# Fingerprint of key results found from the audio-only stream, which hold
+# for whichever video file is downloaded later
+_AUDIO_FINGERPRINT = "audio"
+# Reorders changing more items than this resend the whole queue instead
+_MAX_REORDER_CHANGES = 16
+
+
+def _queue_moves(old_ids: list[str], new_ids: list[str]) -> list[tuple[str, int]]:
+    """Return the (item_id, index) moves that turn *old_ids* into *new_ids*.
+
+    Both lists must contain the same ids.  Applying each move in order
+    (remove the item, re-insert it at index) reproduces *new_ids*.  Items on
+    a longest increasing subsequence stay put, so a single drag-and-drop
+    always becomes a single move.
+    """
+    old_pos = {item_id: i for i, item_id in enumerate(old_ids)}
+    seq = [old_pos[item_id] for item_id in new_ids]
+
+    # Longest increasing subsequence of old positions, in new-list order
+    tails: list[int] = []
+    tail_idx: list[int] = []
+    prev = [-1] * len(seq)
+    for i, pos in enumerate(seq):
+        j = bisect.bisect_left(tails, pos)
+        if j == len(tails):
+            tails.append(pos)
+            tail_idx.append(i)
+        else:
+            tails[j] = pos
+            tail_idx[j] = i
+        prev[i] = tail_idx[j - 1] if j else -1
+    keep: set[int] = set()
+    k = tail_idx[-1] if tail_idx else -1
+    while k != -1:
+        keep.add(k)
+        k = prev[k]
+
+    # Place every other item right after its new predecessor
+    current = list(old_ids)
+    moves: list[tuple[str, int]] = []
+    for i, item_id in enumerate(new_ids):
+        if i in keep:
+            continue
+        current.remove(item_id)
+        index = current.index(new_ids[i - 1]) + 1 if i else 0
+        current.insert(index, item_id)
+        moves.append((item_id, index))
+    return moves
+
 
 class MessageRouter:
     """Routes incoming WebSocket messages to the appropriate handler."""
@@ -26,10 +90,42 @@ class MessageRouter:
         session: SessionManager,
         connections: ConnectionManager,
         downloader: VideoDownloader,
+        update_interval: float = 0.25,
+        position_persist_interval: float = 5.0,
+        search_cache: SearchCache | None = None,
+        video_cache: VideoCache | None = None,
+        prefetch_lookahead: int = 3,
+        key_analyzer: KeyAnalyzer | None = None,
+        audio_first: bool = False,
+        page_cache: PageCacheWarmer | None = None,
     ) -> None:
         self.session = session
         self.connections = connections
         self.downloader = downloader
+        self.search_cache = search_cache
+        self.video_cache = video_cache
+        self.key_analyzer = key_analyzer
+        self.page_cache = page_cache
+        # Fetch the audio stream first so the key is known early
+        self.audio_first = audio_first
+        # Bumped on every queue diff so clients can detect missed messages
+        self.queue_rev = 0
+        # position_update / download_progress are coalesced and rate-limited
+        self.updates = UpdateCoalescer(connections, interval=update_interval)
+        # Latest reported position, persisted lazily
+        self.position_persist_interval = position_persist_interval
+        self._pending_position: float | None = None
+        self._position_saved_at = 0.0
+        # The first prefetch_lookahead queue items are kept downloaded and
+        # analyzed; ready_horizon counts the ready items at the queue front
+        self.prefetch_lookahead = prefetch_lookahead
+        self.ready_horizon = 0
+        self._downloads: dict[str, asyncio.Task[None]] = {}
+        self._download_failures: dict[str, int] = {}
+        self._key_failures: dict[str, int] = {}
+        self._analyzing: set[str] = set()
+        # Fire-and-forget work, kept referenced until it finishes
+        self._background: set[asyncio.Task[Any]] = set()
 
     async def handle(self, ws: WebSocket, message: dict[str, Any]) -> None:
         """Dispatch a message to the handler matching message['type']."""
@@ -59,28 +155,13 @@ class MessageRouter:
         result = await self.session.join(name, singer_id=singer_id)
         singer = result.singer
 
-        # Evict any stale WebSocket for this singer before registering the new one
-        old_ws = self.connections.get_by_singer_id(singer.id)
-        if old_ws is not None and old_ws is not ws:
-            self.connections.disconnect(old_ws)
-
-        # Associate this websocket with the singer
-        ws.singer_id = singer.id  # type: ignore[attr-defined]
+        # Associate this websocket with the singer.  Earlier tabs of the same
+        # singer stay registered; each is dropped when its socket closes.
         self.connections.connect(ws, singer.id)
 
         # Send the full state to the new client, including their own singer ID
-        state = await self.session.store.get_full_state()
         await self.connections.send_to(
-            ws,
-            {
-                "type": "state",
-                "singer_id": singer.id,
-                "singers": [s.model_dump() for s in state.singers],
-                "queue": [item.model_dump() for item in state.queue],
-                "current": state.current.model_dump() if state.current else None,
-                "playback": state.playback.model_dump(),
-                "settings": state.settings.model_dump(),
-            },
+            ws, await self.build_state_message(singer_id=singer.id)
         )
 
         # Only broadcast to others for genuinely new singers, not reconnects
@@ -101,27 +182,36 @@ class MessageRouter:
             )
             return
 
-        results = await search_youtube(query)
-        songs = []
-        for r in results:
-            cached = self.downloader.is_cached(r.video_id)
-            song = Song(
+        if self.search_cache is not None:
+            results = await self.search_cache.search(query)
+        else:
+            results = await search_youtube(query)
+        analyses = await self.session.store.get_key_analyses(
+            [r.video_id for r in results]
+        )
+        songs = [
+            Song(
                 video_id=r.video_id,
                 title=r.title,
                 thumbnail_url=r.thumbnail_url,
                 duration_seconds=r.duration_seconds,
-                cached=cached,
+                cached=self.downloader.is_cached(r.video_id),
+                detected_key=analyses[r.video_id][1]
+                if r.video_id in analyses
+                else None,
             )
-            await self.session.store.save_song(song)
-            songs.append(song.model_dump())
+            for r in results
+        ]
 
         await self.connections.send_to(
             ws,
             {
                 "type": "search_results",
-                "songs": songs,
+                "songs": [song.model_dump() for song in songs],
             },
         )
+        # Persist metadata after replying so it doesn't add to search latency
+        self._spawn(self.session.store.save_songs(songs))
 
     async def _handle_queue_song(self, ws: WebSocket, message: dict[str, Any]) -> None:
         singer_id = getattr(ws, "singer_id", None)
@@ -132,6 +222,10 @@ class MessageRouter:
             return
 
         video_id = message.get("video_id", "")
+        if self.video_cache is not None:
+            cached = self.video_cache.record_request(video_id)
+        else:
+            cached = self.downloader.is_cached(video_id)
 
         # Try to get from store first, or build from message
         song = await self.session.store.get_song(video_id)
@@ -141,22 +235,21 @@ class MessageRouter:
                 title=message.get("title", ""),
                 thumbnail_url=message.get("thumbnail_url", ""),
                 duration_seconds=message.get("duration_seconds", 0),
-                cached=self.downloader.is_cached(video_id),
+                cached=cached,
             )
 
         item = await self.session.queue_song(singer_id, song)
 
         # Mark as ready immediately if already cached
-        if self.downloader.is_cached(video_id):
+        if cached:
             await self.session.store.update_queue_item(item.id, status="ready")
+            item.status = "ready"
 
         # Broadcast queue update
         queue = await self.session.store.get_queue()
-        await self.connections.broadcast(
-            {
-                "type": "queue_updated",
-                "queue": [qi.model_dump() for qi in queue],
-            }
+        index = next((i for i, qi in enumerate(queue) if qi.id == item.id), -1)
+        await self._broadcast_queue_diff(
+            {"type": "item_added", "item": item.model_dump(), "index": index}
         )
         await self.connections.broadcast(
             {
@@ -166,10 +259,11 @@ class MessageRouter:
         )
 
         # Start download if not cached
-        if not self.downloader.is_cached(video_id):
-            asyncio.create_task(self._download_video(item.id, video_id))
+        if not cached:
+            self._start_download(item.id, video_id, index)
         else:
             await self._auto_advance()
+        await self._prefetch()
 
     async def _handle_remove_from_queue(
         self, ws: WebSocket, message: dict[str, Any]
@@ -184,13 +278,11 @@ class MessageRouter:
         item_id = message.get("item_id", "")
         success = await self.session.remove_from_queue(item_id, singer_id)
         if success:
-            queue = await self.session.store.get_queue()
-            await self.connections.broadcast(
-                {
-                    "type": "queue_updated",
-                    "queue": [qi.model_dump() for qi in queue],
-                }
+            await self._broadcast_queue_diff(
+                {"type": "item_removed", "item_id": item_id}
             )
+            await self._reprioritize_downloads()
+            await self._prefetch()
         else:
             await self.connections.send_to(
                 ws, {"type": "error", "message": "Cannot remove that item"}
@@ -207,15 +299,36 @@ class MessageRouter:
             return
 
         item_ids = message.get("item_ids", [])
+        old_ids = [qi.id for qi in await self.session.store.get_queue()]
         success = await self.session.reorder_queue(item_ids, singer_id)
         if success:
             queue = await self.session.store.get_queue()
-            await self.connections.broadcast(
-                {
-                    "type": "queue_updated",
-                    "queue": [qi.model_dump() for qi in queue],
-                }
-            )
+            new_ids = [qi.id for qi in queue]
+            kept = set(new_ids)
+            removed = [item_id for item_id in old_ids if item_id not in kept]
+            remaining = [item_id for item_id in old_ids if item_id in kept]
+            moves = _queue_moves(remaining, new_ids)
+            # One revision for the whole reorder, however many items moved
+            if len(removed) + len(moves) > _MAX_REORDER_CHANGES:
+                await self._broadcast_queue_diff(
+                    {
+                        "type": "queue_updated",
+                        "queue": [qi.model_dump() for qi in queue],
+                    }
+                )
+            elif removed or moves:
+                await self._broadcast_queue_diff(
+                    {
+                        "type": "queue_reordered",
+                        "removed": removed,
+                        "moves": [
+                            {"item_id": item_id, "index": index}
+                            for item_id, index in moves
+                        ],
+                    }
+                )
+            await self._reprioritize_downloads()
+            await self._prefetch()
         else:
             await self.connections.send_to(
                 ws, {"type": "error", "message": "Cannot reorder queue"}
@@ -226,7 +339,7 @@ class MessageRouter:
             return
 
         action = message.get("action", "")
-        playback = await self.session.store.get_playback()
+        playback = await self._get_playback()
 
         if action == "play":
             playback.status = "playing"
@@ -239,35 +352,30 @@ class MessageRouter:
             playback.position_seconds = 0.0
         elif action == "skip":
             current = await self.session.advance_queue()
-            queue = await self.session.store.get_queue()
+            self._discard_position()
             playback = await self.session.store.get_playback()
 
-            await self.connections.broadcast(
-                {
-                    "type": "now_playing",
-                    "item": current.model_dump() if current else None,
-                }
-            )
-            await self.connections.broadcast(
-                {
-                    "type": "queue_updated",
-                    "queue": [qi.model_dump() for qi in queue],
-                }
-            )
+            await self._broadcast_now_playing(current)
+            if current is not None:
+                await self._broadcast_queue_diff(
+                    {"type": "item_removed", "item_id": current.id}
+                )
             await self.connections.broadcast(
                 {
                     "type": "playback_updated",
                     "playback": playback.model_dump(),
                 }
             )
+            await self._prefetch()
             return
         elif action == "previous":
+            outgoing = await self.session.store.get_current()
             result = await self.session.go_previous()
             if result is None:
                 # No history — restart current song
                 playback.status = "playing"
                 playback.position_seconds = 0.0
-                await self.session.store.save_playback(playback)
+                await self._save_playback(playback)
                 await self.connections.broadcast(
                     {
                         "type": "playback_updated",
@@ -275,26 +383,26 @@ class MessageRouter:
                     }
                 )
             else:
+                self._discard_position()
                 queue = await self.session.store.get_queue()
                 playback = await self.session.store.get_playback()
-                await self.connections.broadcast(
-                    {
-                        "type": "now_playing",
-                        "item": result.model_dump(),
-                    }
-                )
-                await self.connections.broadcast(
-                    {
-                        "type": "queue_updated",
-                        "queue": [qi.model_dump() for qi in queue],
-                    }
-                )
+                await self._broadcast_now_playing(result)
+                # The outgoing song was pushed back to the front of the queue
+                if outgoing is not None and queue and queue[0].id == outgoing.id:
+                    await self._broadcast_queue_diff(
+                        {
+                            "type": "item_added",
+                            "item": queue[0].model_dump(),
+                            "index": 0,
+                        }
+                    )
                 await self.connections.broadcast(
                     {
                         "type": "playback_updated",
                         "playback": playback.model_dump(),
                     }
                 )
+                await self._prefetch()
             return
         else:
             await self.connections.send_to(
@@ -302,7 +410,7 @@ class MessageRouter:
             )
             return
 
-        await self.session.store.save_playback(playback)
+        await self._save_playback(playback)
         await self.connections.broadcast(
             {
                 "type": "playback_updated",
@@ -315,9 +423,9 @@ class MessageRouter:
             return
 
         position = message.get("position_seconds", message.get("position", 0.0))
-        playback = await self.session.store.get_playback()
+        playback = await self._get_playback()
         playback.position_seconds = float(position)
-        await self.session.store.save_playback(playback)
+        await self._save_playback(playback)
 
         await self.connections.broadcast(
             {
@@ -334,9 +442,9 @@ class MessageRouter:
         # Clamp to -6..+6
         value = max(-6, min(6, int(value)))
 
-        playback = await self.session.store.get_playback()
+        playback = await self._get_playback()
         playback.pitch_shift = value
-        await self.session.store.save_playback(playback)
+        await self._save_playback(playback)
 
         await self.connections.broadcast(
             {
@@ -350,13 +458,15 @@ class MessageRouter:
     ) -> None:
         position = message.get("position_seconds", message.get("position", 0.0))
 
-        # Persist so other actions (pause, etc.) reflect the real position
-        playback = await self.session.store.get_playback()
-        playback.position_seconds = float(position)
-        await self.session.store.save_playback(playback)
+        # Keep the latest position in memory; it is folded into any playback
+        # change and written to Redis at most every position_persist_interval.
+        self._pending_position = float(position)
+        if time.monotonic() - self._position_saved_at >= self.position_persist_interval:
+            await self.persist_position()
 
         # Relay to other clients (from display page to control pages)
-        await self.connections.broadcast(
+        self.updates.put(
+            "position_update",
             {
                 "type": "position_update",
                 "position": position,
@@ -392,6 +502,25 @@ class MessageRouter:
             }
         )
 
+    async def _handle_queue_sync(self, ws: WebSocket, message: dict[str, Any]) -> None:
+        """Resend the full queue to a client that detected a revision gap."""
+        rev = self.queue_rev
+        queue = await self.session.store.get_queue()
+        await self.connections.send_to(
+            ws,
+            {
+                "type": "queue_updated",
+                "queue": [qi.model_dump() for qi in queue],
+                "rev": rev,
+            },
+        )
+
+    async def _handle_subscribe(self, ws: WebSocket, message: dict[str, Any]) -> None:
+        self.connections.subscribe(ws, message.get("topics", []))
+
+    async def _handle_unsubscribe(self, ws: WebSocket, message: dict[str, Any]) -> None:
+        self.connections.unsubscribe(ws, message.get("topics", []))
+
     async def _handle_show_qr(self, ws: WebSocket, message: dict[str, Any]) -> None:
         await self.connections.broadcast({"type": "show_qr"})
 
@@ -448,91 +577,438 @@ class MessageRouter:
     # Helpers
     # ------------------------------------------------------------------
 
-    async def _auto_advance(self) -> None:
-        """If nothing is currently playing, advance the queue."""
-        current = await self.session.store.get_current()
-        if current is not None:
+    async def build_state_message(self, singer_id: str | None = None) -> dict[str, Any]:
+        """Build the full ``state`` message sent to newly connected clients."""
+        # Read the revision before the snapshot: a diff racing the snapshot
+        # may then be re-applied, which clients handle idempotently.
+        rev = self.queue_rev
+        state = await self.session.store.get_full_state()
+        if self._pending_position is not None:
+            state.playback.position_seconds = self._pending_position
+        message: dict[str, Any] = {"type": "state"}
+        if singer_id is not None:
+            message["singer_id"] = singer_id
+        message.update(
+            {
+                "singers": [s.model_dump() for s in state.singers],
+                "queue": [item.model_dump() for item in state.queue],
+                "queue_rev": rev,
+                "ready_horizon": self.ready_horizon,
+                "current": state.current.model_dump() if state.current else None,
+                "playback": state.playback.model_dump(),
+                "settings": state.settings.model_dump(),
+            }
+        )
+        return message
+
+    async def persist_position(self) -> None:
+        """Write the latest reported playback position to the store."""
+        if self._pending_position is None:
             return
+        await self._save_playback(await self._get_playback())
 
-        item = await self.session.advance_queue()
-        queue = await self.session.store.get_queue()
+    async def close(self) -> None:
+        """Flush rate-limited updates, background writes and the position."""
+        await self.updates.close()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.persist_position()
+
+    async def _get_playback(self) -> PlaybackState:
+        """Return the stored playback state with the latest position applied."""
         playback = await self.session.store.get_playback()
+        if self._pending_position is not None:
+            playback.position_seconds = self._pending_position
+        return playback
 
+    async def _save_playback(self, playback: PlaybackState) -> None:
+        await self.session.store.save_playback(playback)
+        self._pending_position = None
+        self._position_saved_at = time.monotonic()
+
+    def _discard_position(self) -> None:
+        """Forget position updates for a song that is no longer current."""
+        self._pending_position = None
+        self.updates.discard("position_update")
+
+    def _spawn(self, coro: Coroutine[Any, Any, Any]) -> None:
+        """Run *coro* in the background, logging rather than raising errors."""
+
+        async def _run() -> None:
+            try:
+                await coro
+            except Exception:
+                logger.exception("Background task failed")
+
+        task = asyncio.create_task(_run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _broadcast_queue_diff(self, message: dict[str, Any]) -> None:
+        """Broadcast an incremental queue change tagged with the next revision."""
+        self.queue_rev += 1
+        message["rev"] = self.queue_rev
+        await self.connections.broadcast(message)
+
+    async def _broadcast_now_playing(self, item: QueueItem | None) -> None:
+        """Announce the new current item and record the play."""
         await self.connections.broadcast(
             {
                 "type": "now_playing",
                 "item": item.model_dump() if item else None,
             }
         )
-        await self.connections.broadcast(
-            {
-                "type": "queue_updated",
-                "queue": [qi.model_dump() for qi in queue],
-            }
-        )
+        if item is not None and self.video_cache is not None:
+            await self.video_cache.record_play(item.song.video_id)
+
+    async def _auto_advance(self) -> None:
+        """If nothing is currently playing, advance the queue.
+
+        Waits while the next item is still downloading, so playback never
+        starts on a file that isn't there yet, unless a progressive
+        download has buffered enough to stream.  Items whose download has
+        failed for good are removed from the queue, so they don't block it.
+        """
+        current = await self.session.store.get_current()
+        if current is not None:
+            return
+        queue = await self.session.store.get_queue()
+        if (
+            queue
+            and queue[0].status != "ready"
+            and not self.downloader.is_streamable(queue[0].song.video_id)
+        ):
+            return
+
+        item = await self.session.advance_queue()
+        self._discard_position()
+        playback = await self.session.store.get_playback()
+
+        await self._broadcast_now_playing(item)
+        if item is not None:
+            await self._broadcast_queue_diff(
+                {"type": "item_removed", "item_id": item.id}
+            )
         await self.connections.broadcast(
             {
                 "type": "playback_updated",
                 "playback": playback.model_dump(),
             }
         )
+        await self._prefetch()
 
-    async def _download_video(self, item_id: str, video_id: str) -> None:
-        """Download a video, updating queue item status and broadcasting progress."""
-        try:
-            # Update status to downloading
-            await self.session.store.update_queue_item(item_id, status="downloading")
-            queue = await self.session.store.get_queue()
+    async def _prefetch(self) -> None:
+        """Keep the next items downloaded and analyzed; update the horizon.
+
+        Starts (or restarts, after a failure) downloads for the first
+        prefetch_lookahead queue items, runs key detection for ready items
+        that lack a key, and broadcasts ``ready_horizon`` when the number
+        of ready items at the front of the queue changes.  Also keeps the
+        current and next videos warm in the page cache.
+        """
+        queue = await self.session.store.get_queue()
+        queued = {item.id for item in queue}
+        for item_id in self._download_failures.keys() - queued:
+            del self._download_failures[item_id]
+        queued_videos = {item.song.video_id for item in queue}
+        for video_id in self._key_failures.keys() - queued_videos:
+            del self._key_failures[video_id]
+        if self.page_cache is not None:
+            await self._warm_page_cache(queue)
+        window = queue[: self.prefetch_lookahead]
+        for i, item in enumerate(window):
+            if item.status != "ready":
+                self._start_download(item.id, item.song.video_id, i)
+
+        ready = [item.song.video_id for item in window if item.status == "ready"]
+        for song in (await self.session.store.get_songs(ready)).values():
+            if song.detected_key is None and song.video_id not in self._analyzing:
+                self._spawn(self._analyze_key(song.video_id))
+
+        horizon = 0
+        for item in queue:
+            if item.status != "ready":
+                break
+            horizon += 1
+        if horizon != self.ready_horizon:
+            self.ready_horizon = horizon
             await self.connections.broadcast(
-                {
-                    "type": "queue_updated",
-                    "queue": [qi.model_dump() for qi in queue],
-                }
+                {"type": "ready_horizon", "ready_horizon": horizon}
             )
 
-            loop = asyncio.get_running_loop()
-
-            def on_progress(pct: float) -> None:
-                loop.call_soon_threadsafe(
-                    asyncio.ensure_future,
-                    self.connections.broadcast(
-                        {
-                            "type": "download_progress",
-                            "item_id": item_id,
-                            "video_id": video_id,
-                            "progress": pct,
-                        }
-                    ),
+    async def _warm_page_cache(self, queue: list[QueueItem]) -> None:
+        """Hint the OS to cache the current and next cached videos."""
+        assert self.page_cache is not None
+        items = queue[: self.page_cache.lookahead]
+        current = await self.session.store.get_current()
+        if current is not None:
+            items.insert(0, current)
+        paths: dict[str, Path] = {}
+        for item in items:
+            cached = self.downloader.lookup(item.song.video_id)
+            if cached is not None:
+                paths[item.song.video_id] = cached.path
+        self.page_cache.update(paths)
+
+    def _start_download(self, item_id: str, video_id: str, priority: float) -> None:
+        """Download *video_id* for a queue item unless already under way."""
+        task = self._downloads.get(item_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._download_video(item_id, video_id, priority))
+        self._downloads[item_id] = task
+
+        def _done(t: asyncio.Task[None]) -> None:
+            if self._downloads.get(item_id) is t:
+                self._downloads.pop(item_id, None)
+            if not t.cancelled() and t.exception() is not None:
+                # Not a download failure: the file is fine, so no retry
+                logger.error(
+                    "Failed to finish download of %s", video_id, exc_info=t.exception()
                 )
 
-            await self.downloader.download(video_id, on_progress=on_progress)
+        task.add_done_callback(_done)
 
-            # Update status to ready
-            await self.session.store.update_queue_item(item_id, status="ready")
-            queue = await self.session.store.get_queue()
+    async def _analyze_key(self, video_id: str) -> None:
+        """Detect the key of a cached video and save it on the song.
+
+        Results are remembered per file fingerprint, so each downloaded
+        file is analyzed once.  A key already found from the audio stream
+        is adopted for the file instead of analyzing again.  Failed
+        detections aren't remembered, so a later prefetch tries again, up
+        to _MAX_KEY_ATTEMPTS times while the video stays queued.
+        """
+        cached = self.downloader.lookup(video_id)
+        if cached is None or video_id in self._analyzing:
+            return
+        self._analyzing.add(video_id)
+        try:
+            store = self.session.store
+            stored = (await store.get_key_analyses([video_id])).get(video_id)
+            if stored is not None and stored[0] == cached.fingerprint:
+                key = stored[1]
+            else:
+                if stored is not None and stored[0] == _AUDIO_FINGERPRINT:
+                    key = stored[1]
+                else:
+                    if self._key_failures.get(video_id, 0) >= _MAX_KEY_ATTEMPTS:
+                        return
+                    try:
+                        key = await self._detect_key(cached.path)
+                    except Exception:
+                        logger.exception("Key detection failed for %s", video_id)
+                        key = None
+                    if key is None:
+                        self._key_failures[video_id] = (
+                            self._key_failures.get(video_id, 0) + 1
+                        )
+                        return
+                    self._key_failures.pop(video_id, None)
+                await store.save_key_analysis(video_id, cached.fingerprint, key)
+            await self._apply_key(video_id, key)
+        finally:
+            self._analyzing.discard(video_id)
+
+    async def _analyze_audio_first(self, video_id: str, priority: float) -> None:
+        """Detect the key from the audio stream while the video downloads.
+
+        The audio download is ranked just ahead of the video at *priority*.
+        """
+        if video_id in self._analyzing:
+            return
+        self._analyzing.add(video_id)
+        try:
+            store = self.session.store
+            if (await store.get_key_analyses([video_id])).get(video_id):
+                return
+            path = await self.downloader.download_audio(video_id, priority - 0.5)
+            try:
+                key = await self._detect_key(path)
+            finally:
+                self.downloader.discard_audio(video_id)
+            if key is None:
+                return
+            await store.save_key_analysis(video_id, _AUDIO_FINGERPRINT, key)
+            await self._apply_key(video_id, key)
+        finally:
+            self._analyzing.discard(video_id)
+
+    async def _detect_key(self, path: Path) -> str | None:
+        if self.key_analyzer is not None:
+            return await self.key_analyzer.detect(path)
+        return await detect_key(path)
+
+    async def _apply_key(self, video_id: str, key: str | None) -> None:
+        """Save a key on the song, queue and current item; announce changes."""
+        store = self.session.store
+        changed = False
+        song = await store.get_song(video_id)
+        if song is not None:
+            changed = song.detected_key != key
+            song.cached = song.cached or self.downloader.is_cached(video_id)
+            song.detected_key = key
+            await store.save_song(song)
+        for item in await store.get_queue():
+            if item.song.video_id == video_id and item.song.detected_key != key:
+                item.song.detected_key = key
+                await store.update_queue_item(item.id, song=item.song)
+                changed = True
+        current = await store.get_current()
+        if current is not None and current.song.video_id == video_id:
+            if current.song.detected_key != key:
+                current.song.detected_key = key
+                await store.save_current(current)
+                changed = True
+        if changed:
             await self.connections.broadcast(
-                {
-                    "type": "queue_updated",
-                    "queue": [qi.model_dump() for qi in queue],
-                }
+                {"type": "key_detected", "video_id": video_id, "detected_key": key}
             )
 
-            # Save song as cached and detect key
-            song = await self.session.store.get_song(video_id)
-            if song:
-                song.cached = True
-                video_path = self.downloader.video_path(video_id)
-                song.detected_key = await detect_key(video_path)
-                await self.session.store.save_song(song)
+    async def reconcile_downloads(self) -> None:
+        """Recover from downloads interrupted by a restart.
 
-            await self._auto_advance()
+        Partial files of videos that are no longer queued are deleted.
+        Queue items are marked ready if their video is cached, otherwise
+        reset to waiting and downloaded again; yt-dlp resumes from any
+        partial file left behind.
+        """
+        store = self.session.store
+        queue = await store.get_queue()
+        wanted = {item.song.video_id for item in queue}
+        current = await store.get_current()
+        if current is not None:
+            wanted.add(current.song.video_id)
+
+        interrupted = await store.get_inflight_downloads()
+        for video_id in self.downloader.partial_downloads() | set(interrupted):
+            if video_id not in wanted:
+                self.downloader.discard_partial(video_id)
+        for video_id in interrupted:
+            await store.remove_inflight_download(video_id)
+        if interrupted:
+            logger.info("Recovering %d interrupted downloads", len(interrupted))
+
+        for i, item in enumerate(queue):
+            video_id = item.song.video_id
+            if self.downloader.is_cached(video_id):
+                if item.status != "ready":
+                    await store.update_queue_item(item.id, status="ready")
+                continue
+            if item.status != "waiting":
+                await store.update_queue_item(item.id, status="waiting")
+            self._start_download(item.id, video_id, i)
+        await self._prefetch()
+
+    async def _reprioritize_downloads(self) -> None:
+        """Rank downloads by queue position and cancel ones no longer queued."""
+        priorities: dict[str, float] = {}
+        current = await self.session.store.get_current()
+        if current is not None:
+            priorities[current.song.video_id] = -1
+        for i, qi in enumerate(await self.session.store.get_queue()):
+            priorities.setdefault(qi.song.video_id, i)
+        self.downloader.reprioritize(priorities)
 
-        except Exception:
-            logger.exception("Failed to download video %s", video_id)
-            await self.connections.broadcast(
+    async def _download_video(
+        self, item_id: str, video_id: str, priority: float = 0
+    ) -> None:
+        """Download a video, updating queue item status and broadcasting progress.
+
+        *priority* is the item's queue position; lower downloads sooner.
+        Only an error from the download itself counts towards
+        _MAX_DOWNLOAD_ATTEMPTS; key detection runs in the background.
+        """
+        # Update status to downloading
+        await self.session.store.update_queue_item(item_id, status="downloading")
+        await self._broadcast_queue_diff(
+            {"type": "item_status", "item_id": item_id, "status": "downloading"}
+        )
+
+        loop = asyncio.get_running_loop()
+        streamable = False
+
+        def on_progress(pct: float) -> None:
+            nonlocal streamable
+            loop.call_soon_threadsafe(
+                self.updates.put,
+                f"download_progress:{item_id}",
                 {
-                    "type": "download_error",
+                    "type": "download_progress",
                     "item_id": item_id,
                     "video_id": video_id,
-                }
+                    "progress": pct,
+                },
+            )
+            if not streamable and self.downloader.is_streamable(video_id):
+                # Enough is buffered to start playing before it finishes
+                streamable = True
+                loop.call_soon_threadsafe(lambda: self._spawn(self._auto_advance()))
+
+        # Only for the prefetch window, so audio doesn't crowd out videos
+        if self.audio_first and priority < self.prefetch_lookahead:
+            self._spawn(self._analyze_audio_first(video_id, priority))
+        await self.session.store.add_inflight_download(video_id, time.time())
+        try:
+            await self.downloader.download(
+                video_id, on_progress=on_progress, priority=priority
+            )
+        except Exception:
+            logger.exception("Failed to download video %s", video_id)
+            await self._download_failed(item_id, video_id)
+            return
+        finally:
+            await self.session.store.remove_inflight_download(video_id)
+
+        # Update status to ready, dropping a progress tick that would follow it
+        self.updates.discard(f"download_progress:{item_id}")
+        await self.session.store.update_queue_item(item_id, status="ready")
+        await self._broadcast_queue_diff(
+            {"type": "item_status", "item_id": item_id, "status": "ready"}
+        )
+
+        # Save song as cached; detect the key without holding up playback
+        song = await self.session.store.get_song(video_id)
+        if song is not None and not song.cached:
+            song.cached = True
+            await self.session.store.save_song(song)
+        self._spawn(self._analyze_key(video_id))
+
+        if self.video_cache is not None:
+            self._spawn(self.video_cache.enforce())
+        await self._auto_advance()
+        await self._prefetch()
+        self._download_failures.pop(item_id, None)
+
+    async def _download_failed(self, item_id: str, video_id: str) -> None:
+        """Announce a failed download; retry it after a backoff or give up."""
+        failures = self._download_failures.get(item_id, 0) + 1
+        self._download_failures[item_id] = failures
+        self.updates.discard(f"download_progress:{item_id}")
+        await self.connections.broadcast(
+            {
+                "type": "download_error",
+                "item_id": item_id,
+                "video_id": video_id,
+            }
+        )
+        if failures >= _MAX_DOWNLOAD_ATTEMPTS:
+            # Give up: drop it rather than ever playing a missing file
+            logger.warning(
+                "Removing %s from the queue after %d failed downloads",
+                video_id,
+                failures,
+            )
+            await self.session.store.remove_from_queue(item_id)
+            await self._broadcast_queue_diff(
+                {"type": "item_removed", "item_id": item_id}
+            )
+        else:
+            await self.session.store.update_queue_item(item_id, status="waiting")
+            await self._broadcast_queue_diff(
+                {"type": "item_status", "item_id": item_id, "status": "waiting"}
             )
+            # Still registered as downloading, so the prefetcher waits too
+            await asyncio.sleep(_DOWNLOAD_RETRY_DELAY * 2 ** (failures - 1))
+        self._downloads.pop(item_id, None)
+        await self._auto_advance()
+        await self._prefetch()
@@ -0,0 +1,111 @@
+"""Cached, de-duplicated YouTube search."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from yoke.youtube import YoutubeResult, search_youtube
+
+if TYPE_CHECKING:
+    from yoke.redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so equivalent queries share a key."""
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """Two-level cache in front of search_youtube.
+
+    An in-process LRU answers repeated queries without I/O; behind it,
+    Redis keeps results across restarts.  Results expire *ttl* seconds
+    after they were fetched from YouTube, at both levels.  Concurrent identical queries share one yt-dlp call.
+    """
+
+    def __init__(
+        self, store: RedisStore, ttl: int = 3600, max_entries: int = 256
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lru: OrderedDict[tuple[str, int], tuple[float, list[YoutubeResult]]] = (
+            OrderedDict()
+        )
+        self._inflight: dict[tuple[str, int], asyncio.Task[list[YoutubeResult]]] = {}
+        self._hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    async def search(self, query: str, max_results: int = 15) -> list[YoutubeResult]:
+        key = (normalize_query(query), max_results)
+
+        entry = self._lru.get(key)
+        if entry is not None:
+            expires_at, results = entry
+            if expires_at > time.monotonic():
+                self._lru.move_to_end(key)
+                self._hits += 1
+                return results
+            del self._lru[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            task = asyncio.create_task(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the shared search
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: tuple[str, int]) -> list[YoutubeResult]:
+        query, max_results = key
+        try:
+            cached = await self.store.get_search_results(query, max_results)
+        except Exception:
+            logger.exception("Failed to read cached search results")
+            cached = None
+
+        if cached is not None:
+            self._redis_hits += 1
+            # Kept in memory only for as long as Redis still has it
+            results, ttl = cached
+        else:
+            self._misses += 1
+            results = await search_youtube(query, max_results=max_results)
+            ttl = self.ttl
+            try:
+                await self.store.save_search_results(
+                    query, max_results, results, ttl=self.ttl
+                )
+            except Exception:
+                logger.exception("Failed to cache search results")
+
+        self._remember(key, results, ttl)
+        return results
+
+    def _remember(
+        self, key: tuple[str, int], results: list[YoutubeResult], ttl: float
+    ) -> None:
+        self._lru[key] = (time.monotonic() + ttl, results)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss counters for the cache."""
+        return {
+            "entries": len(self._lru),
+            "hits": self._hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+        }
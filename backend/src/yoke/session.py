@@ -117,14 +117,11 @@ class SessionManager:
             old_current.status = "done"
             await self.store.prepend_to_history(old_current)
 
-        queue = await self.store.get_queue()
-        if not queue:
+        item = await self.store.pop_queue_front()
+        if item is None:
             await self.store.clear_current()
             return None
 
-        item = queue[0]
-        await self.store.remove_from_queue(item.id)
-
         item.status = "playing"
         await self.store.save_current(item)
         await self.store.save_playback(PlaybackState(status="playing"))
@@ -0,0 +1,209 @@
+"""In-process write-through cache in front of RedisStore."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Coroutine
+from typing import TYPE_CHECKING, Any
+
+from yoke.models import (
+    PlaybackState,
+    QueueItem,
+    SessionSettings,
+    SessionState,
+    Singer,
+)
+from yoke.redis_store import RedisStore
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+
+class CachedRedisStore(RedisStore):
+    """RedisStore that keeps the decoded session state in memory.
+
+    Reads of singers, queue, current, playback and settings are served from
+    memory without I/O.  Writes update memory immediately and are written
+    through to Redis by a single background task, in the order they were
+    made.  Only safe when one process owns the session; multi-process
+    deployments should use a plain RedisStore.
+
+    Songs and history are not cached and go straight to Redis.
+    """
+
+    def __init__(self, redis: Redis) -> None:  # type: ignore[type-arg]
+        super().__init__(redis)
+        self._loaded = False
+        self._singers: dict[str, Singer] = {}
+        self._queue: list[QueueItem] = []
+        self._current: QueueItem | None = None
+        self._playback = PlaybackState()
+        self._settings = SessionSettings()
+        self._pending: asyncio.Queue[Coroutine[Any, Any, Any]] = asyncio.Queue()
+        self._writer: asyncio.Task[None] | None = None
+
+    # --- Lifecycle ---
+
+    async def load(self) -> None:
+        """(Re)load the cached state from Redis, after pending writes land."""
+        await self.flush()
+        state = await super().get_full_state()
+        self._singers = {s.id: s for s in state.singers}
+        self._queue = state.queue
+        self._current = state.current
+        self._playback = state.playback
+        self._settings = state.settings
+        self._loaded = True
+
+    async def flush(self) -> None:
+        """Wait until every queued write has reached Redis."""
+        await self._pending.join()
+
+    async def close(self) -> None:
+        """Flush pending writes and stop the writer task."""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    async def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    def _write(self, coro: Coroutine[Any, Any, Any]) -> None:
+        self._pending.put_nowait(coro)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while True:
+            coro = await self._pending.get()
+            try:
+                await coro
+            except Exception:
+                logger.exception("Write-through to Redis failed")
+            finally:
+                self._pending.task_done()
+
+    # --- Singers ---
+
+    async def save_singer(self, singer: Singer) -> None:
+        await self._ensure_loaded()
+        singer = singer.model_copy(deep=True)
+        self._singers[singer.id] = singer
+        self._write(super().save_singer(singer))
+
+    async def get_singer(self, singer_id: str) -> Singer | None:
+        await self._ensure_loaded()
+        singer = self._singers.get(singer_id)
+        return singer.model_copy(deep=True) if singer else None
+
+    async def get_all_singers(self) -> list[Singer]:
+        await self._ensure_loaded()
+        return [s.model_copy(deep=True) for s in self._singers.values()]
+
+    async def remove_singer(self, singer_id: str) -> None:
+        await self._ensure_loaded()
+        self._singers.pop(singer_id, None)
+        self._write(super().remove_singer(singer_id))
+
+    # --- Queue ---
+
+    async def get_queue(self) -> list[QueueItem]:
+        await self._ensure_loaded()
+        return [item.model_copy(deep=True) for item in self._queue]
+
+    async def append_to_queue(self, item: QueueItem) -> None:
+        await self._ensure_loaded()
+        item = item.model_copy(deep=True)
+        self._queue.append(item)
+        self._write(super().append_to_queue(item))
+
+    async def prepend_to_queue(self, item: QueueItem) -> None:
+        await self._ensure_loaded()
+        item = item.model_copy(deep=True)
+        self._queue.insert(0, item)
+        self._write(super().prepend_to_queue(item))
+
+    async def remove_from_queue(self, item_id: str) -> None:
+        await self._ensure_loaded()
+        self._queue = [item for item in self._queue if item.id != item_id]
+        self._write(super().remove_from_queue(item_id))
+
+    async def pop_queue_front(self) -> QueueItem | None:
+        await self._ensure_loaded()
+        if not self._queue:
+            return None
+        item = self._queue.pop(0)
+        self._write(super().pop_queue_front())
+        return item.model_copy(deep=True)
+
+    async def reorder_queue(self, item_ids: list[str]) -> None:
+        await self._ensure_loaded()
+        by_id = {item.id: item for item in self._queue}
+        self._queue = [by_id.pop(item_id) for item_id in item_ids if item_id in by_id]
+        self._write(super().reorder_queue(item_ids))
+
+    async def update_queue_item(self, item_id: str, **fields: object) -> None:
+        await self._ensure_loaded()
+        for i, item in enumerate(self._queue):
+            if item.id == item_id:
+                updated = item.model_copy(deep=True)
+                for k, v in fields.items():
+                    setattr(updated, k, v)
+                self._queue[i] = updated
+                break
+        self._write(super().update_queue_item(item_id, **fields))
+
+    # --- Current item ---
+
+    async def save_current(self, item: QueueItem) -> None:
+        await self._ensure_loaded()
+        self._current = item.model_copy(deep=True)
+        self._write(super().save_current(self._current))
+
+    async def get_current(self) -> QueueItem | None:
+        await self._ensure_loaded()
+        return self._current.model_copy(deep=True) if self._current else None
+
+    async def clear_current(self) -> None:
+        await self._ensure_loaded()
+        self._current = None
+        self._write(super().clear_current())
+
+    # --- Playback ---
+
+    async def save_playback(self, state: PlaybackState) -> None:
+        await self._ensure_loaded()
+        self._playback = state.model_copy(deep=True)
+        self._write(super().save_playback(self._playback))
+
+    async def get_playback(self) -> PlaybackState:
+        await self._ensure_loaded()
+        return self._playback.model_copy(deep=True)
+
+    # --- Settings ---
+
+    async def save_settings(self, settings: SessionSettings) -> None:
+        await self._ensure_loaded()
+        self._settings = settings.model_copy(deep=True)
+        self._write(super().save_settings(self._settings))
+
+    async def get_settings(self) -> SessionSettings:
+        await self._ensure_loaded()
+        return self._settings.model_copy(deep=True)
+
+    # --- Full state ---
+
+    async def get_full_state(self) -> SessionState:
+        await self._ensure_loaded()
+        return SessionState(
+            singers=await self.get_all_singers(),
+            queue=await self.get_queue(),
+            current=await self.get_current(),
+            playback=await self.get_playback(),
+            settings=await self.get_settings(),
+        )
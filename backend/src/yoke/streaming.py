@@ -0,0 +1,253 @@
+"""Serving video files over HTTP, including ones still downloading."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Mapping
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    from yoke.downloader import PartialVideo, VideoDownloader
+
+_MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".webm": "video/webm",
+    ".mkv": "video/x-matroska",
+}
+_CHUNK_SIZE = 256 * 1024
+# Fewer, larger reads than Starlette's 64 KiB default for finished files
+_FILE_CHUNK_SIZE = 1024 * 1024
+# A video id always refers to the same video, so browsers may keep it
+_CACHE_FOREVER = "public, max-age=31536000, immutable"
+# Time-to-first-byte samples kept for percentiles
+_TTFB_SAMPLES = 512
+# How often a reader that caught up with the download checks for more
+_POLL_INTERVAL = 0.1
+# Give up on a download that has written nothing for this long
+_STALL_TIMEOUT = 30.0
+
+
+def media_type(path: Path) -> str:
+    """Return the MIME type for a video file's container."""
+    return _MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` Range header into an inclusive (start, end).
+
+    Returns None when there's no header or it isn't one we honour (other
+    units, multiple ranges, malformed), in which case the whole file is
+    sent.  Raises ValueError if the range lies entirely past *size*.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = (part.strip() for part in spec.partition("-"))
+    if not dash or not (first + last).isdigit():
+        return None
+    start = int(first) if first else None
+    end = int(last) if last else None
+    if start is None:
+        # Suffix range: the last *end* bytes
+        if end == 0:
+            raise ValueError(f"Empty suffix range {header!r}")
+        return max(0, size - end), size - 1
+    if end is not None and start > end:
+        return None
+    if start >= size:
+        raise ValueError(f"Range {header!r} starts past {size} bytes")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def _not_modified(
+    request_headers: Mapping[str, str], etag: str, st: os.stat_result
+) -> bool:
+    """Whether the client's conditional headers match the file."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison and takes precedence
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(st.st_mtime) <= since.timestamp()
+
+
+async def serve_file(path: Path, request_headers: Mapping[str, str]) -> Response:
+    """Respond with a finished video file.
+
+    Sends a strong ETag built from the file's size and mtime, Last-Modified
+    and a long-lived immutable Cache-Control, and answers matching
+    conditional requests with 304.  FileResponse handles Range and If-Range
+    and hands the file to the server for zero-copy transfer when it
+    supports the ASGI pathsend extension.  Raises FileNotFoundError if the
+    file has gone.
+    """
+    st = await asyncio.to_thread(os.stat, path)
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": _CACHE_FOREVER,
+    }
+    if _not_modified(request_headers, etag, st):
+        return Response(status_code=304, headers=headers)
+    response = FileResponse(
+        path, media_type=media_type(path), headers=headers, stat_result=st
+    )
+    response.chunk_size = _FILE_CHUNK_SIZE
+    return response
+
+
+async def _follow(
+    file: BinaryIO,
+    downloader: VideoDownloader,
+    video_id: str,
+    start: int,
+    end: int | None,
+) -> AsyncIterator[bytes]:
+    """Yield bytes *start* to *end* of a file that may still be growing.
+
+    Reads that catch up with the download wait for more data until the
+    download finishes, then drain what's left.
+    """
+    try:
+        await asyncio.to_thread(file.seek, start)
+        pos = start
+        idle = 0.0
+        finished = False
+        while end is None or pos <= end:
+            size = _CHUNK_SIZE if end is None else min(_CHUNK_SIZE, end - pos + 1)
+            chunk = await asyncio.to_thread(file.read, size)
+            if chunk:
+                pos += len(chunk)
+                idle = 0.0
+                yield chunk
+                continue
+            if finished or idle >= _STALL_TIMEOUT:
+                break
+            if downloader.partial_video(video_id) is None:
+                # Done (or failed); one more read picks up the tail
+                finished = True
+                continue
+            await asyncio.sleep(_POLL_INTERVAL)
+            idle += _POLL_INTERVAL
+    finally:
+        file.close()
+
+
+def stream_partial(
+    downloader: VideoDownloader,
+    video_id: str,
+    file: BinaryIO,
+    partial: PartialVideo,
+    range_header: str | None,
+) -> Response:
+    """Respond with a video that is still downloading, honouring Range.
+
+    Requested bytes that haven't been written yet are sent as they arrive.
+    Without a known total size the length can't be promised, so the whole
+    file is streamed with a 200 and ranges are ignored.
+    """
+    headers = {"Cache-Control": "no-store"}
+    mime = media_type(partial.final_path)
+    if partial.total is None:
+        return StreamingResponse(
+            _follow(file, downloader, video_id, 0, None),
+            media_type=mime,
+            headers=headers,
+        )
+
+    headers["Accept-Ranges"] = "bytes"
+    try:
+        requested = parse_range(range_header, partial.total)
+    except ValueError:
+        file.close()
+        headers["Content-Range"] = f"bytes */{partial.total}"
+        return Response(status_code=416, headers=headers)
+    if requested is None:
+        start, end = 0, partial.total - 1
+        status = 200
+    else:
+        start, end = requested
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{partial.total}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _follow(file, downloader, video_id, start, end),
+        status_code=status,
+        media_type=mime,
+        headers=headers,
+    )
+
+
+class FirstByteStats:
+    """Time to first byte of recent video responses."""
+
+    def __init__(self) -> None:
+        self._samples: deque[float] = deque(maxlen=_TTFB_SAMPLES)
+        self._requests = 0
+
+    def record(self, seconds: float) -> None:
+        self._requests += 1
+        self._samples.append(seconds)
+
+    def stats(self) -> dict[str, float]:
+        """Return the request count and p50/p95 time to first byte in ms."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"requests": 0, "ttfb_p50_ms": 0.0, "ttfb_p95_ms": 0.0}
+        return {
+            "requests": self._requests,
+            "ttfb_p50_ms": samples[len(samples) // 2] * 1000,
+            "ttfb_p95_ms": samples[int(len(samples) * 0.95)] * 1000,
+        }
+
+
+class FirstByteMiddleware:
+    """ASGI middleware timing requests under *path_prefix* to their first byte.
+
+    The clock stops at the first body message, or the pathsend that
+    replaces it, so the time includes opening and reading the file.
+    """
+
+    def __init__(self, app: ASGIApp, stats: FirstByteStats, path_prefix: str) -> None:
+        self.app = app
+        self.stats = stats
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        timed = False
+
+        async def timed_send(message: Message) -> None:
+            nonlocal timed
+            if not timed and message["type"] in (
+                "http.response.body",
+                "http.response.pathsend",
+            ):
+                timed = True
+                self.stats.record(time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
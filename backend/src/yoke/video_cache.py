@@ -0,0 +1,144 @@
+"""Size-bounded eviction for the downloaded video directory."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from yoke.downloader import VideoDownloader
+    from yoke.redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("lru", "lfu")
+
+
+class VideoCache:
+    """Keeps the video directory under a byte budget.
+
+    When the cached videos exceed *max_bytes*, unpinned videos are deleted
+    in policy order: ``lru`` evicts the least recently played first, ``lfu``
+    the least often played (ties broken by recency).  Videos that are
+    current, queued, or among the last *pin_history* played are pinned.
+    Evicted songs are marked ``cached=False`` in the song registry.
+
+    A *max_bytes* of 0 disables eviction; usage and hit rate are still
+    tracked.
+    """
+
+    def __init__(
+        self,
+        downloader: VideoDownloader,
+        store: RedisStore,
+        max_bytes: int = 0,
+        policy: str = "lru",
+        pin_history: int = 10,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown video cache policy: {policy!r}")
+        self.downloader = downloader
+        self.store = store
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.pin_history = pin_history
+        self._plays: dict[str, int] = {}
+        self._last_played: dict[str, float] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bytes_reclaimed = 0
+
+    async def load(self) -> None:
+        """Load play counts and recency from Redis."""
+        self._plays, self._last_played = await self.store.get_video_usage()
+
+    def record_request(self, video_id: str) -> bool:
+        """Count a request for *video_id* as a hit or miss; return whether cached."""
+        cached = self.downloader.is_cached(video_id)
+        if cached:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return cached
+
+    async def record_play(self, video_id: str) -> None:
+        """Note that *video_id* started playing."""
+        now = time.time()
+        self._plays[video_id] = self._plays.get(video_id, 0) + 1
+        self._last_played[video_id] = now
+        await self.store.record_play(video_id, now)
+
+    async def pinned(self) -> set[str]:
+        """Return the video ids that must not be evicted."""
+        pinned = {item.song.video_id for item in await self.store.get_queue()}
+        current = await self.store.get_current()
+        if current is not None:
+            pinned.add(current.song.video_id)
+        if self.pin_history:
+            history = await self.store.get_history()
+            pinned.update(item.song.video_id for item in history[: self.pin_history])
+        return pinned
+
+    async def enforce(self) -> list[str]:
+        """Evict videos until the cache fits its budget; return the evicted ids."""
+        if not self.max_bytes:
+            return []
+        videos = self.downloader.cached_videos()
+        total = sum(v.size for v in videos.values())
+        if total <= self.max_bytes:
+            return []
+
+        pinned = await self.pinned()
+
+        def last_used(video_id: str) -> float:
+            # Never-played videos count as used when they were downloaded
+            return max(self._last_played.get(video_id, 0.0), videos[video_id].mtime)
+
+        if self.policy == "lfu":
+            candidates = sorted(
+                (vid for vid in videos if vid not in pinned),
+                key=lambda vid: (self._plays.get(vid, 0), last_used(vid)),
+            )
+        else:
+            candidates = sorted(
+                (vid for vid in videos if vid not in pinned), key=last_used
+            )
+
+        evicted: list[str] = []
+        for video_id in candidates:
+            if total <= self.max_bytes:
+                break
+            freed = self.downloader.remove(video_id)
+            total -= freed
+            self._bytes_reclaimed += freed
+            evicted.append(video_id)
+        self._evictions += len(evicted)
+        if total > self.max_bytes:
+            logger.warning(
+                "Video cache is %d bytes over budget; remaining videos are pinned",
+                total - self.max_bytes,
+            )
+
+        if evicted:
+            songs = await self.store.get_songs(evicted)
+            for song in songs.values():
+                song.cached = False
+            await self.store.save_songs(list(songs.values()))
+            logger.info("Evicted %d videos from the cache", len(evicted))
+        return evicted
+
+    def stats(self) -> dict[str, float]:
+        """Return hit rate, eviction counts and current cache size."""
+        requests = self._hits + self._misses
+        usage = self.downloader.stats()
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requests if requests else 0.0,
+            "evictions": self._evictions,
+            "bytes_reclaimed": self._bytes_reclaimed,
+            "bytes": usage["bytes"],
+            "max_bytes": self.max_bytes,
+        }
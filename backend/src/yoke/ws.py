@@ -1,54 +1,417 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections import deque
+from collections.abc import Iterable
 from typing import TYPE_CHECKING, Any
 
+from pydantic_core import to_json
+
 if TYPE_CHECKING:
     from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
 
+# Message types where only the latest value matters.  Maps the type to the
+# field that scopes it (None = one slot per client).  A newer message with
+# the same key replaces a pending one, and pending ones are dropped first
+# when a client's outbox is full.
+SUPERSEDABLE: dict[str, str | None] = {
+    "position_update": None,
+    "download_progress": "item_id",
+}
+
+
+# Broadcast topics.  Message types listed here are only delivered to clients
+# subscribed to their topic; every other type goes to everyone.
+MESSAGE_TOPICS: dict[str, str] = {
+    "item_added": "queue",
+    "item_removed": "queue",
+    "item_moved": "queue",
+    "queue_reordered": "queue",
+    "queue_updated": "queue",
+    "item_status": "queue",
+    "download_error": "queue",
+    "download_progress": "progress",
+    "position_update": "position",
+    "screen_message": "screen",
+    "show_qr": "screen",
+}
+
+# Default subscriptions per client role.  Connections without a known role
+# receive every topic.  "progress" is opt-in (e.g. while the queue is shown).
+ROLE_TOPICS: dict[str, frozenset[str]] = {
+    "display": frozenset({"screen"}),
+    "control": frozenset({"queue", "position"}),
+}
+
+
+def encode_message(message: dict[str, Any]) -> str:
+    """Encode a message to a JSON text frame."""
+    return to_json(message).decode()
+
+
+def _supersede_key(message: dict[str, Any]) -> str | None:
+    msg_type = message.get("type", "")
+    if msg_type not in SUPERSEDABLE:
+        return None
+    field = SUPERSEDABLE[msg_type]
+    if field is None:
+        return msg_type
+    return f"{msg_type}:{message.get(field)}"
+
+
+class _Outbox:
+    """Outbound queue for one client, drained by its own writer task.
+
+    The queue may grow past *maxsize* while its writer keeps up, so a burst
+    of frames doesn't penalise a healthy client.  Only when it is full and
+    its oldest frame has waited longer than *max_age* seconds is the client
+    too slow.
+    """
+
+    def __init__(self, ws: WebSocket, maxsize: int, max_age: float) -> None:
+        self.ws = ws
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.closed = False
+        self._entries: deque[list[Any]] = deque()  # [key, text, queued at]
+        self._by_key: dict[str, list[Any]] = {}
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task: asyncio.Task[None] | None = None
+
+    def put(self, key: str | None, text: str) -> str:
+        """Queue a frame.  Returns "queued", "coalesced" or "overflow"."""
+        if key is not None and (entry := self._by_key.get(key)) is not None:
+            entry[1] = text
+            return "coalesced"
+
+        now = time.monotonic()
+        if len(self._entries) >= self.maxsize:
+            for entry in self._entries:
+                if entry[0] is not None:
+                    self._entries.remove(entry)
+                    del self._by_key[entry[0]]
+                    break
+            else:
+                if now - self._entries[0][2] > self.max_age:
+                    return "overflow"
+
+        entry = [key, text, now]
+        self._entries.append(entry)
+        if key is not None:
+            self._by_key[key] = entry
+        self._drained.clear()
+        self._ready.set()
+        return "queued"
+
+    def start(self, manager: ConnectionManager) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(manager))
+
+    def stop(self) -> None:
+        self.closed = True
+        self._entries.clear()
+        self._by_key.clear()
+        self._drained.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    async def drained(self) -> None:
+        await self._drained.wait()
+
+    async def _run(self, manager: ConnectionManager) -> None:
+        while not self.closed:
+            if not self._entries:
+                self._drained.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            key, text, _ = self._entries.popleft()
+            if key is not None:
+                self._by_key.pop(key, None)
+            if not await manager._send_text(self.ws, text):
+                self.stop()
+
 
 class ConnectionManager:
-    """Manages active WebSocket connections for the karaoke session."""
+    """Manages active WebSocket connections for the karaoke session.
+
+    Connections are indexed by connection id, singer id and role (e.g.
+    ``display`` or ``control``), so lookups and targeted sends are O(1).  A
+    singer may have several connections, one per open tab.
+
+    Every registered connection gets a bounded outbox drained by its own
+    writer task, so broadcasting never waits on a client socket.  When an
+    outbox is full, superseded messages are dropped first; if that is not
+    enough and its oldest frame has been waiting longer than *send_timeout*,
+    the client is disconnected.
+    """
 
-    def __init__(self) -> None:
-        self.active_connections: list[WebSocket] = []
+    def __init__(self, send_timeout: float = 5.0, queue_size: int = 256) -> None:
+        self.send_timeout = send_timeout
+        self.queue_size = queue_size
+        # Connection id -> socket, in connection order
+        self._connections: dict[int, WebSocket] = {}
+        self._by_singer: dict[str, dict[int, WebSocket]] = {}
+        self._by_role: dict[str, dict[int, WebSocket]] = {}
+        # Topic subscriptions; connections in _all_topics receive everything
+        self._topics: dict[int, set[str]] = {}
+        self._by_topic: dict[str, dict[int, WebSocket]] = {}
+        self._all_topics: dict[int, WebSocket] = {}
+        self._outboxes: dict[int, _Outbox] = {}
+        # Close handshakes with disconnected slow clients
+        self._closing: set[asyncio.Task[None]] = set()
+        # Broadcast metrics, exposed through stats()
+        self._broadcasts = 0
+        self._encode_seconds = 0.0
+        self._fanout_seconds = 0.0
+        self._max_fanout_seconds = 0.0
+        self._max_send_seconds = 0.0
+        self._send_timeouts = 0
+        self._coalesced = 0
+        self._overflow_disconnects = 0
+
+    @property
+    def active_connections(self) -> list[WebSocket]:
+        """All registered connections, oldest first."""
+        return list(self._connections.values())
+
+    def connect(
+        self, ws: WebSocket, singer_id: str | None = None, role: str | None = None
+    ) -> None:
+        """Register a WebSocket connection and associate it with a singer ID.
+
+        Calling this again for a registered connection re-associates it
+        (e.g. once the client joins); *role* and topic subscriptions are kept
+        unless a new role is given, which resets them to the role defaults.
+        """
+        conn_id = id(ws)
+        registered = conn_id in self._connections
+        old_singer = getattr(ws, "singer_id", None)
+        if registered and old_singer is not None:
+            self._unindex(self._by_singer, old_singer, conn_id)
 
-    def connect(self, ws: WebSocket, singer_id: str | None = None) -> None:
-        """Register a WebSocket connection and associate it with a singer ID."""
         ws.singer_id = singer_id  # type: ignore[attr-defined]
-        if ws not in self.active_connections:
-            self.active_connections.append(ws)
+        if role is not None:
+            old_role = getattr(ws, "role", None)
+            if registered and old_role is not None:
+                self._unindex(self._by_role, old_role, conn_id)
+            ws.role = role  # type: ignore[attr-defined]
+            self._by_role.setdefault(role, {})[conn_id] = ws
+            self._set_topics(ws, ROLE_TOPICS.get(role))
+        elif not registered:
+            self._set_topics(ws, None)
+
+        self._connections[conn_id] = ws
+        if singer_id is not None:
+            self._by_singer.setdefault(singer_id, {})[conn_id] = ws
+        if conn_id not in self._outboxes:
+            self._outboxes[conn_id] = _Outbox(ws, self.queue_size, self.send_timeout)
 
     def disconnect(self, ws: WebSocket) -> None:
         """Remove a WebSocket connection if present."""
-        try:
-            self.active_connections.remove(ws)
-        except ValueError:
-            pass
+        conn_id = id(ws)
+        if self._connections.pop(conn_id, None) is None:
+            return
+        singer_id = getattr(ws, "singer_id", None)
+        if singer_id is not None:
+            self._unindex(self._by_singer, singer_id, conn_id)
+        role = getattr(ws, "role", None)
+        if role is not None:
+            self._unindex(self._by_role, role, conn_id)
+        self._clear_topics(conn_id)
+        outbox = self._outboxes.pop(conn_id, None)
+        if outbox is not None:
+            outbox.stop()
+
+    @staticmethod
+    def _unindex(
+        index: dict[str, dict[int, WebSocket]], key: str, conn_id: int
+    ) -> None:
+        conns = index.get(key)
+        if conns is None:
+            return
+        conns.pop(conn_id, None)
+        if not conns:
+            del index[key]
+
+    def subscribe(self, ws: WebSocket, topics: Iterable[str]) -> None:
+        """Add topics to a connection's subscriptions."""
+        conn_id = id(ws)
+        if conn_id not in self._connections or conn_id in self._all_topics:
+            return
+        for topic in topics:
+            self._topics[conn_id].add(topic)
+            self._by_topic.setdefault(topic, {})[conn_id] = ws
+
+    def unsubscribe(self, ws: WebSocket, topics: Iterable[str]) -> None:
+        """Remove topics from a connection's subscriptions."""
+        conn_id = id(ws)
+        if conn_id not in self._connections:
+            return
+        if conn_id in self._all_topics:
+            # Narrowing an "everything" subscription: start from all topics
+            self._set_topics(ws, set(MESSAGE_TOPICS.values()))
+        for topic in topics:
+            self._topics[conn_id].discard(topic)
+            self._unindex(self._by_topic, topic, conn_id)
+
+    def _set_topics(self, ws: WebSocket, topics: Iterable[str] | None) -> None:
+        conn_id = id(ws)
+        self._clear_topics(conn_id)
+        if topics is None:
+            self._all_topics[conn_id] = ws
+            return
+        self._topics[conn_id] = set()
+        for topic in topics:
+            self._topics[conn_id].add(topic)
+            self._by_topic.setdefault(topic, {})[conn_id] = ws
+
+    def _clear_topics(self, conn_id: int) -> None:
+        self._all_topics.pop(conn_id, None)
+        for topic in self._topics.pop(conn_id, ()):
+            self._unindex(self._by_topic, topic, conn_id)
 
     def get_by_singer_id(self, singer_id: str) -> WebSocket | None:
-        """Find a connection by its associated singer ID."""
-        for ws in self.active_connections:
-            if getattr(ws, "singer_id", None) == singer_id:
-                return ws
-        return None
+        """Return the most recent connection for a singer ID."""
+        conns = self._by_singer.get(singer_id)
+        if not conns:
+            return None
+        return next(reversed(conns.values()))
+
+    def get_all_by_singer_id(self, singer_id: str) -> list[WebSocket]:
+        """Return every connection (tab) for a singer ID."""
+        return list(self._by_singer.get(singer_id, {}).values())
+
+    def get_by_role(self, role: str) -> list[WebSocket]:
+        """Return every connection registered with *role*."""
+        return list(self._by_role.get(role, {}).values())
+
+    def is_singer_connected(self, singer_id: str) -> bool:
+        """Check whether a singer has at least one open connection."""
+        return singer_id in self._by_singer
 
     async def send_to(self, ws: WebSocket, message: dict[str, Any]) -> None:
-        """Send a JSON message to a single client, catching exceptions."""
+        """Queue a JSON message for a single client, catching exceptions.
+
+        Connections that were never registered are sent to directly.
+        """
+        text = encode_message(message)
+        if id(ws) in self._outboxes:
+            self._enqueue(ws, _supersede_key(message), text)
+        else:
+            await self._send_text(ws, text)
+
+    async def send_to_singer(self, singer_id: str, message: dict[str, Any]) -> None:
+        """Queue a JSON message for every connection of one singer."""
+        conns = self._by_singer.get(singer_id)
+        if not conns:
+            return
+        key = _supersede_key(message)
+        text = encode_message(message)
+        for ws in list(conns.values()):
+            self._enqueue(ws, key, text)
+
+    async def broadcast(
+        self, message: dict[str, Any], exclude: WebSocket | None = None
+    ) -> None:
+        """Queue a JSON message for all connected clients, optionally excluding one.
+
+        The message is encoded once and the same frame is handed to every
+        client's outbox; delivery happens on the per-client writer tasks.
+        """
+        start = time.perf_counter()
+        key = _supersede_key(message)
+        text = encode_message(message)
+        encoded = time.perf_counter()
+
+        for ws in self._recipients(message.get("type", "")):
+            if ws is not exclude:
+                self._enqueue(ws, key, text)
+        done = time.perf_counter()
+
+        fanout = done - encoded
+        self._broadcasts += 1
+        self._encode_seconds += encoded - start
+        self._fanout_seconds += fanout
+        self._max_fanout_seconds = max(self._max_fanout_seconds, fanout)
+
+    def _recipients(self, msg_type: str) -> list[WebSocket]:
+        topic = MESSAGE_TOPICS.get(msg_type)
+        if topic is None:
+            return list(self._connections.values())
+        return [
+            *self._all_topics.values(),
+            *self._by_topic.get(topic, {}).values(),
+        ]
+
+    async def flush(self) -> None:
+        """Wait until every client's outbox has been written out."""
+        await asyncio.gather(*(o.drained() for o in list(self._outboxes.values())))
+
+    def _enqueue(self, ws: WebSocket, key: str | None, text: str) -> None:
+        outbox = self._outboxes.get(id(ws))
+        if outbox is None or outbox.closed:
+            return
+        result = outbox.put(key, text)
+        if result == "coalesced":
+            self._coalesced += 1
+        elif result == "overflow":
+            self._overflow_disconnects += 1
+            logger.warning(
+                "Outbound queue full for %s, disconnecting",
+                getattr(ws, "singer_id", "unknown"),
+            )
+            self.disconnect(ws)
+            task = asyncio.create_task(self._close(ws))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            return
+        outbox.start(self)
+
+    async def _close(self, ws: WebSocket) -> None:
+        try:
+            await ws.close(code=1013)
+        except Exception:
+            pass
+
+    async def _send_text(self, ws: WebSocket, text: str) -> bool:
+        """Send a frame, returning False if the connection looks dead."""
+        start = time.perf_counter()
         try:
-            await ws.send_json(message)
+            await asyncio.wait_for(ws.send_text(text), self.send_timeout)
+        except TimeoutError:
+            self._send_timeouts += 1
+            logger.warning(
+                "Timed out sending to %s", getattr(ws, "singer_id", "unknown")
+            )
         except Exception:
             logger.exception(
                 "Failed to send message to %s", getattr(ws, "singer_id", "unknown")
             )
+            return False
+        self._max_send_seconds = max(
+            self._max_send_seconds, time.perf_counter() - start
+        )
+        return True
 
-    async def broadcast(
-        self, message: dict[str, Any], exclude: WebSocket | None = None
-    ) -> None:
-        """Send a JSON message to all connected clients, optionally excluding one."""
-        for ws in self.active_connections:
-            if ws is exclude:
-                continue
-            await self.send_to(ws, message)
+    def stats(self) -> dict[str, float]:
+        """Return connection and broadcast timing metrics."""
+        n = self._broadcasts or 1
+        return {
+            "connections": len(self._connections),
+            "broadcasts": self._broadcasts,
+            "avg_encode_ms": self._encode_seconds / n * 1000,
+            "avg_fanout_ms": self._fanout_seconds / n * 1000,
+            "max_fanout_ms": self._max_fanout_seconds * 1000,
+            "max_send_ms": self._max_send_seconds * 1000,
+            "send_timeouts": self._send_timeouts,
+            "coalesced": self._coalesced,
+            "overflow_disconnects": self._overflow_disconnects,
+        }
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock
+
+from yoke.coalescer import UpdateCoalescer
+
+
+async def test_keeps_latest_per_key() -> None:
+    connections = AsyncMock()
+    updates = UpdateCoalescer(connections, interval=10)
+
+    updates.put("a", {"type": "x", "value": 1})
+    updates.put("a", {"type": "x", "value": 2})
+    updates.put("b", {"type": "y", "value": 3})
+    await updates.flush()
+
+    sent = [call[0][0] for call in connections.broadcast.call_args_list]
+    assert sent == [{"type": "x", "value": 2}, {"type": "y", "value": 3}]
+    assert updates.stats() == {"received": 3, "sent": 2}
+    await updates.close()
+
+
+async def test_flushes_on_interval() -> None:
+    connections = AsyncMock()
+    updates = UpdateCoalescer(connections, interval=0.01)
+
+    updates.put("a", {"type": "x"})
+    connections.broadcast.assert_not_awaited()
+    await asyncio.sleep(0.05)
+
+    connections.broadcast.assert_awaited_once_with({"type": "x"}, exclude=None)
+    await updates.close()
+
+
+async def test_discard_drops_pending() -> None:
+    connections = AsyncMock()
+    updates = UpdateCoalescer(connections, interval=10)
+
+    updates.put("a", {"type": "x"})
+    updates.discard("a")
+    await updates.close()
+
+    connections.broadcast.assert_not_awaited()
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from yoke.download_scheduler import DownloadScheduler
+
+
+async def _start(scheduler: DownloadScheduler, key: str, priority: float, order: list):
+    await scheduler.acquire(key, priority)
+    order.append(key)
+
+
+async def test_slots_granted_by_priority():
+    scheduler = DownloadScheduler(max_concurrent=1)
+    await scheduler.acquire("running")
+    order: list[str] = []
+    tasks = [
+        asyncio.create_task(_start(scheduler, key, priority, order))
+        for key, priority in (("far", 30), ("next", 1), ("later", 5))
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"] == 3
+
+    for key in ("running", "next", "later"):
+        scheduler.release(key)
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == ["next", "later", "far"]
+
+
+async def test_set_priority_reorders_waiters():
+    scheduler = DownloadScheduler(max_concurrent=1)
+    await scheduler.acquire("running")
+    order: list[str] = []
+    tasks = [
+        asyncio.create_task(_start(scheduler, key, priority, order))
+        for key, priority in (("a", 1), ("b", 2))
+    ]
+    await asyncio.sleep(0)
+    scheduler.set_priority("b", 0)
+    scheduler.promote("a", 5)  # not more urgent, ignored
+
+    scheduler.release("running")
+    await asyncio.sleep(0)
+    scheduler.release("b")
+    await asyncio.gather(*tasks)
+    assert order == ["b", "a"]
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    scheduler = DownloadScheduler(max_concurrent=1)
+    await scheduler.acquire("running")
+    waiter = asyncio.create_task(scheduler.acquire("removed", 1))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.stats()["waiting"] == 0
+
+    scheduler.release("running")
+    assert scheduler.stats()["active"] == 0
+
+
+def test_limit_drops_when_parallelism_does_not_help():
+    scheduler = DownloadScheduler(max_concurrent=2)
+    # One download alone at 10 MB/s; two in parallel at 5 MB/s each
+    scheduler._record(1, 10e6)
+    scheduler._record(2, 5e6)
+    assert scheduler.limit == 1
+
+
+def test_limit_stays_when_parallelism_helps():
+    scheduler = DownloadScheduler(max_concurrent=2)
+    scheduler._record(1, 10e6)
+    scheduler._record(2, 8e6)
+    assert scheduler.limit == 2
@@ -1,4 +1,7 @@
+import asyncio
+import threading
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -45,3 +48,191 @@ def test_creates_video_dir_on_ensure_dir(tmp_path: Path) -> None:
     d = VideoDownloader(video_dir=video_dir, max_concurrent=1)
     d.ensure_dir()
     assert video_dir.exists()
+
+
+def test_partial_downloads_are_not_cached(downloader: VideoDownloader, tmp_video_dir: Path) -> None:
+    (tmp_video_dir / "abc123.webm.part").write_text("partial")
+    (tmp_video_dir / "abc123.f137.mp4").write_text("video stream only")
+    assert downloader.is_cached("abc123") is False
+
+
+def test_lookup_uses_index(downloader: VideoDownloader, tmp_video_dir: Path) -> None:
+    (tmp_video_dir / "abc123.webm").write_text("fake video")
+    downloader.scan()
+    cached = downloader.lookup("abc123")
+    assert cached is not None
+    assert cached.size == len("fake video")
+    assert downloader.stats()["videos"] == 1
+    assert downloader.stats()["bytes"] == len("fake video")
+
+
+def test_index_picks_up_external_changes(downloader: VideoDownloader, tmp_video_dir: Path) -> None:
+    downloader.scan()
+    assert downloader.is_cached("abc123") is False
+    (tmp_video_dir / "abc123.webm").write_text("fake video")
+    assert downloader.is_cached("abc123") is True
+    (tmp_video_dir / "abc123.webm").unlink()
+    assert downloader.is_cached("abc123") is False
+
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL: reports progress and writes the file."""
+
+    runs = 0
+    release = threading.Event()
+
+    def __init__(self, opts: dict) -> None:
+        self.opts = opts
+
+    def __enter__(self) -> "FakeYoutubeDL":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def download(self, urls: list[str]) -> None:
+        FakeYoutubeDL.runs += 1
+        FakeYoutubeDL.release.wait(timeout=5)
+        for hook in self.opts.get("progress_hooks", []):
+            hook({"status": "downloading", "downloaded_bytes": 50, "total_bytes": 100})
+        Path(self.opts["outtmpl"].replace("%(ext)s", "webm")).write_text("video")
+
+
+async def test_concurrent_downloads_share_one_run(downloader: VideoDownloader) -> None:
+    FakeYoutubeDL.runs = 0
+    FakeYoutubeDL.release.clear()
+    progress_a: list[float] = []
+    progress_b: list[float] = []
+
+    with patch("yoke.downloader.yt_dlp.YoutubeDL", FakeYoutubeDL):
+        first = asyncio.create_task(downloader.download("abc123", progress_a.append))
+        second = asyncio.create_task(downloader.download("abc123", progress_b.append))
+        await asyncio.sleep(0.05)
+        assert downloader.stats()["downloading"] == 1
+        FakeYoutubeDL.release.set()
+        paths = await asyncio.gather(first, second)
+
+    assert FakeYoutubeDL.runs == 1
+    assert paths[0] == paths[1] == downloader.video_path("abc123")
+    assert progress_a == progress_b == [0.5]
+    assert downloader.stats()["coalesced"] == 1
+    assert downloader.stats()["downloading"] == 0
+
+
+async def test_reprioritize_cancels_unqueued_downloads(tmp_video_dir: Path) -> None:
+    FakeYoutubeDL.runs = 0
+    FakeYoutubeDL.release.clear()
+    downloader = VideoDownloader(video_dir=tmp_video_dir, max_concurrent=1)
+
+    with patch("yoke.downloader.yt_dlp.YoutubeDL", FakeYoutubeDL):
+        running = asyncio.create_task(downloader.download("aaa"))
+        waiting = asyncio.create_task(downloader.download("bbb", priority=3))
+        await asyncio.sleep(0.05)
+
+        downloader.reprioritize({})
+        FakeYoutubeDL.release.set()
+        results = await asyncio.gather(running, waiting, return_exceptions=True)
+
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert FakeYoutubeDL.runs == 1
+    assert downloader.is_cached("aaa") is False
+    assert downloader.scheduler.stats()["active"] == 0
+
+
+async def test_download_is_renamed_into_place(downloader: VideoDownloader, tmp_video_dir: Path) -> None:
+    FakeYoutubeDL.release.set()
+    with patch("yoke.downloader.yt_dlp.YoutubeDL", FakeYoutubeDL):
+        path = await downloader.download("abc123")
+
+    assert path == tmp_video_dir / "abc123.webm"
+    assert path.read_text() == "video"
+    assert downloader.partial_downloads() == set()
+
+
+def test_partial_downloads(downloader: VideoDownloader, tmp_video_dir: Path) -> None:
+    (tmp_video_dir / ".partial" / "abc123.webm.part").write_text("partial")
+    assert downloader.is_cached("abc123") is False
+    assert downloader.partial_downloads() == {"abc123"}
+    downloader.discard_partial("abc123")
+    assert downloader.partial_downloads() == set()
+
+
+class ProgressiveFakeYoutubeDL(FakeYoutubeDL):
+    """Writes a .part file, reports progress, then renames it when released."""
+
+    def download(self, urls: list[str]) -> None:
+        final = Path(self.opts["outtmpl"].replace("%(ext)s", "mp4"))
+        part = final.with_name(final.name + ".part")
+        part.write_bytes(b"x" * 60)
+        for hook in self.opts["progress_hooks"]:
+            hook({
+                "status": "downloading",
+                "downloaded_bytes": 60,
+                "total_bytes": 100,
+                "tmpfilename": str(part),
+                "filename": str(final),
+            })
+        FakeYoutubeDL.release.wait(timeout=5)
+        with part.open("ab") as f:
+            f.write(b"x" * 40)
+        part.rename(final)
+
+
+async def test_progressive_download_can_be_read_while_downloading(tmp_video_dir: Path) -> None:
+    FakeYoutubeDL.release.clear()
+    downloader = VideoDownloader(video_dir=tmp_video_dir, progressive=True)
+
+    with (
+        patch("yoke.downloader.yt_dlp.YoutubeDL", ProgressiveFakeYoutubeDL),
+        patch("yoke.downloader._STREAM_START_BYTES", 50),
+    ):
+        task = asyncio.create_task(downloader.download("abc123"))
+        for _ in range(50):
+            if downloader.partial_video("abc123") is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert downloader.is_streamable("abc123") is True
+        opened = downloader.open_partial("abc123")
+        assert opened is not None
+        file, partial = opened
+        assert (partial.downloaded, partial.total) == (60, 100)
+        assert partial.final_path.name == "abc123.mp4"
+
+        FakeYoutubeDL.release.set()
+        path = await task
+
+    # The open file follows the renames into the video directory
+    with file:
+        assert len(file.read()) == 100
+    assert path == tmp_video_dir / "abc123.mp4"
+    assert downloader.partial_video("abc123") is None
+    assert downloader.open_partial("abc123") is None
+
+
+async def test_merged_downloads_are_not_streamable(downloader: VideoDownloader) -> None:
+    FakeYoutubeDL.release.set()
+    with patch("yoke.downloader.yt_dlp.YoutubeDL", ProgressiveFakeYoutubeDL):
+        await downloader.download("abc123")
+    assert downloader.is_streamable("abc123") is False
+    assert downloader.stats()["streaming"] == 0
+
+
+async def test_audio_downloads_wait_for_a_slot(tmp_video_dir: Path) -> None:
+    FakeYoutubeDL.runs = 0
+    FakeYoutubeDL.release.clear()
+    downloader = VideoDownloader(video_dir=tmp_video_dir, max_concurrent=1)
+
+    with patch("yoke.downloader.yt_dlp.YoutubeDL", FakeYoutubeDL):
+        video = asyncio.create_task(downloader.download("aaa"))
+        audio = asyncio.create_task(downloader.download_audio("bbb", priority=1))
+        await asyncio.sleep(0.05)
+        assert FakeYoutubeDL.runs == 1
+        assert downloader.scheduler.stats()["waiting"] == 1
+
+        FakeYoutubeDL.release.set()
+        await video
+        path = await audio
+
+    assert FakeYoutubeDL.runs == 2
+    assert path.name == "bbb.webm"
+    assert downloader.scheduler.stats()["active"] == 0
@@ -1,9 +1,21 @@
+import sys
 from pathlib import Path
 from unittest.mock import patch
 
 import numpy as np
 
-from yoke.key_analyzer import _detect_key_sync, detect_key
+from yoke.key_analyzer import (
+    _KEY_NAMES,
+    _MAJOR_PROFILE,
+    _MINOR_PROFILE,
+    KEY_LABELS,
+    KeyAnalyzer,
+    _detect_key_sync,
+    _load_audio,
+    _match_key,
+    detect_key,
+    key_scores,
+)
 
 
 def _make_sine_wav(path: Path, freq: float = 440.0, sr: int = 22050, duration: float = 2.0) -> None:
@@ -37,3 +49,229 @@ async def test_detect_key_async(tmp_path: Path) -> None:
     result = await detect_key(wav)
     assert result is not None
     assert isinstance(result, str)
+
+
+async def test_key_analyzer_process_pool(tmp_path: Path) -> None:
+    wav = tmp_path / "test.wav"
+    _make_sine_wav(wav, freq=440.0)
+
+    analyzer = KeyAnalyzer(workers=1)
+    try:
+        assert await analyzer.detect(wav) == _detect_key_sync(wav)
+        assert await analyzer.detect(tmp_path / "nonexistent.wav") is None
+    finally:
+        analyzer.close()
+
+    stats = analyzer.stats()
+    assert stats["jobs"] == 2
+    assert stats["failures"] == 1
+    assert stats["avg_run_ms"] > 0
+
+
+def _loop_match_key(chroma_mean: np.ndarray) -> tuple[str, list[float]]:
+    """The original per-shift np.corrcoef matcher, kept as a reference."""
+    best_corr = -2.0
+    best_key = ""
+    scores = []
+    for shift in range(12):
+        rolled = np.roll(chroma_mean, -shift)
+        major_corr = float(np.corrcoef(rolled, _MAJOR_PROFILE)[0, 1])
+        if major_corr > best_corr:
+            best_corr = major_corr
+            best_key = _KEY_NAMES[shift]
+        minor_corr = float(np.corrcoef(rolled, _MINOR_PROFILE)[0, 1])
+        if minor_corr > best_corr:
+            best_corr = minor_corr
+            best_key = f"{_KEY_NAMES[shift]}m"
+        scores += [major_corr, minor_corr]
+    return best_key, scores
+
+
+def test_vectorized_match_agrees_with_loop() -> None:
+    rng = np.random.default_rng(0)
+    chromas = [rng.random(12) for _ in range(500)]
+    chromas += [np.roll(_MAJOR_PROFILE, s) for s in range(12)]
+    chromas += [np.roll(_MINOR_PROFILE, s) for s in range(12)]
+
+    for chroma in chromas:
+        expected_key, expected_scores = _loop_match_key(chroma)
+        assert _match_key(chroma) == expected_key
+        np.testing.assert_allclose(key_scores(chroma), expected_scores, atol=1e-12)
+    assert KEY_LABELS[:2] == ["C", "Cm"]
+
+
+def test_match_key_silence() -> None:
+    with np.errstate(invalid="ignore"):
+        expected_key, _ = _loop_match_key(np.zeros(12))
+    assert _match_key(np.zeros(12)) == expected_key == ""
+
+
+def test_load_audio_reads_ffmpeg_pipe(tmp_path: Path) -> None:
+    # A stand-in ffmpeg that emits 3 seconds of float32 samples
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "import numpy as np\n"
+        "sys.stdout.buffer.write(np.arange(3 * 100, dtype=np.float32).tobytes())\n"
+    )
+    fake.chmod(0o755)
+
+    with patch("yoke.key_analyzer.shutil.which", return_value=str(fake)):
+        y = _load_audio(tmp_path / "song.webm", sr=100, duration=2.0)
+
+    assert y.dtype == np.float32
+    np.testing.assert_array_equal(y, np.arange(200, dtype=np.float32))
+
+
+def test_load_audio_survives_noisy_stderr(tmp_path: Path) -> None:
+    # Far more errors than a pipe buffer holds, written before any samples
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "import numpy as np\n"
+        "sys.stderr.write('decode error\\n' * 100000)\n"
+        "sys.stderr.flush()\n"
+        "sys.stdout.buffer.write(np.arange(3 * 100, dtype=np.float32).tobytes())\n"
+    )
+    fake.chmod(0o755)
+
+    with patch("yoke.key_analyzer.shutil.which", return_value=str(fake)):
+        y = _load_audio(tmp_path / "song.webm", sr=100, duration=2.0)
+
+    np.testing.assert_array_equal(y, np.arange(200, dtype=np.float32))
+
+
+def test_load_audio_reports_ffmpeg_errors(tmp_path: Path) -> None:
+    import pytest
+
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "sys.stderr.write('Invalid data found\\n')\n"
+        "sys.exit(1)\n"
+    )
+    fake.chmod(0o755)
+
+    with patch("yoke.key_analyzer.shutil.which", return_value=str(fake)):
+        with pytest.raises(RuntimeError, match="Invalid data found"):
+            _load_audio(tmp_path / "song.webm", sr=100, duration=2.0)
+
+
+def test_load_audio_without_ffmpeg_uses_librosa(tmp_path: Path) -> None:
+    wav = tmp_path / "test.wav"
+    _make_sine_wav(wav, duration=2.0)
+
+    with patch("yoke.key_analyzer.shutil.which", return_value=None):
+        y = _load_audio(wav, offset=0.5, duration=1.0)
+
+    assert len(y) == 22050
+
+
+class _FakeProcess:
+    def __init__(self) -> None:
+        self.terminated = False
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+class _StuckPool:
+    """Stands in for the process pool: jobs start but never finish."""
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.shut_down = False
+        self.process = _FakeProcess()
+        self._processes = {1: self.process}
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+
+        self.submitted += 1
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self.shut_down = True
+
+
+async def test_key_analyzer_rejects_when_queue_is_full(tmp_path: Path) -> None:
+    import asyncio
+
+    analyzer = KeyAnalyzer(workers=1, max_pending=1)
+    analyzer._pool = _StuckPool()
+    running = [asyncio.create_task(analyzer.detect(tmp_path / f"{i}.wav")) for i in range(2)]
+    await asyncio.sleep(0)
+
+    assert await analyzer.detect(tmp_path / "extra.wav") is None
+    assert analyzer.stats()["rejected"] == 1
+    assert analyzer._pool.submitted == 1
+
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    assert analyzer._pending == 0
+
+
+async def test_key_analyzer_timeout_replaces_pool(tmp_path: Path) -> None:
+    analyzer = KeyAnalyzer(workers=1, timeout=0.05)
+    stuck = _StuckPool()
+    analyzer._pool = stuck
+
+    assert await analyzer.detect(tmp_path / "slow.wav") is None
+    assert analyzer.stats()["timeouts"] == 1
+    assert stuck.shut_down
+    assert stuck.process.terminated
+    assert analyzer._pool is None
+
+
+class _BrokenPool(_StuckPool):
+    """Stands in for a process pool whose worker was killed."""
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+
+        self.submitted += 1
+        future: Future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+async def test_key_analyzer_replaces_broken_pool(tmp_path: Path) -> None:
+    analyzer = KeyAnalyzer(workers=1)
+    broken = _BrokenPool()
+    analyzer._pool = broken
+
+    assert await analyzer.detect(tmp_path / "crash.wav") is None
+    assert analyzer.stats()["failures"] == 1
+    assert broken.shut_down
+    assert analyzer._pool is None
+
+
+def test_terminate_kills_busy_workers() -> None:
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    import pytest
+
+    from yoke.key_analyzer import _terminate
+
+    pool = ProcessPoolExecutor(max_workers=1)
+    future = pool.submit(time.sleep, 60)
+    while not future.running():
+        time.sleep(0.01)
+    processes = list(pool._processes.values())
+
+    _terminate(pool)
+
+    with pytest.raises(BrokenProcessPool):
+        future.result(timeout=10)
+    for process in processes:
+        process.join(timeout=10)
+        assert not process.is_alive()
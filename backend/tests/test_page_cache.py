@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from yoke.page_cache import PageCacheWarmer
+
+
+@pytest.fixture()
+def videos(tmp_path: Path) -> dict[str, Path]:
+    paths = {}
+    for video_id in ("aaa", "bbb", "ccc"):
+        path = tmp_path / f"{video_id}.webm"
+        path.write_bytes(b"x" * 1000)
+        paths[video_id] = path
+    return paths
+
+
+def _drain(warmer: PageCacheWarmer) -> None:
+    warmer._executor.submit(lambda: None).result()
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="needs posix_fadvise")
+def test_warms_new_and_drops_departed_videos(videos: dict[str, Path]) -> None:
+    warmer = PageCacheWarmer()
+    advice: list[tuple[int, int]] = []
+    real_fadvise = os.posix_fadvise
+
+    def fadvise(fd: int, offset: int, length: int, hint: int) -> None:
+        advice.append((os.fstat(fd).st_ino, hint))
+        real_fadvise(fd, offset, length, hint)
+
+    inode = {vid: path.stat().st_ino for vid, path in videos.items()}
+    with patch("yoke.page_cache.os.posix_fadvise", side_effect=fadvise):
+        warmer.update({"aaa": videos["aaa"], "bbb": videos["bbb"]})
+        _drain(warmer)
+        assert sorted(advice) == sorted(
+            [
+                (inode["aaa"], os.POSIX_FADV_WILLNEED),
+                (inode["bbb"], os.POSIX_FADV_WILLNEED),
+            ]
+        )
+
+        # The queue advanced: aaa finished, ccc comes up
+        advice.clear()
+        warmer.update({"bbb": videos["bbb"], "ccc": videos["ccc"]})
+        _drain(warmer)
+    warmer.close()
+
+    assert sorted(advice) == sorted(
+        [(inode["ccc"], os.POSIX_FADV_WILLNEED), (inode["aaa"], os.POSIX_FADV_DONTNEED)]
+    )
+    assert warmer.stats() == {
+        "warm": 2,
+        "warmed": 3,
+        "dropped": 1,
+        "bytes_warmed": 3000,
+        "failed": 0,
+    }
+
+
+def test_reads_file_start_without_fadvise(videos: dict[str, Path]) -> None:
+    warmer = PageCacheWarmer()
+    with (
+        patch("yoke.page_cache._HAS_FADVISE", False),
+        patch("yoke.page_cache._TOUCH_BYTES", 500),
+        patch("yoke.page_cache._TOUCH_CHUNK", 200),
+    ):
+        warmer.update({"aaa": videos["aaa"]})
+        _drain(warmer)
+        warmer.update({})
+        _drain(warmer)
+    warmer.close()
+    assert warmer.stats()["bytes_warmed"] == 600
+    assert warmer.stats()["dropped"] == 0
+
+
+def test_missing_files_are_skipped(tmp_path: Path) -> None:
+    warmer = PageCacheWarmer()
+    warmer.update({"gone": tmp_path / "gone.webm"})
+    _drain(warmer)
+    warmer.close()
+    assert warmer.stats()["warmed"] == 0
+    assert warmer.stats()["failed"] == 0
@@ -61,6 +61,18 @@ async def test_save_and_get_song(store: RedisStore):
     assert result.cached is True
 
 
+async def test_save_and_get_songs(store: RedisStore):
+    songs = [
+        Song(video_id=vid, title=vid, thumbnail_url="", duration_seconds=60)
+        for vid in ("a", "b")
+    ]
+    await store.save_songs(songs)
+    result = await store.get_songs(["a", "missing", "b"])
+    assert list(result) == ["a", "b"]
+    assert result["b"].title == "b"
+    assert await store.get_songs([]) == {}
+
+
 async def test_queue_operations(store: RedisStore):
     singer = Singer(name="Alice")
     song = Song(
@@ -137,3 +149,113 @@ async def test_get_full_state(store: RedisStore):
     assert isinstance(state, SessionState)
     assert len(state.singers) == 1
     assert state.settings.host_id == singer.id
+
+
+def _item(video_id: str, singer: Singer | None = None) -> QueueItem:
+    song = Song(
+        video_id=video_id, title=video_id, thumbnail_url="", duration_seconds=60
+    )
+    return QueueItem(song=song, singer=singer or Singer(name="Alice"))
+
+
+async def test_prepend_to_queue(store: RedisStore):
+    item1 = _item("a")
+    item2 = _item("b")
+    item3 = _item("c")
+
+    await store.append_to_queue(item1)
+    await store.prepend_to_queue(item2)
+    await store.prepend_to_queue(item3)
+
+    queue = await store.get_queue()
+    assert [qi.id for qi in queue] == [item3.id, item2.id, item1.id]
+
+
+async def test_update_queue_item_keeps_position(store: RedisStore):
+    items = [_item(v) for v in "abc"]
+    for item in items:
+        await store.append_to_queue(item)
+
+    await store.update_queue_item(items[1].id, status="ready")
+
+    queue = await store.get_queue()
+    assert [qi.id for qi in queue] == [qi.id for qi in items]
+    assert queue[1].status == "ready"
+    assert queue[0].status == "waiting"
+
+
+async def test_update_missing_queue_item_is_noop(store: RedisStore):
+    await store.update_queue_item("missing", status="ready")
+    assert await store.get_queue() == []
+
+
+async def test_reorder_queue_drops_unlisted_items(store: RedisStore):
+    items = [_item(v) for v in "abc"]
+    for item in items:
+        await store.append_to_queue(item)
+
+    await store.reorder_queue([items[2].id, "unknown", items[0].id])
+
+    queue = await store.get_queue()
+    assert [qi.id for qi in queue] == [items[2].id, items[0].id]
+
+    # Appends after a reorder land at the back
+    extra = _item("d")
+    await store.append_to_queue(extra)
+    queue = await store.get_queue()
+    assert queue[-1].id == extra.id
+
+
+async def test_pop_queue_front(store: RedisStore):
+    item1 = _item("a")
+    item2 = _item("b")
+    await store.append_to_queue(item1)
+    await store.append_to_queue(item2)
+
+    popped = await store.pop_queue_front()
+    assert popped is not None
+    assert popped.id == item1.id
+
+    queue = await store.get_queue()
+    assert [qi.id for qi in queue] == [item2.id]
+
+
+async def test_pop_queue_front_empty(store: RedisStore):
+    assert await store.pop_queue_front() is None
+
+
+async def test_migrate_legacy_queue(store: RedisStore):
+    items = [_item(v) for v in "ab"]
+    for item in items:
+        await store._r.rpush("yoke:queue", item.model_dump_json())
+
+    assert await store.migrate_legacy_queue() == 2
+    queue = await store.get_queue()
+    assert [qi.id for qi in queue] == [qi.id for qi in items]
+    assert not await store._r.exists("yoke:queue")
+
+    # Second run is a no-op
+    assert await store.migrate_legacy_queue() == 0
+
+
+async def test_get_full_state_snapshot(store: RedisStore):
+    singer = Singer(name="Alice")
+    await store.save_singer(singer)
+    item1 = _item("a", singer)
+    item2 = _item("b", singer)
+    await store.append_to_queue(item1)
+    await store.append_to_queue(item2)
+    await store.save_current(_item("c", singer))
+    await store.save_playback(PlaybackState(status="paused", position_seconds=12.0))
+
+    state = await store.get_full_state()
+    assert [qi.id for qi in state.queue] == [item1.id, item2.id]
+    assert state.current is not None
+    assert state.current.song.video_id == "c"
+    assert state.playback.status == "paused"
+    assert state.settings.host_id is None
+
+
+async def test_get_full_state_defaults(store: RedisStore):
+    state = await store.get_full_state()
+    assert state == SessionState()
@@ -1,22 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from pathlib import Path
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import fakeredis.aioredis
 import pytest
 
-from yoke.downloader import VideoDownloader
+from yoke.downloader import PartialVideo, VideoDownloader
 from yoke.models import PlaybackState, Song
 from yoke.redis_store import RedisStore
-from yoke.router import MessageRouter
+from yoke.router import MessageRouter, _queue_moves
 from yoke.session import SessionManager
 from yoke.ws import ConnectionManager
+from yoke.youtube import YoutubeResult
 
 
 def make_mock_ws(singer_id: str | None = None) -> AsyncMock:
     ws = AsyncMock()
     ws.singer_id = singer_id
+
+    # ConnectionManager sends pre-encoded text frames; decode them back into
+    # send_json calls so assertions can inspect plain dicts.
+    async def _send_text(text: str) -> None:
+        await ws.send_json(json.loads(text))
+
+    ws.send_text.side_effect = _send_text
     return ws
 
 
@@ -39,6 +49,17 @@ async def setup(tmp_path: Path):
     router = MessageRouter(
         session=session, connections=connections, downloader=downloader
     )
+
+    # Outbound frames are written by per-client tasks; deliver them before
+    # each test inspects what a client received.
+    handle = router.handle
+
+    async def handle_and_flush(ws, message):
+        await handle(ws, message)
+        await router.updates.flush()
+        await connections.flush()
+
+    router.handle = handle_and_flush
     yield router, connections, session, store
     await redis.aclose()
 
@@ -345,10 +366,13 @@ async def test_handle_queue_song(setup):
     assert len(queue) == 1
     assert queue[0].song.video_id == "v1"
 
-    # Should broadcast queue_updated
+    # Should broadcast an item_added diff
     sent = [call[0][0] for call in ws.send_json.call_args_list]
-    queue_msgs = [m for m in sent if m.get("type") == "queue_updated"]
-    assert len(queue_msgs) > 0
+    added_msgs = [m for m in sent if m.get("type") == "item_added"]
+    assert len(added_msgs) == 1
+    assert added_msgs[0]["item"]["song"]["video_id"] == "v1"
+    assert added_msgs[0]["index"] == 0
+    assert added_msgs[0]["rev"] == 1
 
 
 async def test_handle_remove_from_queue(setup):
@@ -385,6 +409,477 @@ async def test_handle_reorder_queue(setup):
     assert queue[0].id == item2.id
     assert queue[1].id == item1.id
 
+    sent = [call[0][0] for call in ws.send_json.call_args_list]
+    reordered = [m for m in sent if m.get("type") == "queue_reordered"]
+    assert len(reordered) == 1
+    assert reordered[0]["removed"] == []
+    assert reordered[0]["moves"] == [{"item_id": item2.id, "index": 0}]
+    assert not [m for m in sent if m.get("type") == "queue_updated"]
+
+
+async def test_large_reorder_sends_whole_queue_once(setup):
+    router, connections, session, store = setup
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    items = [await session.queue_song(ws.singer_id, _song(f"v{i}")) for i in range(40)]
+    ws.send_json.reset_mock()
+
+    reversed_ids = [item.id for item in reversed(items)]
+    await router.handle(ws, {"type": "reorder_queue", "item_ids": reversed_ids})
+
+    sent = [call[0][0] for call in ws.send_json.call_args_list]
+    diffs = [m for m in sent if m["type"] in ("queue_updated", "item_moved")]
+    assert [m["type"] for m in diffs] == ["queue_updated"]
+    assert [qi["id"] for qi in diffs[0]["queue"]] == reversed_ids
+    assert ws in connections.active_connections
+
+
+async def test_handle_remove_broadcasts_item_removed(setup):
+    router, connections, session, store = setup
+
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    item = await session.queue_song(ws.singer_id, _song())
+    ws.send_json.reset_mock()
+    rev = router.queue_rev
+
+    await router.handle(ws, {"type": "remove_from_queue", "item_id": item.id})
+
+    sent = [call[0][0] for call in ws.send_json.call_args_list]
+    assert sent == [{"type": "item_removed", "item_id": item.id, "rev": rev + 1}]
+
+
+async def test_handle_search_replies_then_saves_songs(setup):
+    router, connections, session, store = setup
+    ws = make_mock_ws()
+    results = [
+        YoutubeResult(
+            video_id=f"v{i}", title=f"Song {i}", thumbnail_url="", duration_seconds=60
+        )
+        for i in range(3)
+    ]
+
+    with patch("yoke.router.search_youtube", AsyncMock(return_value=results)):
+        await router.handle(ws, {"type": "search", "query": "song"})
+
+    msg = ws.send_json.call_args[0][0]
+    assert msg["type"] == "search_results"
+    assert [s["video_id"] for s in msg["songs"]] == ["v0", "v1", "v2"]
+
+    await router.close()
+    assert set(await store.get_songs(["v0", "v1", "v2"])) == {"v0", "v1", "v2"}
+
+
+async def test_handle_queue_sync(setup):
+    router, connections, session, store = setup
+
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    item = await session.queue_song(ws.singer_id, _song())
+    router.queue_rev = 7
+    ws.send_json.reset_mock()
+
+    await router.handle(ws, {"type": "queue_sync"})
+
+    sent = ws.send_json.call_args_list[0][0][0]
+    assert sent["type"] == "queue_updated"
+    assert sent["rev"] == 7
+    assert [qi["id"] for qi in sent["queue"]] == [item.id]
+
+
+async def test_state_message_includes_queue_rev(setup):
+    router, connections, session, store = setup
+    router.queue_rev = 3
+
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+
+    sent = ws.send_json.call_args_list[0][0][0]
+    assert sent["type"] == "state"
+    assert sent["queue_rev"] == 3
+
+
+async def _drain_downloads(router: MessageRouter) -> None:
+    while router._downloads:
+        await asyncio.gather(*router._downloads.values(), return_exceptions=True)
+    if router._background:
+        await asyncio.gather(*router._background)
+
+
+def _fake_download(downloader: VideoDownloader) -> AsyncMock:
+    """Mock VideoDownloader.download that writes a placeholder file."""
+
+    async def download(video_id, on_progress=None, priority=0):
+        downloader.ensure_dir()
+        path = downloader.video_path(video_id)
+        path.write_bytes(b"video")
+        return path
+
+    return AsyncMock(side_effect=download)
+
+
+async def test_prefetch_downloads_and_analyzes_next_items(setup):
+    router, connections, session, store = setup
+    router.downloader.download = _fake_download(router.downloader)
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    await store.save_song(_song("v1"))
+
+    with patch("yoke.router.detect_key", AsyncMock(return_value="A minor")):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        await _drain_downloads(router)
+
+    assert (await store.get_song("v1")).detected_key == "A minor"
+    current = await store.get_current()
+    assert current is not None
+    assert current.song.video_id == "v1"
+
+
+async def test_failed_downloads_are_retried(setup):
+    router, connections, session, store = setup
+    router.downloader.download = AsyncMock(side_effect=RuntimeError("offline"))
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+
+    with patch("yoke.router._DOWNLOAD_RETRY_DELAY", 0):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        item_id = (await store.get_queue())[0].id
+        await router.handle(ws, {"type": "queue_song", "video_id": "v2"})
+        await _drain_downloads(router)
+    await connections.flush()
+
+    assert router.downloader.download.await_count == 6
+    # Given up on: removed instead of being played without a file
+    assert await store.get_current() is None
+    assert await store.get_queue() == []
+    sent = [c[0][0] for c in ws.send_json.call_args_list]
+    assert any(m["type"] == "item_removed" and m["item_id"] == item_id for m in sent)
+    assert router._download_failures == {}
+
+
+async def test_progress_is_not_sent_after_ready(setup):
+    router, connections, session, store = setup
+    write = _fake_download(router.downloader).side_effect
+
+    async def download(video_id, on_progress=None, priority=0):
+        on_progress(1.0)
+        return await write(video_id)
+
+    router.downloader.download = AsyncMock(side_effect=download)
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    await store.save_song(_song("v1"))
+
+    with patch("yoke.router.detect_key", AsyncMock(return_value="A minor")):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        await _drain_downloads(router)
+    await router.updates.flush()
+    await connections.flush()
+
+    sent = [c[0][0]["type"] for c in ws.send_json.call_args_list]
+    assert "download_progress" not in sent
+    assert "now_playing" in sent
+
+
+async def test_failed_retry_waits_before_downloading_again(setup):
+    router, connections, session, store = setup
+    router.downloader.download = AsyncMock(side_effect=RuntimeError("offline"))
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+
+    with patch("yoke.router._DOWNLOAD_RETRY_DELAY", 60):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        await asyncio.sleep(0.05)
+        await router._prefetch()
+
+    assert router.downloader.download.await_count == 1
+    assert (await store.get_queue())[0].status == "waiting"
+    for task in router._downloads.values():
+        task.cancel()
+
+
+async def test_key_analysis_errors_dont_fail_the_download(setup):
+    router, connections, session, store = setup
+    router.downloader.download = _fake_download(router.downloader)
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+
+    detect = AsyncMock(side_effect=RuntimeError("worker died"))
+    with patch("yoke.router.detect_key", detect):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        await router.handle(ws, {"type": "queue_song", "video_id": "v2"})
+        await _drain_downloads(router)
+    await connections.flush()
+
+    assert router.downloader.download.await_count == 2
+    sent = [c[0][0] for c in ws.send_json.call_args_list]
+    assert not any(m["type"] == "download_error" for m in sent)
+    current = await store.get_current()
+    assert current is not None
+    assert current.song.video_id == "v1"
+    assert [item.status for item in await store.get_queue()] == ["ready"]
+
+
+async def test_auto_advance_waits_for_next_item(setup):
+    router, connections, session, store = setup
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    await session.queue_song(ws.singer_id, _song("v1"))
+    ready = await session.queue_song(ws.singer_id, _song("v2"))
+    await store.update_queue_item(ready.id, status="ready")
+
+    await router._auto_advance()
+    assert await store.get_current() is None
+
+    queue = await store.get_queue()
+    await store.update_queue_item(queue[0].id, status="ready")
+    await router._prefetch()
+    assert router.ready_horizon == 2
+
+
+async def test_progressive_download_plays_while_downloading(setup):
+    router, connections, session, store = setup
+    downloader = router.downloader
+    finish = asyncio.Event()
+
+    async def download(video_id, on_progress=None, priority=0):
+        path = downloader._partial_dir / f"{video_id}.mp4"
+        downloader._partial[video_id] = PartialVideo(
+            path=path.with_suffix(".mp4.part"),
+            final_path=path,
+            downloaded=4 * 1024 * 1024,
+            total=8 * 1024 * 1024,
+        )
+        on_progress(0.5)
+        await finish.wait()
+        downloader._partial.pop(video_id)
+        return await _fake_download(downloader).side_effect(video_id)
+
+    downloader.download = AsyncMock(side_effect=download)
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    await store.save_song(_song("v1"))
+
+    with patch("yoke.router.detect_key", AsyncMock(return_value="A minor")):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        for _ in range(50):
+            if await store.get_current() is not None:
+                break
+            await asyncio.sleep(0.01)
+        current = await store.get_current()
+        assert current is not None
+        assert current.song.video_id == "v1"
+
+        finish.set()
+        await _drain_downloads(router)
+
+
+async def test_prefetch_warms_current_and_next_videos(setup):
+    router, connections, session, store = setup
+    router.page_cache = MagicMock(lookahead=1)
+    router.downloader.ensure_dir()
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    for video_id in ("v1", "v2", "v3"):
+        router.downloader.video_path(video_id).write_bytes(b"video")
+        await store.save_song(_song(video_id))
+        await router.handle(ws, {"type": "queue_song", "video_id": video_id})
+
+    assert (await store.get_current()).song.video_id == "v1"
+    router.page_cache.update.assert_called_with(
+        {
+            "v1": router.downloader.video_path("v1"),
+            "v2": router.downloader.video_path("v2"),
+        }
+    )
+
+
+async def test_reconcile_downloads_after_restart(setup):
+    router, connections, session, store = setup
+    downloader = router.downloader
+    downloader.ensure_dir()
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    stuck = await session.queue_song(ws.singer_id, _song("v1"))
+    await store.update_queue_item(stuck.id, status="downloading")
+    await store.add_inflight_download("v1", 0.0)
+    await store.add_inflight_download("gone", 0.0)
+    (downloader._partial_dir / "gone.webm.part").write_text("partial")
+
+    downloader.download = AsyncMock()
+    await router.reconcile_downloads()
+    await _drain_downloads(router)
+
+    downloader.download.assert_awaited_once()
+    assert downloader.download.await_args.args[0] == "v1"
+    assert downloader.partial_downloads() == set()
+    assert await store.get_inflight_downloads() == []
+
+
+async def test_key_analysis_is_cached_per_file(setup):
+    router, connections, session, store = setup
+    router.downloader.ensure_dir()
+    router.downloader.video_path("v1").write_bytes(b"video")
+    await store.save_song(_song("v1"))
+
+    detect = AsyncMock(return_value="A minor")
+    with patch("yoke.router.detect_key", detect):
+        await router._analyze_key("v1")
+        # Search overwrites the song but keeps the analyzed key
+        results = [
+            YoutubeResult(
+                video_id="v1", title="Test Song", thumbnail_url="", duration_seconds=1
+            )
+        ]
+        ws = make_mock_ws()
+        with patch("yoke.router.search_youtube", AsyncMock(return_value=results)):
+            await router.handle(ws, {"type": "search", "query": "song"})
+        await router.close()
+        await router._analyze_key("v1")
+
+    detect.assert_awaited_once()
+    assert ws.send_json.call_args[0][0]["songs"][0]["detected_key"] == "A minor"
+    assert (await store.get_song("v1")).detected_key == "A minor"
+
+
+async def test_failed_key_analysis_is_retried(setup):
+    router, connections, session, store = setup
+    router.downloader.ensure_dir()
+    router.downloader.video_path("v1").write_bytes(b"video")
+    await store.save_song(_song("v1"))
+
+    detect = AsyncMock(side_effect=[None, "A minor"])
+    with patch("yoke.router.detect_key", detect):
+        await router._analyze_key("v1")
+        assert await store.get_key_analyses(["v1"]) == {}
+        await router._analyze_key("v1")
+
+    assert detect.await_count == 2
+    assert (await store.get_song("v1")).detected_key == "A minor"
+
+
+async def test_key_analysis_gives_up_after_repeated_failures(setup):
+    router, connections, session, store = setup
+    router.downloader.ensure_dir()
+    router.downloader.video_path("v1").write_bytes(b"video")
+    await store.save_song(_song("v1"))
+
+    detect = AsyncMock(return_value=None)
+    with patch("yoke.router.detect_key", detect):
+        for _ in range(5):
+            await router._analyze_key("v1")
+
+    assert detect.await_count == 3
+
+
+async def test_audio_first_key_detection(setup):
+    router, connections, session, store = setup
+    router.audio_first = True
+    downloader = router.downloader
+    downloader.download = _fake_download(downloader)
+    video_started = asyncio.Event()
+    release_video = asyncio.Event()
+    fake_video = downloader.download.side_effect
+
+    async def slow_video(*args, **kwargs):
+        video_started.set()
+        await release_video.wait()
+        return await fake_video(*args, **kwargs)
+
+    downloader.download.side_effect = slow_video
+
+    async def download_audio(video_id, priority=0):
+        downloader.ensure_dir()
+        path = downloader._partial_dir / f"{video_id}.audio"
+        path.write_bytes(b"audio")
+        return path
+
+    downloader.download_audio = download_audio
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    await store.save_song(_song("v1"))
+    detect = AsyncMock(return_value="E minor")
+
+    with patch("yoke.router.detect_key", detect):
+        await router.handle(ws, {"type": "queue_song", "video_id": "v1"})
+        await video_started.wait()
+        await asyncio.gather(*router._background)
+        await connections.flush()
+
+        # The key is known and announced while the video is still downloading
+        sent = [c[0][0] for c in ws.send_json.call_args_list]
+        assert {
+            "type": "key_detected",
+            "video_id": "v1",
+            "detected_key": "E minor",
+        } in sent
+        assert (await store.get_queue())[0].song.detected_key == "E minor"
+
+        release_video.set()
+        await _drain_downloads(router)
+
+    detect.assert_awaited_once()
+    current = await store.get_current()
+    assert current is not None
+    assert current.song.detected_key == "E minor"
+
+
+async def test_audio_first_is_limited_to_prefetch_window(setup):
+    router, connections, session, store = setup
+    router.audio_first = True
+    downloader = router.downloader
+    release = asyncio.Event()
+    fake_video = _fake_download(downloader).side_effect
+
+    async def slow_video(video_id, on_progress=None, priority=0):
+        await release.wait()
+        return await fake_video(video_id)
+
+    downloader.download = AsyncMock(side_effect=slow_video)
+    release_audio = asyncio.Event()
+
+    async def slow_audio(video_id, priority=0):
+        await release_audio.wait()
+        raise RuntimeError("no audio")
+
+    downloader.download_audio = AsyncMock(side_effect=slow_audio)
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+    for i in range(6):
+        await store.save_song(_song(f"v{i}"))
+        await session.queue_song(ws.singer_id, _song(f"v{i}"))
+
+    with patch("yoke.router.detect_key", AsyncMock(return_value=None)):
+        await router.reconcile_downloads()
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+        audio_ids = [c.args[0] for c in downloader.download_audio.call_args_list]
+        assert audio_ids == ["v0", "v1", "v2"]
+
+        # Videos finished while their audio analysis was still running
+        release.set()
+        while any(not t.done() for t in router._downloads.values()):
+            await asyncio.sleep(0.01)
+        songs = await store.get_songs([f"v{i}" for i in range(6)])
+        assert all(song.cached for song in songs.values())
+
+        release_audio.set()
+        await _drain_downloads(router)
+
+
+def test_queue_moves():
+    assert _queue_moves(["a", "b", "c"], ["a", "b", "c"]) == []
+    assert _queue_moves(["a", "b", "c", "d"], ["c", "a", "b", "d"]) == [("c", 0)]
+    assert _queue_moves(["a", "b", "c", "d"], ["b", "c", "d", "a"]) == [("a", 3)]
+
+    # Replaying the moves reproduces the target order
+    old, new = ["a", "b", "c", "d", "e"], ["e", "c", "a", "d", "b"]
+    current = list(old)
+    for item_id, index in _queue_moves(old, new):
+        current.remove(item_id)
+        current.insert(index, item_id)
+    assert current == new
+
 
 async def test_handle_position_update(setup):
     router, connections, session, store = setup
@@ -407,6 +902,62 @@ async def test_handle_position_update(setup):
     assert pos_msgs[0]["position"] == 55.5
 
 
+async def test_position_updates_are_coalesced(setup):
+    router, connections, session, store = setup
+
+    ws1 = make_mock_ws()
+    await router.handle(ws1, {"type": "join", "name": "Alice"})
+    ws2 = make_mock_ws()
+    await router.handle(ws2, {"type": "join", "name": "Bob"})
+    ws2.send_json.reset_mock()
+
+    for pos in (1.0, 2.0, 3.0):
+        await router._handle_position_update(ws1, {"position": pos})
+    await router.updates.flush()
+    await connections.flush()
+
+    sent = [call[0][0] for call in ws2.send_json.call_args_list]
+    assert sent == [{"type": "position_update", "position": 3.0}]
+
+
+async def test_position_persisted_lazily(setup):
+    router, connections, session, store = setup
+    router.position_persist_interval = 60
+
+    ws = make_mock_ws()
+    await router.handle(ws, {"type": "join", "name": "Alice"})
+
+    # First update persists, later ones within the interval stay in memory
+    await router.handle(ws, {"type": "position_update", "position": 10.0})
+    await router.handle(ws, {"type": "position_update", "position": 20.0})
+    assert (await store.get_playback()).position_seconds == 10.0
+
+    # Pausing folds the latest position into the saved state
+    await router.handle(ws, {"type": "playback", "action": "pause"})
+    playback = await store.get_playback()
+    assert playback.status == "paused"
+    assert playback.position_seconds == 20.0
+
+
+async def test_handle_subscribe(setup):
+    router, connections, session, store = setup
+
+    ws = make_mock_ws()
+    connections.connect(ws, role="control")
+    await router.handle(ws, {"type": "subscribe", "topics": ["progress"]})
+    await connections.broadcast(
+        {"type": "download_progress", "item_id": "a", "progress": 0.5}
+    )
+    await router.handle(ws, {"type": "unsubscribe", "topics": ["progress"]})
+    await connections.broadcast(
+        {"type": "download_progress", "item_id": "a", "progress": 0.9}
+    )
+    await connections.flush()
+
+    sent = [call[0][0] for call in ws.send_json.call_args_list]
+    assert [m["progress"] for m in sent] == [0.5]
+
+
 async def test_handle_playback_previous_with_history(setup):
     router, connections, session, store = setup
 
@@ -431,8 +982,10 @@ async def test_handle_playback_previous_with_history(setup):
     assert len(now_playing_msgs) == 1
     assert now_playing_msgs[0]["item"]["song"]["video_id"] == "v1"
 
-    queue_msgs = [m for m in sent if m.get("type") == "queue_updated"]
-    assert len(queue_msgs) == 1
+    added_msgs = [m for m in sent if m.get("type") == "item_added"]
+    assert len(added_msgs) == 1
+    assert added_msgs[0]["item"]["song"]["video_id"] == "v2"
+    assert added_msgs[0]["index"] == 0
 
     playback_msgs = [m for m in sent if m.get("type") == "playback_updated"]
     assert len(playback_msgs) == 1
@@ -608,7 +1161,7 @@ async def test_pitch_denied_for_non_singer(setup):
     assert playback.pitch_shift == 0  # unchanged
 
 
-async def test_rejoin_cleans_up_stale_connection(setup):
+async def test_rejoin_keeps_every_tab_registered(setup):
     router, connections, session, store = setup
 
     # First connection joins
@@ -625,7 +1178,17 @@ async def test_rejoin_cleans_up_stale_connection(setup):
         ws_new, {"type": "join", "name": "Alice", "singer_id": singer_id}
     )
 
-    # Old ws should be evicted, new ws should be registered
-    assert ws_old not in connections.active_connections
+    # Both tabs stay registered and receive the singer's messages
+    assert ws_old in connections.active_connections
     assert ws_new in connections.active_connections
     assert connections.get_by_singer_id(singer_id) is ws_new
+    assert connections.get_all_by_singer_id(singer_id) == [ws_old, ws_new]
+
+    await connections.send_to_singer(singer_id, {"type": "show_qr"})
+    await connections.flush()
+    ws_old.send_json.assert_any_call({"type": "show_qr"})
+    ws_new.send_json.assert_any_call({"type": "show_qr"})
+
+    # Closing one tab leaves the singer connected through the other
+    connections.disconnect(ws_old)
+    assert connections.is_singer_connected(singer_id)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import fakeredis.aioredis
+import pytest
+
+from yoke.redis_store import RedisStore
+from yoke.search_cache import SearchCache, normalize_query
+from yoke.youtube import YoutubeResult
+
+RESULTS = [
+    YoutubeResult(
+        video_id="abc123", title="Song", thumbnail_url="", duration_seconds=180
+    )
+]
+
+
+@pytest.fixture
+async def store():
+    redis = fakeredis.aioredis.FakeRedis()
+    yield RedisStore(redis)
+    await redis.aclose()
+
+
+def test_normalize_query():
+    assert normalize_query("  Bohemian   RHAPSODY ") == "bohemian rhapsody"
+
+
+async def test_repeated_query_hits_memory(store: RedisStore):
+    cache = SearchCache(store)
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS) as search:
+        assert await cache.search("Song") == RESULTS
+        assert await cache.search("  song ") == RESULTS
+
+    search.assert_awaited_once_with("song", max_results=15)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+async def test_results_shared_through_redis(store: RedisStore):
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS) as search:
+        await SearchCache(store).search("song")
+        # A fresh process-level cache still finds the results in Redis
+        fresh = SearchCache(store)
+        assert await fresh.search("song") == RESULTS
+
+    search.assert_awaited_once()
+    assert fresh.stats()["redis_hits"] == 1
+
+
+async def test_redis_hit_keeps_remaining_ttl(store: RedisStore):
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS):
+        await SearchCache(store, ttl=3600).search("song")
+    # Most of the Redis entry's lifetime has already passed
+    await store._r.expire("yoke:search:15:song", 10)
+
+    fresh = SearchCache(store, ttl=3600)
+    assert await fresh.search("song") == RESULTS
+
+    expires_at, _ = fresh._lru[("song", 15)]
+    assert 0 < expires_at - time.monotonic() <= 10
+
+
+async def test_max_results_is_part_of_key(store: RedisStore):
+    cache = SearchCache(store)
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS) as search:
+        await cache.search("song", max_results=5)
+        await cache.search("song", max_results=15)
+
+    assert search.await_count == 2
+
+
+async def test_expired_entries_refetch(store: RedisStore):
+    cache = SearchCache(store, ttl=0)
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS) as search:
+        await cache.search("song")
+        await cache.search("song")
+
+    assert search.await_count == 2
+
+
+async def test_lru_eviction(store: RedisStore):
+    cache = SearchCache(store, max_entries=2)
+    with patch("yoke.search_cache.search_youtube", return_value=RESULTS):
+        await cache.search("a")
+        await cache.search("b")
+        await cache.search("a")
+        await cache.search("c")
+
+    assert cache.stats()["entries"] == 2
+    assert ("b", 15) not in cache._lru
+    assert ("a", 15) in cache._lru
+
+
+async def test_concurrent_queries_coalesce(store: RedisStore):
+    cache = SearchCache(store)
+    release = asyncio.Event()
+
+    async def slow_search(query: str, max_results: int = 15):
+        await release.wait()
+        return RESULTS
+
+    with patch("yoke.search_cache.search_youtube", side_effect=slow_search) as search:
+        tasks = [asyncio.create_task(cache.search("song")) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+    assert all(r == RESULTS for r in results)
+    search.assert_awaited_once()
+    assert cache.stats()["coalesced"] == 4
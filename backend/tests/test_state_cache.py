@@ -0,0 +1,99 @@
+import fakeredis.aioredis
+import pytest
+
+from yoke.models import PlaybackState, QueueItem, SessionSettings, Singer, Song
+from yoke.redis_store import RedisStore
+from yoke.session import SessionManager
+from yoke.state_cache import CachedRedisStore
+
+
+@pytest.fixture
+async def redis():
+    r = fakeredis.aioredis.FakeRedis()
+    yield r
+    await r.aclose()
+
+
+@pytest.fixture
+async def cached(redis):
+    store = CachedRedisStore(redis)
+    await store.load()
+    yield store
+    await store.close()
+
+
+def _item(video_id: str, singer: Singer | None = None) -> QueueItem:
+    song = Song(
+        video_id=video_id, title=video_id, thumbnail_url="", duration_seconds=60
+    )
+    return QueueItem(song=song, singer=singer or Singer(name="Alice"))
+
+
+async def test_load_reads_existing_state(redis):
+    plain = RedisStore(redis)
+    singer = Singer(name="Alice")
+    await plain.save_singer(singer)
+    await plain.save_settings(SessionSettings(host_id=singer.id))
+    await plain.append_to_queue(_item("a", singer))
+
+    store = CachedRedisStore(redis)
+    await store.load()
+
+    assert (await store.get_settings()).host_id == singer.id
+    assert [qi.song.video_id for qi in await store.get_queue()] == ["a"]
+    await store.close()
+
+
+async def test_writes_reach_redis_after_flush(redis, cached: CachedRedisStore):
+    plain = RedisStore(redis)
+    await cached.save_playback(PlaybackState(status="playing", position_seconds=3.0))
+    item1 = _item("a")
+    item2 = _item("b")
+    await cached.append_to_queue(item1)
+    await cached.append_to_queue(item2)
+    await cached.update_queue_item(item2.id, status="ready")
+    await cached.reorder_queue([item2.id, item1.id])
+
+    await cached.flush()
+
+    assert (await plain.get_playback()).position_seconds == 3.0
+    queue = await plain.get_queue()
+    assert [qi.id for qi in queue] == [item2.id, item1.id]
+    assert queue[0].status == "ready"
+    assert await plain.get_full_state() == await cached.get_full_state()
+
+
+async def test_reads_are_served_from_memory(redis, cached: CachedRedisStore):
+    await cached.save_settings(SessionSettings(host_id="h"))
+    await cached.flush()
+
+    # Changes made behind the cache's back are not seen until reload
+    await RedisStore(redis).save_settings(SessionSettings(host_id="other"))
+    assert (await cached.get_settings()).host_id == "h"
+
+    await cached.load()
+    assert (await cached.get_settings()).host_id == "other"
+
+
+async def test_returned_models_are_copies(cached: CachedRedisStore):
+    playback = await cached.get_playback()
+    playback.status = "playing"
+    assert (await cached.get_playback()).status == "stopped"
+
+
+async def test_session_advance_through_cache(redis, cached: CachedRedisStore):
+    session = SessionManager(cached)
+    singer = (await session.join("Alice")).singer
+    await session.queue_song(singer.id, _item("a").song)
+    await session.queue_song(singer.id, _item("b").song)
+
+    current = await session.advance_queue()
+    assert current is not None
+    assert current.song.video_id == "a"
+
+    await cached.flush()
+    plain = RedisStore(redis)
+    stored_current = await plain.get_current()
+    assert stored_current is not None
+    assert stored_current.song.video_id == "a"
+    assert [qi.song.video_id for qi in await plain.get_queue()] == ["b"]
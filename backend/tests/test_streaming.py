@@ -0,0 +1,218 @@
+import asyncio
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+
+from yoke.downloader import PartialVideo, VideoDownloader
+from yoke.streaming import (
+    FirstByteMiddleware,
+    FirstByteStats,
+    media_type,
+    parse_range,
+    serve_file,
+    stream_partial,
+)
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("bytes=0-", (0, 999)),
+        ("bytes=100-199", (100, 199)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-200", (800, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=0-10,20-30", None),
+        ("items=0-10", None),
+        ("bytes=abc", None),
+        ("bytes=--5", None),
+        ("bytes=20-10", None),
+    ],
+)
+def test_parse_range(header: str | None, expected: tuple[int, int] | None) -> None:
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_parse_range_unsatisfiable(header: str) -> None:
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_media_type() -> None:
+    assert media_type(Path("abc.mp4")) == "video/mp4"
+    assert media_type(Path("abc.webm")) == "video/webm"
+    assert media_type(Path("abc.bin")) == "application/octet-stream"
+
+
+@pytest.fixture()
+def growing(tmp_path: Path) -> tuple[VideoDownloader, Path]:
+    downloader = VideoDownloader(video_dir=tmp_path / "videos", progressive=True)
+    downloader.ensure_dir()
+    path = downloader._partial_dir / "abc123.mp4.part"
+    path.write_bytes(b"a" * 100)
+    downloader._partial["abc123"] = PartialVideo(
+        path=path, final_path=path.with_suffix(""), downloaded=100, total=300
+    )
+    return downloader, path
+
+
+async def _body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+async def test_range_waits_for_unwritten_bytes(
+    growing: tuple[VideoDownloader, Path],
+) -> None:
+    downloader, path = growing
+    file, partial = downloader.open_partial("abc123")
+    response = stream_partial(downloader, "abc123", file, partial, "bytes=50-249")
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 50-249/300"
+    assert response.headers["content-length"] == "200"
+    assert response.media_type == "video/mp4"
+
+    async def finish_download() -> None:
+        await asyncio.sleep(0.2)
+        with path.open("ab") as f:
+            f.write(b"b" * 200)
+        path.rename(partial.final_path)
+        del downloader._partial["abc123"]
+
+    writer = asyncio.create_task(finish_download())
+    body = await _body(response)
+    await writer
+    assert body == b"a" * 50 + b"b" * 150
+
+
+async def test_unranged_request_streams_whole_file(
+    growing: tuple[VideoDownloader, Path],
+) -> None:
+    downloader, path = growing
+    file, partial = downloader.open_partial("abc123")
+    response = stream_partial(downloader, "abc123", file, partial, None)
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "300"
+
+    # A failed download ends the body early rather than hanging
+    del downloader._partial["abc123"]
+    assert await _body(response) == b"a" * 100
+
+
+async def test_unsatisfiable_range(growing: tuple[VideoDownloader, Path]) -> None:
+    downloader, _ = growing
+    file, partial = downloader.open_partial("abc123")
+    response = stream_partial(downloader, "abc123", file, partial, "bytes=300-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */300"
+    assert file.closed
+
+
+async def _send_request(
+    response, headers: dict[str, str] | None = None, extensions: dict | None = None
+) -> tuple[int, dict[str, str], list[dict]]:
+    """Run *response* as ASGI; return status, headers and body messages."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+        ],
+        "extensions": extensions or {},
+    }
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        await asyncio.Event().wait()
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    await response(scope, receive, send)
+    start = messages[0]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], response_headers, messages[1:]
+
+
+@pytest.fixture()
+def video_file(tmp_path: Path) -> Path:
+    path = tmp_path / "abc123.mp4"
+    path.write_bytes(bytes(range(256)) * 16)
+    return path
+
+
+async def test_serve_file_sets_caching_headers(video_file: Path) -> None:
+    status, headers, body = await _send_request(await serve_file(video_file, {}))
+    assert status == 200
+    assert headers["content-type"] == "video/mp4"
+    assert headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert headers["etag"].startswith('"') and not headers["etag"].startswith("W/")
+    assert headers["accept-ranges"] == "bytes"
+    assert b"".join(m["body"] for m in body) == video_file.read_bytes()
+
+
+async def test_serve_file_not_modified(video_file: Path) -> None:
+    first = await serve_file(video_file, {})
+    etag = first.headers["etag"]
+
+    for conditional in (
+        {"if-none-match": etag},
+        {"if-none-match": f'W/{etag}, "other"'},
+        {"if-modified-since": formatdate(video_file.stat().st_mtime + 1, usegmt=True)},
+    ):
+        response = await serve_file(video_file, conditional)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.body == b""
+
+    # If-None-Match wins over a matching If-Modified-Since
+    response = await serve_file(
+        video_file,
+        {
+            "if-none-match": '"other"',
+            "if-modified-since": formatdate(
+                video_file.stat().st_mtime + 1, usegmt=True
+            ),
+        },
+    )
+    assert response.status_code == 200
+
+
+async def test_serve_file_range(video_file: Path) -> None:
+    response = await serve_file(video_file, {})
+    status, headers, body = await _send_request(response, {"range": "bytes=256-511"})
+    assert status == 206
+    assert headers["content-range"] == "bytes 256-511/4096"
+    assert b"".join(m["body"] for m in body) == bytes(range(256))
+
+
+async def test_serve_file_uses_pathsend(video_file: Path) -> None:
+    response = await serve_file(video_file, {})
+    _, _, body = await _send_request(
+        response, extensions={"http.response.pathsend": {}}
+    )
+    assert body == [{"type": "http.response.pathsend", "path": str(video_file)}]
+
+
+async def test_first_byte_middleware_times_video_requests(video_file: Path) -> None:
+    stats = FirstByteStats()
+
+    async def app(scope, receive, send) -> None:
+        await (await serve_file(video_file, {}))(scope, receive, send)
+
+    middleware = FirstByteMiddleware(app, stats=stats, path_prefix="/videos/")
+    sent: list[dict] = []
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    for path in ("/videos/abc123", "/api/stats"):
+        scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+        await middleware(scope, None, send)
+
+    assert stats.stats()["requests"] == 1
+    assert stats.stats()["ttfb_p95_ms"] > 0
+    assert len(sent) == 4
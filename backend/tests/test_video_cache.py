@@ -0,0 +1,110 @@
+import os
+from pathlib import Path
+
+import fakeredis.aioredis
+import pytest
+
+from yoke.downloader import VideoDownloader
+from yoke.models import QueueItem, Singer, Song
+from yoke.redis_store import RedisStore
+from yoke.video_cache import VideoCache
+
+
+@pytest.fixture
+async def store():
+    redis = fakeredis.aioredis.FakeRedis()
+    yield RedisStore(redis)
+    await redis.aclose()
+
+
+@pytest.fixture
+def downloader(tmp_path: Path) -> VideoDownloader:
+    d = VideoDownloader(video_dir=tmp_path / "videos")
+    d.ensure_dir()
+    return d
+
+
+def _song(video_id: str) -> Song:
+    return Song(
+        video_id=video_id,
+        title=video_id,
+        thumbnail_url="",
+        duration_seconds=60,
+        cached=True,
+    )
+
+
+async def _add_videos(
+    downloader: VideoDownloader, store: RedisStore, *video_ids: str
+) -> None:
+    """Write 100-byte videos with increasing mtimes."""
+    for i, video_id in enumerate(video_ids):
+        path = downloader.video_path(video_id)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    await store.save_songs([_song(vid) for vid in video_ids])
+
+
+async def test_no_budget_never_evicts(downloader, store):
+    await _add_videos(downloader, store, "a", "b")
+    cache = VideoCache(downloader, store)
+    assert await cache.enforce() == []
+
+
+async def test_lru_evicts_least_recently_used(downloader, store):
+    await _add_videos(downloader, store, "a", "b", "c")
+    cache = VideoCache(downloader, store, max_bytes=200)
+    await cache.record_play("a")
+
+    assert await cache.enforce() == ["b"]
+    assert not downloader.is_cached("b")
+    assert downloader.is_cached("a")
+    assert (await store.get_song("b")).cached is False
+    assert (await store.get_song("a")).cached is True
+    assert cache.stats()["bytes_reclaimed"] == 100
+
+
+async def test_lfu_evicts_least_played(downloader, store):
+    await _add_videos(downloader, store, "a", "b", "c")
+    cache = VideoCache(downloader, store, max_bytes=200, policy="lfu")
+    await cache.record_play("a")
+    await cache.record_play("a")
+    await cache.record_play("b")
+    await cache.record_play("c")
+    await cache.record_play("c")
+
+    assert await cache.enforce() == ["b"]
+
+
+async def test_queued_and_recent_videos_are_pinned(downloader, store):
+    await _add_videos(downloader, store, "a", "b", "c")
+    singer = Singer(name="Alice")
+    await store.append_to_queue(QueueItem(song=_song("a"), singer=singer))
+    await store.prepend_to_history(QueueItem(song=_song("b"), singer=singer))
+    cache = VideoCache(downloader, store, max_bytes=100)
+
+    assert await cache.enforce() == ["c"]
+    assert downloader.is_cached("a")
+    assert downloader.is_cached("b")
+
+
+async def test_usage_survives_restart(downloader, store):
+    await _add_videos(downloader, store, "a", "b")
+    await VideoCache(downloader, store).record_play("a")
+
+    cache = VideoCache(downloader, store, max_bytes=100, policy="lfu")
+    await cache.load()
+    assert await cache.enforce() == ["b"]
+
+
+async def test_hit_rate(downloader, store):
+    await _add_videos(downloader, store, "a")
+    cache = VideoCache(downloader, store)
+    assert cache.record_request("a") is True
+    assert cache.record_request("missing") is False
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_unknown_policy(downloader, store):
+    with pytest.raises(ValueError):
+        VideoCache(downloader, store, policy="fifo")
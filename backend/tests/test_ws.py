@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from unittest.mock import AsyncMock
 
-
 from yoke.ws import ConnectionManager
 
 
@@ -42,9 +43,13 @@ class TestConnectionManager:
 
         message = {"type": "queue_update", "data": []}
         await mgr.broadcast(message)
+        await mgr.flush()
 
-        ws1.send_json.assert_awaited_once_with(message)
-        ws2.send_json.assert_awaited_once_with(message)
+        ws1.send_text.assert_awaited_once()
+        ws2.send_text.assert_awaited_once()
+        assert json.loads(ws1.send_text.call_args[0][0]) == message
+        # Encoded once, same frame for everyone
+        assert ws1.send_text.call_args[0][0] is ws2.send_text.call_args[0][0]
 
     async def test_send_to_one(self) -> None:
         mgr = ConnectionManager()
@@ -55,9 +60,11 @@ class TestConnectionManager:
 
         message = {"type": "now_playing", "song": "test"}
         await mgr.send_to(ws1, message)
+        await mgr.flush()
 
-        ws1.send_json.assert_awaited_once_with(message)
-        ws2.send_json.assert_not_awaited()
+        ws1.send_text.assert_awaited_once()
+        assert json.loads(ws1.send_text.call_args[0][0]) == message
+        ws2.send_text.assert_not_awaited()
 
     async def test_broadcast_excludes(self) -> None:
         mgr = ConnectionManager()
@@ -70,10 +77,12 @@ class TestConnectionManager:
 
         message = {"type": "singer_joined", "singer_id": "singer-2"}
         await mgr.broadcast(message, exclude=ws2)
+        await mgr.flush()
 
-        ws1.send_json.assert_awaited_once_with(message)
-        ws2.send_json.assert_not_awaited()
-        ws3.send_json.assert_awaited_once_with(message)
+        ws1.send_text.assert_awaited_once()
+        assert json.loads(ws1.send_text.call_args[0][0]) == message
+        ws2.send_text.assert_not_awaited()
+        ws3.send_text.assert_awaited_once()
 
     def test_get_connection_by_singer_id(self) -> None:
         mgr = ConnectionManager()
@@ -89,20 +98,274 @@ class TestConnectionManager:
     async def test_send_to_handles_exception(self) -> None:
         mgr = ConnectionManager()
         ws = make_mock_ws("singer-1")
-        ws.send_json.side_effect = Exception("connection closed")
+        ws.send_text.side_effect = Exception("connection closed")
         mgr.connect(ws, "singer-1")
 
         # Should not raise
         await mgr.send_to(ws, {"type": "test"})
+        await mgr.flush()
 
     async def test_broadcast_handles_exception(self) -> None:
         mgr = ConnectionManager()
         ws1 = make_mock_ws("singer-1")
         ws2 = make_mock_ws("singer-2")
-        ws1.send_json.side_effect = Exception("connection closed")
+        ws1.send_text.side_effect = Exception("connection closed")
         mgr.connect(ws1, "singer-1")
         mgr.connect(ws2, "singer-2")
 
         # Should not raise, and ws2 should still receive the message
         await mgr.broadcast({"type": "test"})
-        ws2.send_json.assert_awaited_once_with({"type": "test"})
+        await mgr.flush()
+        ws2.send_text.assert_awaited_once_with('{"type":"test"}')
+
+    async def test_broadcast_slow_client_times_out(self) -> None:
+        mgr = ConnectionManager(send_timeout=0.05)
+        slow = make_mock_ws("singer-1")
+        fast = make_mock_ws("singer-2")
+
+        async def _hang(text: str) -> None:
+            await asyncio.sleep(10)
+
+        slow.send_text.side_effect = _hang
+        mgr.connect(slow, "singer-1")
+        mgr.connect(fast, "singer-2")
+
+        await asyncio.wait_for(mgr.broadcast({"type": "test"}), timeout=1)
+        await asyncio.wait_for(mgr.flush(), timeout=1)
+
+        fast.send_text.assert_awaited_once()
+        assert mgr.stats()["send_timeouts"] == 1
+
+    async def test_broadcast_stats(self) -> None:
+        mgr = ConnectionManager()
+        mgr.connect(make_mock_ws("singer-1"), "singer-1")
+
+        await mgr.broadcast({"type": "test"})
+        await mgr.flush()
+        await mgr.broadcast({"type": "test"})
+        await mgr.flush()
+
+        stats = mgr.stats()
+        assert stats["connections"] == 1
+        assert stats["broadcasts"] == 2
+        assert stats["avg_encode_ms"] >= 0
+        assert stats["max_fanout_ms"] >= stats["avg_fanout_ms"]
+
+    async def test_broadcast_does_not_wait_for_clients(self) -> None:
+        mgr = ConnectionManager()
+        ws = make_mock_ws("singer-1")
+        release = asyncio.Event()
+
+        async def _block(text: str) -> None:
+            await release.wait()
+
+        ws.send_text.side_effect = _block
+        mgr.connect(ws, "singer-1")
+
+        # Returns immediately even though the client never finishes reading
+        await asyncio.wait_for(mgr.broadcast({"type": "test"}), timeout=0.1)
+        await asyncio.wait_for(mgr.broadcast({"type": "test"}), timeout=0.1)
+
+        release.set()
+        await mgr.flush()
+        assert ws.send_text.await_count == 2
+
+    async def test_superseded_messages_are_coalesced(self) -> None:
+        mgr = ConnectionManager()
+        ws = make_mock_ws("singer-1")
+        mgr.connect(ws, "singer-1")
+
+        # Nothing is written until the writer task runs, so these coalesce
+        await mgr.broadcast({"type": "position_update", "position": 1.0})
+        await mgr.broadcast({"type": "position_update", "position": 2.0})
+        await mgr.broadcast(
+            {"type": "download_progress", "item_id": "a", "progress": 0.1}
+        )
+        await mgr.broadcast(
+            {"type": "download_progress", "item_id": "b", "progress": 0.5}
+        )
+        await mgr.broadcast(
+            {"type": "download_progress", "item_id": "a", "progress": 0.2}
+        )
+        await mgr.flush()
+
+        sent = [json.loads(call[0][0]) for call in ws.send_text.call_args_list]
+        assert sent == [
+            {"type": "position_update", "position": 2.0},
+            {"type": "download_progress", "item_id": "a", "progress": 0.2},
+            {"type": "download_progress", "item_id": "b", "progress": 0.5},
+        ]
+        assert mgr.stats()["coalesced"] == 2
+
+    async def test_full_queue_drops_superseded_first(self) -> None:
+        mgr = ConnectionManager(queue_size=2)
+        ws = make_mock_ws("singer-1")
+        mgr.connect(ws, "singer-1")
+
+        await mgr.broadcast({"type": "position_update", "position": 1.0})
+        await mgr.broadcast({"type": "now_playing", "item": None})
+        await mgr.broadcast({"type": "show_qr"})
+        await mgr.flush()
+
+        sent = [json.loads(call[0][0])["type"] for call in ws.send_text.call_args_list]
+        assert sent == ["now_playing", "show_qr"]
+        assert ws in mgr.active_connections
+
+    async def test_full_queue_disconnects_slow_client(self) -> None:
+        mgr = ConnectionManager(send_timeout=0.1, queue_size=2)
+        slow = make_mock_ws("singer-1")
+        fast = make_mock_ws("singer-2")
+
+        async def stuck(text: str) -> None:
+            await asyncio.Event().wait()
+
+        slow.send_text.side_effect = stuck
+        mgr.connect(slow, "singer-1")
+        mgr.connect(fast, "singer-2")
+
+        for _ in range(5):
+            await mgr.send_to(slow, {"type": "show_qr"})
+        # The writer is stuck, so the oldest queued frame goes stale
+        await asyncio.sleep(0.15)
+        await mgr.send_to(slow, {"type": "show_qr"})
+        await asyncio.sleep(0)
+
+        assert slow not in mgr.active_connections
+        slow.close.assert_awaited_once()
+        assert mgr.stats()["overflow_disconnects"] == 1
+
+        await mgr.broadcast({"type": "show_qr"})
+        await mgr.flush()
+        fast.send_text.assert_awaited_once()
+
+    async def test_burst_to_healthy_client_is_not_dropped(self) -> None:
+        mgr = ConnectionManager(queue_size=2)
+        ws = make_mock_ws("singer-1")
+        mgr.connect(ws, "singer-1")
+
+        for i in range(300):
+            await mgr.broadcast({"type": "item_moved", "item_id": str(i)})
+        await mgr.flush()
+
+        assert ws in mgr.active_connections
+        assert ws.send_text.await_count == 300
+        assert mgr.stats()["overflow_disconnects"] == 0
+
+    def test_singer_index_supports_multiple_tabs(self) -> None:
+        mgr = ConnectionManager()
+        tab1 = make_mock_ws()
+        tab2 = make_mock_ws()
+        mgr.connect(tab1, "singer-1")
+        mgr.connect(tab2, "singer-1")
+
+        assert mgr.get_all_by_singer_id("singer-1") == [tab1, tab2]
+        assert mgr.get_by_singer_id("singer-1") is tab2
+        assert mgr.is_singer_connected("singer-1")
+
+        mgr.disconnect(tab2)
+        assert mgr.get_by_singer_id("singer-1") is tab1
+
+        mgr.disconnect(tab1)
+        assert mgr.get_by_singer_id("singer-1") is None
+        assert not mgr.is_singer_connected("singer-1")
+
+    def test_reconnect_reindexes_singer(self) -> None:
+        mgr = ConnectionManager()
+        ws = make_mock_ws()
+        mgr.connect(ws, None, role="control")
+        assert not mgr.is_singer_connected("singer-1")
+
+        mgr.connect(ws, "singer-1")
+        assert mgr.get_by_singer_id("singer-1") is ws
+        assert mgr.get_by_role("control") == [ws]
+        assert len(mgr.active_connections) == 1
+
+        mgr.connect(ws, "singer-2")
+        assert not mgr.is_singer_connected("singer-1")
+        assert mgr.get_by_singer_id("singer-2") is ws
+
+    def test_role_index(self) -> None:
+        mgr = ConnectionManager()
+        display = make_mock_ws()
+        phone = make_mock_ws()
+        mgr.connect(display, role="display")
+        mgr.connect(phone, "singer-1", role="control")
+
+        assert mgr.get_by_role("display") == [display]
+        assert mgr.get_by_role("control") == [phone]
+
+        mgr.disconnect(display)
+        assert mgr.get_by_role("display") == []
+
+    async def test_send_to_singer(self) -> None:
+        mgr = ConnectionManager()
+        tab1 = make_mock_ws()
+        tab2 = make_mock_ws()
+        other = make_mock_ws()
+        mgr.connect(tab1, "singer-1")
+        mgr.connect(tab2, "singer-1")
+        mgr.connect(other, "singer-2")
+
+        await mgr.send_to_singer("singer-1", {"type": "test"})
+        await mgr.send_to_singer("singer-999", {"type": "test"})
+        await mgr.flush()
+
+        tab1.send_text.assert_awaited_once_with('{"type":"test"}')
+        tab2.send_text.assert_awaited_once_with('{"type":"test"}')
+        other.send_text.assert_not_awaited()
+
+    async def test_broadcast_routes_by_topic(self) -> None:
+        mgr = ConnectionManager()
+        display = make_mock_ws()
+        phone = make_mock_ws()
+        legacy = make_mock_ws()
+        mgr.connect(display, role="display")
+        mgr.connect(phone, "singer-1", role="control")
+        mgr.connect(legacy, "singer-2")
+
+        await mgr.broadcast({"type": "position_update", "position": 1.0})
+        await mgr.broadcast({"type": "show_qr"})
+        await mgr.broadcast({"type": "now_playing", "item": None})
+        await mgr.flush()
+
+        def received(ws):
+            return [json.loads(c[0][0])["type"] for c in ws.send_text.call_args_list]
+
+        assert received(display) == ["show_qr", "now_playing"]
+        assert received(phone) == ["position_update", "now_playing"]
+        assert received(legacy) == ["position_update", "show_qr", "now_playing"]
+
+    async def test_subscribe_and_unsubscribe(self) -> None:
+        mgr = ConnectionManager()
+        phone = make_mock_ws()
+        mgr.connect(phone, role="control")
+
+        message = {"type": "download_progress", "item_id": "a", "progress": 0.5}
+        await mgr.broadcast(message)
+        await mgr.flush()
+        phone.send_text.assert_not_awaited()
+
+        mgr.subscribe(phone, ["progress"])
+        # Joining keeps the subscriptions
+        mgr.connect(phone, "singer-1")
+        await mgr.broadcast(message)
+        await mgr.flush()
+        phone.send_text.assert_awaited_once()
+
+        mgr.unsubscribe(phone, ["progress"])
+        await mgr.broadcast(message)
+        await mgr.flush()
+        phone.send_text.assert_awaited_once()
+
+    async def test_unsubscribe_from_everything(self) -> None:
+        mgr = ConnectionManager()
+        ws = make_mock_ws()
+        mgr.connect(ws, "singer-1")
+
+        mgr.unsubscribe(ws, ["position"])
+        await mgr.broadcast({"type": "position_update", "position": 1.0})
+        await mgr.broadcast({"type": "show_qr"})
+        await mgr.flush()
+
+        sent = [json.loads(c[0][0])["type"] for c in ws.send_text.call_args_list]
+        assert sent == ["show_qr"]
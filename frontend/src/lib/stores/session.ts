@@ -5,7 +5,8 @@ import type {
 	PlaybackState,
 	SessionSettings,
 	Song,
-	ServerMessage
+	ServerMessage,
+	ClientRole
 } from '../types';
 import { YokeSocket } from '../ws';
 
@@ -26,12 +27,18 @@ export const searchResults = writable<Song[]>([]);
 export const notifications = writable<Array<{ id: string; text: string }>>([]);
 export const screenMessages = writable<Array<{ id: string; name: string; text: string }>>([]);
 export const showQr = writable(false);
+// Number of queue items at the front that are downloaded and ready to play
+export const readyHorizon = writable(0);
 
 let socket: YokeSocket | null = null;
 
-export function getSocket(): YokeSocket {
+// Revision of the last queue change applied locally
+let queueRev = 0;
+let queueSyncPending = false;
+
+export function getSocket(role: ClientRole = 'control'): YokeSocket {
 	if (!socket) {
-		socket = new YokeSocket();
+		socket = new YokeSocket(role);
 	}
 	return socket;
 }
@@ -44,12 +51,51 @@ export function addNotification(text: string): void {
 	}, 4000);
 }
 
+type QueueDiff = Extract<
+	ServerMessage,
+	{ type: 'item_added' | 'item_removed' | 'item_moved' | 'queue_reordered' | 'item_status' }
+>;
+
+function applyQueueDiff(q: QueueItem[], msg: QueueDiff): QueueItem[] {
+	// Diffs are applied idempotently: one racing the initial state snapshot
+	// may already be reflected in it.
+	switch (msg.type) {
+		case 'item_added': {
+			const rest = q.filter((item) => item.id !== msg.item.id);
+			const index = msg.index < 0 ? rest.length : msg.index;
+			return [...rest.slice(0, index), msg.item, ...rest.slice(index)];
+		}
+		case 'item_removed':
+			return q.filter((item) => item.id !== msg.item_id);
+		case 'item_moved': {
+			const moved = q.find((item) => item.id === msg.item_id);
+			if (!moved) return q;
+			const rest = q.filter((item) => item.id !== msg.item_id);
+			return [...rest.slice(0, msg.index), moved, ...rest.slice(msg.index)];
+		}
+		case 'queue_reordered': {
+			let next = q.filter((item) => !msg.removed.includes(item.id));
+			for (const { item_id, index } of msg.moves) {
+				next = applyQueueDiff(next, { type: 'item_moved', item_id, index, rev: msg.rev });
+			}
+			return next;
+		}
+		case 'item_status':
+			return q.map((item) =>
+				item.id === msg.item_id ? { ...item, status: msg.status } : item
+			);
+	}
+}
+
 export function initSession(sock: YokeSocket): void {
 	sock.onMessage((msg: ServerMessage) => {
 		switch (msg.type) {
 			case 'state':
 				singers.set(msg.singers);
 				queue.set(msg.queue);
+				queueRev = msg.queue_rev;
+				queueSyncPending = false;
+				readyHorizon.set(msg.ready_horizon);
 				currentItem.set(msg.current);
 				playback.set(msg.playback);
 				settings.set(msg.settings);
@@ -74,6 +120,26 @@ export function initSession(sock: YokeSocket): void {
 
 			case 'queue_updated':
 				queue.set(msg.queue);
+				queueRev = msg.rev;
+				queueSyncPending = false;
+				break;
+
+			case 'item_added':
+			case 'item_removed':
+			case 'item_moved':
+			case 'queue_reordered':
+			case 'item_status':
+				if (msg.rev <= queueRev) break;
+				if (msg.rev !== queueRev + 1) {
+					// Missed a change; ask for the full queue instead of guessing
+					if (!queueSyncPending) {
+						queueSyncPending = true;
+						sock.send({ type: 'queue_sync' });
+					}
+					break;
+				}
+				queue.update((q) => applyQueueDiff(q, msg));
+				queueRev = msg.rev;
 				break;
 
 			case 'playback_updated':
@@ -81,13 +147,22 @@ export function initSession(sock: YokeSocket): void {
 				break;
 
 			case 'download_progress':
-				queue.update((q) =>
-					q.map((item) =>
-						item.song.video_id === msg.video_id
-							? { ...item, status: 'downloading' as const }
-							: item
-					)
-				);
+				// Unrevisioned and rate-limited, so it can arrive after the item
+				// became ready; status only changes through item_status diffs
+				break;
+
+			case 'key_detected': {
+				const withKey = (item: QueueItem): QueueItem =>
+					item.song.video_id === msg.video_id
+						? { ...item, song: { ...item.song, detected_key: msg.detected_key } }
+						: item;
+				queue.update((q) => q.map(withKey));
+				currentItem.update((item) => (item ? withKey(item) : item));
+				break;
+			}
+
+			case 'ready_horizon':
+				readyHorizon.set(msg.ready_horizon);
 				break;
 
 			case 'search_results':
@@ -41,10 +41,20 @@ export interface SessionState {
 
 // Server -> Client message types
 export type ServerMessage =
-	| ({ type: 'state'; singer_id?: string } & SessionState)
+	| ({ type: 'state'; singer_id?: string; queue_rev: number; ready_horizon: number } & SessionState)
 	| { type: 'singer_joined'; singer: Singer }
 	| { type: 'song_queued'; item: QueueItem }
-	| { type: 'queue_updated'; queue: QueueItem[] }
+	| { type: 'queue_updated'; queue: QueueItem[]; rev: number }
+	| { type: 'item_added'; item: QueueItem; index: number; rev: number }
+	| { type: 'item_removed'; item_id: string; rev: number }
+	| { type: 'item_moved'; item_id: string; index: number; rev: number }
+	| {
+			type: 'queue_reordered';
+			removed: string[];
+			moves: { item_id: string; index: number }[];
+			rev: number;
+	  }
+	| { type: 'item_status'; item_id: string; status: QueueItem['status']; rev: number }
 	| { type: 'playback_updated'; playback: PlaybackState }
 	| { type: 'download_progress'; video_id: string; item_id: string; progress: number }
 	| { type: 'search_results'; songs: Song[] }
@@ -54,9 +64,15 @@ export type ServerMessage =
 	| { type: 'up_next'; singer: Singer; song: Song }
 	| { type: 'settings_updated'; settings: SessionSettings }
 	| { type: 'download_error'; video_id: string; item_id: string }
+	| { type: 'ready_horizon'; ready_horizon: number }
+	| { type: 'key_detected'; video_id: string; detected_key: string | null }
 	| { type: 'position_update'; position: number }
 	| { type: 'error'; message: string };
 
+// Client roles and the optional broadcast topics they can subscribe to
+export type ClientRole = 'control' | 'display';
+export type Topic = 'queue' | 'progress' | 'position' | 'screen';
+
 // Client -> Server message types
 export type ClientMessage =
 	| { type: 'join'; name: string; singer_id?: string }
@@ -64,6 +80,9 @@ export type ClientMessage =
 	| { type: 'queue_song'; video_id: string }
 	| { type: 'remove_from_queue'; item_id: string }
 	| { type: 'reorder_queue'; item_ids: string[] }
+	| { type: 'queue_sync' }
+	| { type: 'subscribe'; topics: Topic[] }
+	| { type: 'unsubscribe'; topics: Topic[] }
 	| { type: 'playback'; action: 'play' | 'pause' | 'stop' | 'skip' | 'restart' | 'previous' }
 	| { type: 'seek'; position_seconds: number }
 	| { type: 'pitch'; semitones: number }
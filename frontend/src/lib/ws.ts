@@ -1,4 +1,4 @@
-import type { ClientMessage, ServerMessage } from './types';
+import type { ClientMessage, ClientRole, ServerMessage, Topic } from './types';
 
 export type MessageHandler = (message: ServerMessage) => void;
 export type ConnectionState = 'disconnected' | 'connecting' | 'connected';
@@ -11,17 +11,18 @@ export class YokeSocket {
 	private stateHandlers: StateChangeHandler[] = [];
 	private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
 	private pendingMessages: ClientMessage[] = [];
+	private topics = new Set<Topic>();
 	private url: string;
 	private _connectionState: ConnectionState = 'disconnected';
 
-	constructor(url?: string) {
+	constructor(role: ClientRole = 'control', url?: string) {
 		const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
 		// In dev mode, bypass the Vite proxy and connect directly to the backend port
 		const backendPort = import.meta.env.PUBLIC_BACKEND_PORT;
 		const host = backendPort
 			? `${window.location.hostname}:${backendPort}`
 			: window.location.host;
-		this.url = url ?? `${protocol}//${host}/ws`;
+		this.url = url ?? `${protocol}//${host}/ws?role=${role}`;
 	}
 
 	get connectionState(): ConnectionState {
@@ -43,6 +44,11 @@ export class YokeSocket {
 		this.ws.onopen = () => {
 			this.setConnectionState('connected');
 
+			// Subscriptions are per connection; restore them after a reconnect
+			if (this.topics.size > 0) {
+				this.ws!.send(JSON.stringify({ type: 'subscribe', topics: [...this.topics] }));
+			}
+
 			for (const handler of this.openHandlers) {
 				handler();
 			}
@@ -96,6 +102,20 @@ export class YokeSocket {
 		}
 	}
 
+	subscribe(...topics: Topic[]): void {
+		for (const topic of topics) this.topics.add(topic);
+		if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+			this.send({ type: 'subscribe', topics });
+		}
+	}
+
+	unsubscribe(...topics: Topic[]): void {
+		for (const topic of topics) this.topics.delete(topic);
+		if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+			this.send({ type: 'unsubscribe', topics });
+		}
+	}
+
 	onMessage(handler: MessageHandler): () => void {
 		this.handlers.push(handler);
 		return () => {